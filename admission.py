@@ -0,0 +1,192 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import logging
+from contextlib import contextmanager, asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', 6))  # Scrape jobs allowed upstream at once
+ADMISSION_NOTICE_AFTER = float(os.environ.get('ADMISSION_NOTICE_AFTER', 3))  # Estimated wait (s) worth telling the user about
+ADMISSION_MAX_WAIT = float(os.environ.get('ADMISSION_MAX_WAIT', 30))  # Longest wait (s) before a request is turned away
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 100))
+DEFAULT_JOB_SECONDS = 2.0  # Assumed job length until real ones have been timed
+
+# Lower runs first: a tap on a result beats a latest view, which beats a cold multi-page search
+PRIORITY_DOWNLOAD = 0
+PRIORITY_LATEST = 1
+PRIORITY_SEARCH = 2
+PRIORITY_BACKGROUND = 3  # Prefetch, index warming and scheduled refreshes
+PRIORITY_NAMES = {PRIORITY_DOWNLOAD: 'download', PRIORITY_LATEST: 'latest', PRIORITY_SEARCH: 'search',
+                  PRIORITY_BACKGROUND: 'background'}
+
+class Overloaded(Exception):
+    """Raised instead of queueing when the wait for a scrape slot would be too long."""
+
+    def __init__(self, wait):
+        super().__init__(f"scrapers busy, estimated wait {wait:.0f}s")
+        self.wait = wait
+
+class _Waiter:
+    __slots__ = ('priority', 'wake', 'granted', 'abandoned')
+
+    def __init__(self, priority, wake):
+        self.priority = priority
+        self.wake = wake
+        self.granted = False
+        self.abandoned = False
+
+class AdmissionControl:
+    """Global cap on concurrent scrape jobs with a priority queue in front of it.
+
+    A job takes a slot with slot() (threads) or slot_async() (event loop). While all
+    slots are busy, callers queue by priority, then arrival order; a freed slot goes
+    straight to the best waiter. The expected wait is estimated from the queue ahead
+    and recent job lengths: past max_wait the caller gets Overloaded at once instead
+    of timing out later, and past notice_after its on_queued(position, wait) hook
+    runs so the user hears they are queued.
+    """
+
+    def __init__(self, max_concurrent=ADMISSION_MAX_CONCURRENT, notice_after=ADMISSION_NOTICE_AFTER,
+                 max_wait=ADMISSION_MAX_WAIT, max_queue=ADMISSION_MAX_QUEUE):
+        self.max_concurrent = max_concurrent
+        self.notice_after = notice_after
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self._active = 0
+        self._heap = []  # [(priority, seq, _Waiter)], abandoned waiters skipped on release
+        self._waiting = 0
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.job_seconds = DEFAULT_JOB_SECONDS  # Moving average of how long a job holds its slot
+        self.metrics = {name: {'admitted': 0, 'queued': 0, 'rejected': 0, 'wait_seconds': 0.0}
+                        for name in PRIORITY_NAMES.values()}
+
+    def _ahead(self, priority):
+        return sum(1 for p, _, waiter in self._heap if p <= priority and not waiter.abandoned)
+
+    def estimate_wait(self, priority):
+        """Seconds a new job of this priority would wait for a slot right now."""
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiting:
+                return 0.0
+            return (self._ahead(priority) + 1) * self.job_seconds / self.max_concurrent
+
+    def _enqueue(self, priority, wake, wait):
+        """Take a free slot (returns None) or join the queue (returns (waiter, position, estimate))."""
+        counters = self.metrics[PRIORITY_NAMES[priority]]
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiting:
+                self._active += 1
+                counters['admitted'] += 1
+                return None
+            position = self._ahead(priority) + 1
+            estimate = position * self.job_seconds / self.max_concurrent
+            if not wait or estimate > self.max_wait or self._waiting >= self.max_queue:
+                counters['rejected'] += 1
+                raise Overloaded(estimate)
+            waiter = _Waiter(priority, wake)
+            heapq.heappush(self._heap, (priority, next(self._seq), waiter))
+            self._waiting += 1
+            counters['queued'] += 1
+        logger.debug(f"Queued {PRIORITY_NAMES[priority]} job at position {position}, ~{estimate:.1f}s")
+        return waiter, position, estimate
+
+    def _abandon(self, waiter):
+        """Leave the queue; returns True when a slot was handed over in the meantime."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.abandoned = True
+            self._waiting -= 1
+            self.metrics[PRIORITY_NAMES[waiter.priority]]['rejected'] += 1
+            return False
+
+    def _release(self, held):
+        with self._lock:
+            self.job_seconds = 0.8 * self.job_seconds + 0.2 * held
+            while self._heap:
+                _, _, waiter = heapq.heappop(self._heap)
+                if waiter.abandoned:
+                    continue
+                waiter.granted = True
+                self._waiting -= 1
+                break
+            else:
+                self._active -= 1
+                return
+        waiter.wake()  # The slot passes to the waiter without ever being free
+
+    def _admitted(self, priority, queued_at):
+        counters = self.metrics[PRIORITY_NAMES[priority]]
+        with self._lock:
+            counters['admitted'] += 1
+            counters['wait_seconds'] += time.monotonic() - queued_at
+
+    @contextmanager
+    def slot(self, priority, on_queued=None, wait=True):
+        """Hold a scrape slot for the with-block; wait=False only takes a slot that is free now."""
+        event = threading.Event()
+        queued_at = time.monotonic()
+        entry = self._enqueue(priority, event.set, wait)
+        if entry is not None:
+            waiter, position, estimate = entry
+            if on_queued and estimate >= self.notice_after:
+                try:
+                    on_queued(position, estimate)
+                except Exception as e:
+                    logger.warning(f"Queued notice failed: {e}")
+            if not event.wait(self.max_wait) and not self._abandon(waiter):
+                raise Overloaded(time.monotonic() - queued_at)
+            self._admitted(priority, queued_at)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+
+    @asynccontextmanager
+    async def slot_async(self, priority, on_queued=None, wait=True):
+        """slot() for coroutines: queued tasks await their turn without blocking the loop."""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(True))
+
+        queued_at = time.monotonic()
+        entry = self._enqueue(priority, wake, wait)
+        if entry is not None:
+            waiter, position, estimate = entry
+            try:
+                if on_queued and estimate >= self.notice_after:
+                    try:
+                        await on_queued(position, estimate)
+                    except Exception as e:
+                        logger.warning(f"Queued notice failed: {e}")
+                await asyncio.wait_for(asyncio.shield(granted), self.max_wait)
+            except asyncio.TimeoutError:
+                if not self._abandon(waiter):
+                    raise Overloaded(time.monotonic() - queued_at)
+            except BaseException:
+                if self._abandon(waiter):
+                    self._release(0.0)
+                raise
+            self._admitted(priority, queued_at)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+
+    def stats(self):
+        with self._lock:
+            return {'max_concurrent': self.max_concurrent, 'active': self._active, 'queued': self._waiting,
+                    'job_seconds': round(self.job_seconds, 2), 'max_wait': self.max_wait,
+                    'classes': {name: {**counters, 'wait_seconds': round(counters['wait_seconds'], 1)}
+                                for name, counters in self.metrics.items()}}
+
+admission = AdmissionControl()
@@ -0,0 +1,494 @@
+"""Asyncio runtime serving /telegram, /health and /api/search on an ASGI server.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port $PORT
+
+Scrape-heavy callbacks (search_site_, latest_site_, select_) run natively on the
+event loop with async Bot API calls and async scrapers. The remaining updates only
+touch in-memory state, so they reuse the synchronous handler on a worker thread.
+"""
+import asyncio
+import json
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+import main
+import async_scrapers
+from admission import admission, Overloaded, PRIORITY_DOWNLOAD, PRIORITY_LATEST, PRIORITY_SEARCH
+from config import ALLOWED_IDS, API_TOKEN, TELEGRAM_BOT_TOKEN, logger
+from main import (user_state, SITES, MAX_RETRIES, prefetcher, latest_feed,
+                  snapshots, create_back_navigation_keyboard,
+                  render_download_links, validate_download_links, health_payload, link_resolver, link_checker,
+                  site_display, add_merged_view, selected_entry, schedule_prefetch,
+                  admin_authorized, memory_report, bearer_matches, parse_search_batch, search_result_line,
+                  queued_text, busy_text, cached_search, store_search, cached_latest, store_latest,
+                  API_MAX_CONCURRENCY)
+
+bot = AsyncTeleBot(TELEGRAM_BOT_TOKEN)
+
+if os.environ.get('TELEGRAM_API_URL'):
+    asyncio_helper.API_URL = os.environ['TELEGRAM_API_URL']
+
+ASYNC_CALLBACKS = ('search_site_', 'latest_site_', 'select_')
+LATEST_TIMEOUT = 20
+api_semaphore = asyncio.Semaphore(API_MAX_CONCURRENCY)  # Shared by every /api/search request
+_chat_locks = weakref.WeakValueDictionary()  # {chat_id: asyncio.Lock} while some task holds or waits on it
+
+@asynccontextmanager
+async def chat_lock(chat_id):
+    """Serialize a chat's updates like process_update does, without blocking the event loop.
+
+    The asyncio lock orders this chat's coroutines (the chat's RLock would let them
+    all in, as they share the loop thread); the RLock itself is then polled so
+    updates handled on worker threads by process_update are excluded too.
+    """
+    async_lock = _chat_locks.setdefault(chat_id, asyncio.Lock())
+    async with async_lock:
+        thread_lock = user_state.lock(chat_id)
+        try:
+            while not thread_lock.acquire(blocking=False):
+                await asyncio.sleep(0.02)
+        except BaseException:
+            thread_lock.abandon()  # Cancelled while waiting
+            raise
+        try:
+            yield
+        finally:
+            thread_lock.release()
+
+def queued_notice(chat_id, message_id, doing):
+    """Async on_queued hook that tells the user, once, that their request is waiting for a scraper."""
+    notified = []
+
+    async def notify(position, wait):
+        if not notified:
+            notified.append(True)
+            await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=queued_text(doing, position, wait), parse_mode='HTML')
+    return notify
+
+async def search_movies_single_site(movie_name, site, on_queued=None):
+    """Search movies on a single site with retry logic; Overloaded when the scrapers are too busy."""
+    if site not in async_scrapers.SITE_MODULES:
+        logger.error(f"Invalid site: {site}")
+        return [], []
+
+    # The same caches as the Flask runtime, so workers of either kind share results; they read SQLite, so off the loop
+    cached = await asyncio.to_thread(cached_search, movie_name, site)
+    if cached is not None:
+        return cached
+
+    for attempt in range(MAX_RETRIES):
+        try:
+            async with admission.slot_async(PRIORITY_SEARCH, on_queued):
+                titles, links = await async_scrapers.get_movie_titles_and_links(site, movie_name)
+            if not titles:
+                logger.warning(f"No titles found for '{movie_name}' on {site} (attempt {attempt + 1})")
+            else:
+                logger.info(f"Fetched {len(titles)} titles for '{movie_name}' from {site}")
+                return await asyncio.to_thread(store_search, movie_name, site, titles, links)
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.warning(f"Error searching {site} (attempt {attempt + 1}): {e}")
+            if attempt == MAX_RETRIES - 1:
+                logger.error(f"All retries failed for {site}: {e}")
+                return [], []
+            await asyncio.sleep(2 * (attempt + 1))
+    return [], []
+
+async def refresh_latest(site, on_queued=None):
+    """Incrementally crawl a site's latest listing and merge it into the stored feed (under its per-site lock)."""
+    async with admission.slot_async(PRIORITY_LATEST, on_queued):
+        return await latest_feed.refresh_async(
+            site, lambda site, stop_at: async_scrapers.get_latest_movies(site, stop_at=stop_at))
+
+async def get_latest_movies_all_sites(on_queued=None):
+    """Fetch latest movies from all sites concurrently; Overloaded when busy scrapers leave nothing to show."""
+    site_results, sites = await asyncio.to_thread(cached_latest, list(async_scrapers.SITE_MODULES))
+    if not sites:
+        return add_merged_view(site_results)
+    results = await asyncio.gather(
+        *(asyncio.wait_for(refresh_latest(site, on_queued), LATEST_TIMEOUT) for site in sites),
+        return_exceptions=True
+    )
+    overloaded = None
+    for site, result in zip(sites, results):
+        if isinstance(result, Overloaded):
+            logger.warning(f"Skipped latest from {site}: {result}")
+            overloaded = result
+            continue
+        if isinstance(result, Exception):
+            logger.error(f"Error fetching latest from {site}: {result!r}")
+            continue
+        titles, links = result
+        if titles:
+            site_results[site] = await asyncio.to_thread(store_latest, site, titles, links)
+            logger.info(f"Fetched {len(titles)} latest titles from {site}")
+        else:
+            logger.warning(f"No latest titles found for {site}")
+    if overloaded and not site_results:
+        raise overloaded
+    return add_merged_view(site_results)
+
+async def get_download_links_for_movie(link, site, on_queued=None):
+    """Get download links with validation and retries, live links first."""
+    prefetched = await asyncio.to_thread(prefetcher.claim, link, site)
+    if prefetched:
+        logger.info(f"Using prefetched download links for {link} on {site}")
+        prefetched = await asyncio.to_thread(link_resolver.resolve_all, prefetched, True)
+        return await asyncio.to_thread(link_checker.rank, prefetched, True)
+    return await asyncio.to_thread(link_checker.rank, await _get_download_links_for_movie(link, site, on_queued))
+
+async def _get_download_links_for_movie(link, site, on_queued=None):
+    for attempt in range(MAX_RETRIES):
+        try:
+            async with admission.slot_async(PRIORITY_DOWNLOAD, on_queued):
+                valid_links = validate_download_links(await async_scrapers.get_download_links(site, link))
+                # Cached resolutions only; the rest resolve on the resolver's pool for next time
+                valid_links = await asyncio.to_thread(link_resolver.resolve_all, valid_links, True)
+            if valid_links:
+                logger.info(f"Fetched {len(valid_links)} valid download links from {site}")
+                await asyncio.to_thread(prefetcher.store, link, site, valid_links)
+                return valid_links
+            logger.warning(f"No valid download links found for {link} on {site} (attempt {attempt + 1})")
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.warning(f"Attempt {attempt + 1} failed for {site}: {e}")
+            if attempt == MAX_RETRIES - 1:
+                logger.error(f"All retries failed for {site}: {e}")
+                return []
+            await asyncio.sleep(2 * (attempt + 1))
+    return []
+
+async def handle_search_site(callback, chat_id, message_id, state):
+    site = callback['data'].replace('search_site_', '')
+    if 'movie_name' not in state:
+        await bot.answer_callback_query(callback['id'], text="❌ No movie name found!", show_alert=True)
+        return
+
+    movie_name = state['movie_name']
+    site_info = SITES.get(site, {'name': site.capitalize(), 'emoji': '🎬'})
+    scroll_id = state.get('scroll_id', f"search_{chat_id}_{int(time.time())}")
+
+    await bot.edit_message_text(
+        chat_id=chat_id,
+        message_id=message_id,
+        text=f"🔍 <b>Searching '{movie_name}' on {site_info['emoji']} {site_info['name']}...</b>\n\n⏳ <i>Please wait...</i>",
+        parse_mode='HTML'
+    )
+
+    try:
+        titles, links = await search_movies_single_site(movie_name, site, on_queued=queued_notice(
+            chat_id, message_id, f"🔍 Searching '{movie_name}' on {site_info['emoji']} {site_info['name']}"))
+    except Overloaded as e:
+        await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=busy_text(e), parse_mode='HTML',
+                                    reply_markup=create_back_navigation_keyboard(scroll_id))
+        await bot.answer_callback_query(callback['id'])
+        return
+
+    if not titles:
+        await bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=message_id,
+            text=(
+                f"😔 <b>No results found for '{movie_name}'</b>\n\n"
+                f"🎬 Site: {site_info['emoji']} {site_info['name']}\n\n"
+                f"💡 <b>Try:</b>\n"
+                f"• Different spelling\n"
+                f"• Another site\n"
+                f"• Different search terms"
+            ),
+            parse_mode='HTML',
+            reply_markup=create_back_navigation_keyboard(scroll_id)
+        )
+        await bot.answer_callback_query(callback['id'])
+        return
+
+    snapshot_id = await asyncio.to_thread(snapshots.put, {site: {'titles': titles, 'links': links}})
+    user_state.update_session(chat_id, {
+        'step': 'movie_selection',
+        'current_site': site,
+        'snapshot_id': snapshot_id,
+        'offset': 0,
+        'scroll_id': scroll_id
+    })
+
+    await bot.edit_message_text(
+        chat_id=chat_id,
+        message_id=message_id,
+        text=(
+            f"✨ <b>Found {len(titles)} results for '{movie_name}'</b>\n\n"
+            f"🎬 <b>Site:</b> {site_info['emoji']} {site_info['name']}\n\n"
+            f"📱 <b>Select a movie to get download links:</b>"
+        ),
+        parse_mode='HTML',
+        reply_markup=await asyncio.to_thread(snapshots.keyboard, snapshot_id, site)
+    )
+    await bot.answer_callback_query(callback['id'])
+    await asyncio.to_thread(prefetcher.schedule, site, links)
+    logger.info(f"User {chat_id} selected site {site} and found {len(titles)} results")
+
+async def handle_latest_site(callback, chat_id, message_id, state):
+    site = callback['data'].replace('latest_site_', '')
+    site_info = site_display(site)
+    scroll_id = state.get('scroll_id', f"latest_{chat_id}_{int(time.time())}")
+
+    await bot.edit_message_text(
+        chat_id=chat_id,
+        message_id=message_id,
+        text=f"🔍 <b>Fetching latest movies from {site_info['emoji']} {site_info['name']}...</b>\n\n⏳ <i>Please wait...</i>",
+        parse_mode='HTML'
+    )
+
+    try:
+        site_results = await get_latest_movies_all_sites(on_queued=queued_notice(
+            chat_id, message_id, f"🔥 Fetching latest movies from {site_info['emoji']} {site_info['name']}"))
+    except Overloaded as e:
+        await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=busy_text(e), parse_mode='HTML',
+                                    reply_markup=create_back_navigation_keyboard(scroll_id))
+        await bot.answer_callback_query(callback['id'])
+        return
+    snapshot_id = await asyncio.to_thread(snapshots.put, site_results)
+    user_state.update_session(chat_id, {
+        'step': 'latest_selection',
+        'current_site': site,
+        'snapshot_id': snapshot_id,
+        'offset': 0,
+        'scroll_id': scroll_id
+    })
+
+    if site not in site_results or not site_results[site]['titles']:
+        await bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=message_id,
+            text=(
+                f"😔 <b>No latest movies found on {site_info['name']}</b>\n\n"
+                f"💡 <b>Try another site or check later</b>"
+            ),
+            parse_mode='HTML',
+            reply_markup=create_back_navigation_keyboard(scroll_id)
+        )
+        await bot.answer_callback_query(callback['id'])
+        return
+
+    titles = site_results[site]['titles']
+    await bot.edit_message_text(
+        chat_id=chat_id,
+        message_id=message_id,
+        text=(
+            f"🔥 <b>Latest Movies</b>\n\n"
+            f"🎬 <b>Site:</b> {site_info['emoji']} {site_info['name']}"
+            f"📊 <b>Found:</b> {len(titles)} movies\n\n"
+            f"📱 <b>Select a movie:</b>"
+        ),
+        parse_mode='HTML',
+        reply_markup=await asyncio.to_thread(snapshots.keyboard, snapshot_id, site)
+    )
+    await bot.answer_callback_query(callback['id'])
+    await asyncio.to_thread(schedule_prefetch, site, site_results[site])
+    logger.info(f"User {chat_id} selected site {site} for latest movies")
+
+async def handle_select(callback, chat_id, message_id, state):
+    snapshot = snapshots.get(callback['data'].split('_')[1])
+    if snapshot is None:
+        await bot.answer_callback_query(callback['id'], text="⏰ These results were cleared to free memory. Please search again.", show_alert=True)
+        return
+
+    try:
+        parts = callback['data'].rsplit('_', 2)
+        if len(parts) != 3 or '_' not in parts[0]:
+            raise ValueError("Invalid callback data format")
+        prefix, site, index = parts
+        snapshot_id = prefix.split('_', 1)[1]
+        index = int(index)
+        if site not in snapshot or index >= len(snapshot[site]['links']):
+            raise ValueError("Invalid selection")
+    except ValueError as e:
+        await bot.answer_callback_query(callback['id'], text=f"❌ Invalid selection: {str(e)}!", show_alert=True)
+        return
+
+    real_site, selected_url, selected_title, other_sources = selected_entry(snapshot, site, index)
+    site_info = site_display(real_site)
+
+    await bot.edit_message_text(
+        chat_id=chat_id,
+        message_id=message_id,
+        text=(
+            f"📥 <b>Getting download links...</b>\n\n"
+            f"🎬 <b>Movie:</b> {selected_title}\n"
+            f"🌐 <b>Site:</b> {site_info['emoji']} {site_info['name']}\n\n"
+            f"⏳ <i>Please wait...</i>"
+        ),
+        parse_mode='HTML'
+    )
+
+    try:
+        download_links = await get_download_links_for_movie(selected_url, real_site, on_queued=queued_notice(
+            chat_id, message_id, f"📥 Getting download links for {selected_title}"))
+    except Overloaded as e:
+        await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=busy_text(e), parse_mode='HTML',
+                                    reply_markup=create_back_navigation_keyboard(snapshot_id))
+        await bot.answer_callback_query(callback['id'])
+        return
+
+    await bot.edit_message_text(
+        chat_id=chat_id,
+        message_id=message_id,
+        text=render_download_links(selected_title, site_info, download_links, other_sources),
+        parse_mode='HTML',
+        reply_markup=create_back_navigation_keyboard(snapshot_id),
+        disable_web_page_preview=True
+    )
+    await bot.answer_callback_query(callback['id'])
+    logger.info(f"User {chat_id} got {len(download_links)} download links for '{selected_title}' on {real_site}")
+
+ASYNC_HANDLERS = {
+    'search_site_': handle_search_site,
+    'latest_site_': handle_latest_site,
+    'select_': handle_select
+}
+
+async def handle_update(update):
+    """Process a Telegram update, awaiting network I/O on the event loop."""
+    callback = (update or {}).get('callback_query')
+    data = callback.get('data', '') if callback else ''
+    chat_id = callback['message']['chat']['id'] if callback else None
+    if not data.startswith(ASYNC_CALLBACKS) or chat_id not in ALLOWED_IDS or chat_id not in user_state:
+        # State-only updates and rejections are cheap, so the sync handler runs them off-loop
+        await asyncio.to_thread(main.process_update, update)
+        return
+
+    message_id = callback['message']['message_id']
+    try:
+        async with chat_lock(chat_id):
+            state = user_state.get(chat_id)
+            if state is not None:
+                user_state.touch(chat_id)
+                handler = next(handler for prefix, handler in ASYNC_HANDLERS.items() if data.startswith(prefix))
+                await handler(callback, chat_id, message_id, state)
+        if state is None:
+            # Expired while waiting for the chat's previous update; the sync handler answers that
+            await asyncio.to_thread(main.process_update, update)
+    except Exception as e:
+        logger.error(f"Webhook error: {e}", exc_info=True)
+        try:
+            await bot.send_message(
+                chat_id,
+                f"❌ <b>Unexpected Error</b>\n\n🐛 {str(e)}\n\n🔄 Try again with /start or /latest",
+                parse_mode='HTML',
+                reply_to_message_id=message_id
+            )
+        except Exception as send_error:
+            logger.error(f"Error sending message to chat_id {chat_id}: {send_error}")
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+async def _respond(send, status, body=b'', content_type='text/plain'):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode())]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def stream_search_batch(send, pairs):
+    """Run (query, site) searches under the shared API limit and stream NDJSON lines as they finish."""
+    started = time.monotonic()
+
+    async def run(query, site):
+        async with api_semaphore:
+            try:
+                return query, site, await search_movies_single_site(query, site), None
+            except Overloaded as e:
+                return query, site, ([], []), str(e)
+
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'application/x-ndjson')]})
+    tasks = [asyncio.create_task(run(query, site)) for query, site in pairs]
+    found = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            query, site, (titles, links), error = await next_done
+            found += len(titles)
+            line = search_result_line(query, site, titles, links, started, error=error)
+            await send({'type': 'http.response.body', 'body': line.encode(), 'more_body': True})
+        line = search_result_line(None, None, [], [], started, done=len(pairs), found=found)
+        await send({'type': 'http.response.body', 'body': line.encode()})
+        logger.info(f"API batch of {len(pairs)} searches finished in {time.monotonic() - started:.2f}s")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def app(scope, receive, send):
+    """ASGI entry point."""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_scrapers.close_session()
+                await bot.close_session()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] != 'http':
+        return
+
+    path, method = scope['path'], scope['method']
+    if path == '/telegram' and method == 'POST':
+        body = await _read_body(receive)
+        try:
+            update = json.loads(body) if body else None
+        except ValueError:
+            update = None
+        await handle_update(update)
+        await _respond(send, 200)
+    elif path == '/health' and method == 'GET':
+        logger.debug("Health check requested")
+        payload = await asyncio.to_thread(health_payload)
+        await _respond(send, 200, json.dumps(payload).encode(), 'application/json')
+    elif path == '/debug/memory' and method == 'GET':
+        headers = dict(scope.get('headers') or [])
+        if not admin_authorized(headers.get(b'authorization', b'').decode('latin-1')):
+            await _respond(send, 404, b'Not Found')
+            return
+        payload = await asyncio.to_thread(memory_report)
+        await _respond(send, 200, json.dumps(payload, default=str).encode(), 'application/json')
+    elif path == '/api/search' and method == 'POST':
+        headers = dict(scope.get('headers') or [])
+        if not API_TOKEN:
+            await _respond(send, 404, b'Not Found')
+            return
+        if not bearer_matches(headers.get(b'authorization', b'').decode('latin-1'), API_TOKEN):
+            await _respond(send, 401, json.dumps({"error": "unauthorized"}).encode(), 'application/json')
+            return
+        body = await _read_body(receive)
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            payload = None
+        pairs, error = parse_search_batch(payload)
+        if error:
+            await _respond(send, 400, json.dumps({"error": error}).encode(), 'application/json')
+            return
+        logger.info(f"API batch search: {len(pairs)} searches")
+        await stream_search_batch(send, pairs)
+    else:
+        await _respond(send, 404, b'Not Found')
+
+if __name__ == "__main__":
+    import uvicorn
+    main.set_webhook()
+    port = int(os.environ.get("PORT", 8080))
+    logger.info(f"Starting ASGI app on port {port}")
+    uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,182 @@
+import asyncio
+import time
+import logging
+import aiohttp
+import hdmovie2
+import hdhub4u
+import cinevood
+import parse_pool
+from config import site_url
+from crawler import MAX_PAGES, reached_known
+from throttle import host_throttle, host_of, retry_after_seconds
+from hedge import mirrors
+from wp_fastpath import fastpath
+
+logger = logging.getLogger(__name__)
+
+SITE_MODULES = {'hdmovie2': hdmovie2, 'hdhub4u': hdhub4u, 'cinevood': cinevood}
+# CineVood sits behind a Cloudflare challenge only cloudscraper can solve, so it stays on a worker thread
+THREADED_SITES = {'cinevood'}
+PAGINATED_SITES = {'hdhub4u', 'cinevood'}
+REQUEST_TIMEOUT = 10
+CONNECTION_LIMIT = 100
+
+_session = None
+
+async def get_session():
+    """Return the shared aiohttp session, creating it on first use."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            headers=hdhub4u.HEADERS,
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            connector=aiohttp.TCPConnector(limit=CONNECTION_LIMIT)
+        )
+    return _session
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+async def _fetch_once(url):
+    session = await get_session()
+    host = host_of(url)
+    wait = host_throttle.reserve(host)
+    if wait > 0:
+        await asyncio.sleep(wait)
+    started = time.monotonic()
+    try:
+        async with session.get(url) as response:
+            host_throttle.feedback(host, response.status, retry_after_seconds(response.headers.get('Retry-After')))
+            response.raise_for_status()
+            logger.info(f"Status code for {url}: {response.status}")
+            text = await response.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        mirrors.record(host, ok=False)
+        raise
+    mirrors.record(host, time.monotonic() - started)
+    return text
+
+async def fetch_text(url):
+    """Fetch a page, hedging across the site's mirrors like hedge.hedged_get; the losing request is cancelled."""
+    candidates = mirrors.candidates(url)
+    if len(candidates) == 1:
+        return await _fetch_once(url)
+    mirrors.count('requests')
+
+    tasks = {asyncio.create_task(_fetch_once(candidates[0])): 0}
+    pending = set(tasks)
+    delay = mirrors.hedge_delay(candidates[0])
+    last_error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=delay if len(tasks) < len(candidates) else None,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if tasks[task] > 0 and pending:
+                        mirrors.count('hedge_wins')
+                    return task.result()
+                last_error = task.exception()
+
+            if len(tasks) < len(candidates) and (done or mirrors.take_hedge()):
+                index = len(tasks)
+                if done:
+                    mirrors.count('failovers')
+                logger.info(f"{'Failing over' if done else 'Hedging'} {url} to {candidates[index]}")
+                task = asyncio.create_task(_fetch_once(candidates[index]))
+                tasks[task] = index
+                pending.add(task)
+                delay = mirrors.hedge_delay(candidates[index])
+            elif not done:
+                delay = None
+    finally:
+        for task in pending:
+            task.cancel()
+    raise last_error
+
+async def crawl_pages(page_url, parse_page, max_pages=MAX_PAGES, label="page", stop_at=None):
+    """Async counterpart of crawler.crawl_pages; parse_page is awaited and the speculative request is truly cancelled."""
+    items = []
+    task = asyncio.create_task(fetch_text(page_url(1)))
+    for page in range(1, max_pages + 1):
+        try:
+            html = await task
+        except Exception as e:
+            logger.error(f"Error fetching {label} {page}: {e}")
+            break
+
+        next_task = asyncio.create_task(fetch_text(page_url(page + 1))) if page < max_pages else None
+        stop = True  # Also when parsing raises: don't leave the speculative request holding a throttle token and connection
+        try:
+            page_items, has_next = await parse_page(html)
+            items.extend(page_items)
+            stop = not page_items or not has_next or next_task is None or reached_known(page_items, stop_at)
+        finally:
+            if stop and next_task is not None:
+                next_task.cancel()
+        if stop:
+            logger.info(f"Stopping at {label} {page}")
+            break
+        task = next_task
+    return items
+
+def _numbered(site, items):
+    titles = [f"{i}. {title} ({site})" for i, (title, _) in enumerate(items, 1)]
+    links = [link for _, link in items]
+    return titles, links
+
+def _listing_parser(site):
+    return lambda html: parse_pool.parse_async(site, 'listing_page', html)
+
+def _listing_url(site, page, query=None):
+    path = "/" if page == 1 else f"/page/{page}/"
+    return site_url(site, f"{path}?s={query}" if query is not None else path)
+
+async def get_movie_titles_and_links(site, movie_name):
+    """Search a site without blocking the event loop."""
+    module = SITE_MODULES[site]
+    if site in THREADED_SITES:
+        return await asyncio.to_thread(module.get_movie_titles_and_links, movie_name)
+    fast = await fastpath.listing_async(site, fetch_text, query=movie_name)
+    if fast is not None:
+        return fast
+
+    search_query = f"{movie_name.replace(' ', '+').lower()}"
+    max_pages = MAX_PAGES if site in PAGINATED_SITES else 1
+    items = await crawl_pages(lambda page: _listing_url(site, page, search_query), _listing_parser(site),
+                              max_pages=max_pages, label=f"{site} search page")
+    logger.info(f"Fetched {len(items)} titles from {site} search")
+    return _numbered(site, items)
+
+async def get_latest_movies(site, stop_at=None):
+    """Fetch a site's latest movies without blocking the event loop."""
+    module = SITE_MODULES[site]
+    if site in THREADED_SITES:
+        return await asyncio.to_thread(module.get_latest_movies, stop_at=stop_at)
+    fast = await fastpath.listing_async(site, fetch_text, stop_at=stop_at)
+    if fast is not None:
+        return fast
+
+    max_pages = MAX_PAGES if site in PAGINATED_SITES else 1
+    items = await crawl_pages(lambda page: _listing_url(site, page), _listing_parser(site),
+                              max_pages=max_pages, label=f"{site} latest page", stop_at=stop_at)
+    logger.info(f"Fetched {len(items)} latest movies from {site}")
+    return _numbered(site, items)
+
+async def get_download_links(site, movie_url):
+    """Fetch raw download entries from a movie page without blocking the event loop."""
+    module = SITE_MODULES[site]
+    if site in THREADED_SITES:
+        return await asyncio.to_thread(module.get_download_links, movie_url)
+
+    try:
+        html = await fetch_text(movie_url)
+    except Exception as e:
+        logger.error(f"Error fetching movie page: {e}")
+        return []
+    download_links = await parse_pool.parse_async(site, 'download_links', html)
+    logger.info(f"Fetched {len(download_links)} download links from {site}")
+    return download_links
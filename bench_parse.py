@@ -0,0 +1,187 @@
+"""Parse-throughput benchmark: thread parsing versus the process parse pool.
+
+Parses stand-in listing and movie pages (padded with site chrome to a realistic
+size) from several threads at once, first in-thread, then offloaded to
+parse_pool, and reports pages per second for each. --formats instead compares
+bytes and parse time per listed post for a themed HTML page, the WordPress REST
+API response and the RSS feed that wp_fastpath reads. --links times the one-pass
+download-link extractors against the earlier selector-per-container versions on
+movie posts of growing length, checking both give the same links; both walk the
+same pre-built tree, whose build time is reported alongside.
+
+    python bench_parse.py --threads 8 --pages 400
+    python bench_parse.py --formats
+    python bench_parse.py --links
+"""
+import argparse
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from standin import listing_page, listing_posts, movie_page, wp_posts_json, rss_feed
+
+SITES = ['hdmovie2', 'hdhub4u', 'cinevood']
+
+def chrome(blocks):
+    """Navigation/sidebar markup that real pages carry around the results."""
+    menu = ''.join(f'<li class="menu-item"><a href="/category/{i}/">Category {i}</a></li>' for i in range(blocks))
+    widgets = ''.join(f'<div class="widget"><h3>Popular {i}</h3><ul><li><a href="/p/{i}/">Post {i}</a>'
+                      f'<span class="meta">2023-01-01</span></li></ul></div>' for i in range(blocks))
+    return f'<header><nav><ul>{menu}</ul></nav></header>', f'<aside class="sidebar">{widgets}</aside>'
+
+def build_pages(count, blocks):
+    head, side = chrome(blocks)
+    pages = []
+    for i in range(count):
+        site = SITES[i % len(SITES)]
+        if i % 2:
+            html = listing_page(site, 'https://example.test', 'animal', 1, 2, 40)
+            kind = 'listing_page'
+        else:
+            html = movie_page(site, f'movie-{i}', links=12)
+            kind = 'download_links'
+        pages.append((site, kind, html.replace('<body>', f'<body>{head}', 1).replace('</body>', f'{side}</body>', 1)))
+    return pages
+
+def run(pages, threads, parse):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        records = sum(len(result[0] if isinstance(result, tuple) else result)
+                      for result in executor.map(lambda page: parse(*page), pages))
+    return time.perf_counter() - started, records
+
+def compare_formats(rounds, blocks):
+    """Bytes and parse time per post for each way of reading a 20-post listing page."""
+    import parse_pool
+    import wp_fastpath
+    base = 'https://example.test'
+    head, side = chrome(blocks)
+    print(f"{'format':<18}{'bytes/post':>10}{'us/post':>10}")
+    for site in SITES:
+        posts = listing_posts(site, base, 'animal', 1, 20)
+        pages = {
+            'html': (listing_page(site, base, 'animal', 1, 2, 20).replace('<body>', f'<body>{head}', 1)
+                     .replace('</body>', f'{side}</body>', 1), lambda text: parse_pool._run(site, 'listing_page', text)[0]),
+            'rest': (wp_posts_json(posts, ['title', 'link']), wp_fastpath.parse_posts),
+            'feed': (rss_feed(base, posts), wp_fastpath.parse_feed),
+        }
+        for name, (text, parse) in pages.items():
+            assert len(parse(text)) == len(posts), f"{site} {name} parsed {len(parse(text))} posts"
+            started = time.perf_counter()
+            for _ in range(rounds):
+                parse(text)
+            per_post = (time.perf_counter() - started) / rounds / len(posts) * 1e6
+            print(f"{site + ' ' + name:<18}{len(text.encode()) / len(posts):>10.0f}{per_post:>10.1f}")
+
+EXCLUDED_LINKS = ['watch online', 'trailer', 'telegram', 'join', 'home']
+LINK_INDICATORS = ['download', 'gdflix', 'filepress', '1080p', '720p', '480p', 'hd']
+
+def selector_links(site, html):
+    """The download-link extractors as they were before dom_walk: one soup.select per container."""
+    from memdiag import parse_html
+    with parse_html(html) as soup:
+        return _selector_links(site, soup)
+
+def _selector_links(site, soup):
+    if site != 'cinevood':
+        selector = ('div#links a[href], div.download-links a[href], div.entry-content a[href], p a[href]' if site == 'hdmovie2'
+                    else 'div.entry-content a[href], div.download-links a[href], p a[href], div.post-content a[href]')
+        excluded = EXCLUDED_LINKS + ([] if site == 'hdmovie2' else ['how to download'])
+        return [f"{tag.text.strip()}: {tag['href']}" for tag in soup.select(selector)
+                if tag.text.strip() and tag['href'] and not any(exclude in tag.text.lower() for exclude in excluded)
+                and any(indicator in tag.text.lower() for indicator in LINK_INDICATORS)]
+    links = []
+    for selector in ['div.download-btns a[href]', 'div.entry-content a[href]', 'p a[href]', 'div.cat-btn-div2 a[href]', 'a.maxbutton a[href]']:
+        for tag in soup.select(selector):
+            text = tag.text.strip()
+            if text and tag['href'] and not any(exclude in text.lower() for exclude in EXCLUDED_LINKS):
+                h6 = tag.find_previous('h6')
+                description = h6.text.strip() if h6 else text
+                if any(indicator in description.lower() for indicator in LINK_INDICATORS):
+                    links.append(f"{description} [{text}]: {tag['href']}")
+    return list(dict.fromkeys(links))
+
+def long_post(site, links, blocks):
+    """A movie post with `links` download links, each section padded with screenshots and prose."""
+    filler = ('<p>Storyline: a long synopsis paragraph with <strong>cast</strong> and <em>crew</em> notes.</p>'
+              '<p><img src="/shot.jpg" alt="screenshot"><img src="/shot2.jpg" alt="screenshot"></p>'
+              '<div class="note"><span>Size and format details</span></div>')
+    html = movie_page(site, 'long-post', links=links)
+    # Pad after every link block so headings and links sit far apart, as on real multi-season posts
+    html = html.replace('</p>', f'</p>{filler}').replace('<div class="entry-content">',
+                                                           '<div class="entry-content"><div class="download-btns">'
+                                                           '<a href="https://gdflix.example/pack">Full Pack Download</a></div>')
+    head, side = chrome(blocks)
+    return html.replace('<body>', f'<body>{head}', 1).replace('</body>', f'{side}</body>', 1)
+
+def best_ms(parse, rounds):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        parse()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+def compare_link_extractors(rounds, blocks):
+    """Best-of-rounds milliseconds per post for building the tree and for each extractor walking it."""
+    import importlib
+    from contextlib import nullcontext
+    from bs4 import BeautifulSoup
+    print(f"{'post':<22}{'KB':>6}{'tree ms':>9}{'selectors ms':>14}{'one pass ms':>13}{'speedup':>9}")
+    for site in SITES:
+        module = importlib.import_module(site)
+        for links in (12, 100, 400):
+            html = long_post(site, links, blocks)
+            assert module.parse_download_links(html) == selector_links(site, html), f"{site} with {links} links differs"
+            build = best_ms(lambda: BeautifulSoup(html, 'html.parser'), rounds)
+            soup = BeautifulSoup(html, 'html.parser')
+            old = best_ms(lambda: _selector_links(site, soup), rounds)
+            # Hand the extractor the tree built above so only the walk is timed
+            module.parse_html, parse_html = (lambda _: nullcontext(soup)), module.parse_html
+            try:
+                new = best_ms(lambda: module.parse_download_links(html), rounds)
+            finally:
+                module.parse_html = parse_html
+            print(f"{f'{site} {links} links':<22}{len(html) / 1024:>6.0f}{build:>9.1f}{old:>14.1f}{new:>13.1f}"
+                  f"{old / new:>8.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare in-thread and process-pool HTML parsing")
+    parser.add_argument('--threads', type=int, default=8, help="Concurrent callers (like Flask threads)")
+    parser.add_argument('--pages', type=int, default=300, help="Pages parsed per run")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Parse pool processes")
+    parser.add_argument('--chrome', type=int, default=150, help="Menu/sidebar blocks padding each page")
+    parser.add_argument('--formats', action='store_true', help="Compare HTML, REST and RSS listings per post instead")
+    parser.add_argument('--links', action='store_true', help="Compare selector and one-pass download-link extraction instead")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    os.environ['PARSE_MODE'] = 'process'
+    os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456:BENCH')  # site modules import config
+    import parse_pool
+    import hdmovie2, hdhub4u, cinevood  # noqa: F401 - imported before the fork so workers inherit them
+
+    if args.formats:
+        compare_formats(max(1, args.pages // 3), args.chrome)
+        return
+    if args.links:
+        compare_link_extractors(max(3, args.pages // 60), args.chrome)
+        return
+
+    pages = build_pages(args.pages, args.chrome)
+    size = sum(len(html) for _, _, html in pages) / len(pages) / 1024
+    print(f"{args.pages} pages, {size:.0f}KB average, {args.threads} caller threads, {os.cpu_count()} cores")
+
+    elapsed, records = run(pages, args.threads, parse_pool._run)
+    print(f"thread:  {elapsed:6.2f}s  {args.pages / elapsed:7.1f} pages/s  ({records} records)")
+    baseline = elapsed
+
+    parse_pool.start(args.workers, preload=SITES)
+    run(pages[:args.workers], args.threads, parse_pool.parse)  # warm-up
+    elapsed, records = run(pages, args.threads, parse_pool.parse)
+    print(f"process: {elapsed:6.2f}s  {args.pages / elapsed:7.1f} pages/s  ({records} records, "
+          f"{args.workers} workers, {baseline / elapsed:.1f}x)")
+    parse_pool.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import os
+import json
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """Thread-safe in-memory cache with per-entry expiry and an entry cap.
+
+    With a store (see persistent_cache.PersistentStore) the cache becomes a read-through,
+    write-behind front for it: misses are looked up on disk and every set is persisted.
+    """
+
+    def __init__(self, name, ttl, max_entries=512, on_evict=None, store=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.on_evict = on_evict  # called as on_evict(key, value) for expired/evicted entries
+        self.store = store
+        self._data = OrderedDict()  # {key: (expires_at, value)}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value or None if missing/expired."""
+        evicted = []
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return self._get_stored(key)
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                evicted.append((key, value))
+                value = None
+            else:
+                self._data.move_to_end(key)
+        self._notify(evicted)
+        return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entries over the cap."""
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        self._set(key, value, expires_at)
+        if self.store is not None:
+            self.store.put(self.name, key, value, expires_at)
+
+    def _set(self, key, value, expires_at):
+        evicted = []
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                old_key, (_, old_value) = self._data.popitem(last=False)
+                evicted.append((old_key, old_value))
+        self._notify(evicted)
+
+    def _get_stored(self, key):
+        # Called with self._lock held; disk reads are cheap next to a scrape
+        if self.store is None:
+            return None
+        entry = self.store.get(self.name, key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        self._data[key] = (expires_at, value)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+        return value
+
+    def pop(self, key):
+        """Remove and return a value without treating it as an eviction."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if self.store is not None:
+            self.store.delete(self.name, key)
+        return entry[1] if entry else None
+
+    def purge_expired(self):
+        """Drop all expired entries."""
+        now = time.time()
+        with self._lock:
+            expired = [(key, value) for key, (expires_at, value) in self._data.items() if expires_at < now]
+            for key, _ in expired:
+                del self._data[key]
+        self._notify(expired)
+        return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def export(self):
+        """Return unexpired entries as [key, expires_at, value] rows."""
+        now = time.time()
+        with self._lock:
+            return [[key, expires_at, value] for key, (expires_at, value) in self._data.items() if expires_at > now]
+
+    def load(self, rows):
+        """Restore rows produced by export(), skipping anything already expired."""
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            for key, expires_at, value in rows:
+                if expires_at > now:
+                    self._data[tuple(key) if isinstance(key, list) else key] = (expires_at, value)
+                    loaded += 1
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return loaded
+
+    def warm(self):
+        """Fill memory from the persistent store (most recently read entries first)."""
+        if self.store is None:
+            return 0
+        return self.load(self.store.load(self.name, self.max_entries))
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def _notify(self, evicted):
+        if self.on_evict:
+            for key, value in evicted:
+                try:
+                    self.on_evict(key, value)
+                except Exception:
+                    pass
+
+def save_snapshot(caches, path):
+    """Write the unexpired entries of several caches to one JSON file."""
+    snapshot = {cache.name: cache.export() for cache in caches}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+    return sum(len(rows) for rows in snapshot.values())
+
+def load_snapshot(caches, path):
+    """Restore caches from a snapshot written by save_snapshot; returns entries loaded."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'r') as f:
+        snapshot = json.load(f)
+    return sum(cache.load(snapshot.get(cache.name, [])) for cache in caches)
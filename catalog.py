@@ -0,0 +1,267 @@
+import os
+import time
+import sqlite3
+import importlib
+import threading
+import logging
+from urllib.parse import urlparse, unquote
+from xml.etree import ElementTree
+from config import SITE_CONFIG, site_url
+from hedge import hedged_get
+from admission import admission, PRIORITY_BACKGROUND
+from title_index import tokenize
+from wp_fastpath import fastpath, rest_url, parse_posts
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.environ.get('CATALOG_PATH', 'catalog.db')  # Empty disables the catalog
+CATALOG_SYNC_INTERVAL = int(os.environ.get('CATALOG_SYNC_INTERVAL', 1800))  # Seconds between sitemap syncs
+CATALOG_REFETCH_AFTER = int(os.environ.get('CATALOG_REFETCH_AFTER', 24 * 3600))  # Refetch unchanged sitemaps this often
+CATALOG_MAX_AGE = int(os.environ.get('CATALOG_MAX_AGE', 6 * 3600))  # Older catalogs fall back to live search
+CATALOG_SEARCH_LIMIT = 200  # Matches returned per search, like ten listing pages
+SITEMAP_INDEXES = ['/sitemap_index.xml', '/wp-sitemap.xml']  # Yoast/Rank Math, then WordPress core
+POST_SITEMAP_MARKERS = ['post-sitemap', 'wp-sitemap-posts-post']
+TITLE_BATCH = 100  # Slugs looked up per REST request
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sitemaps (
+    site TEXT NOT NULL,
+    url TEXT NOT NULL,
+    lastmod TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (site, url)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS posts (
+    site TEXT NOT NULL,
+    url TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    sitemap TEXT NOT NULL,
+    title TEXT NOT NULL,
+    search_text TEXT NOT NULL,
+    lastmod TEXT,
+    PRIMARY KEY (site, url)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS posts_sitemap ON posts (site, sitemap);
+CREATE INDEX IF NOT EXISTS posts_recent ON posts (site, domain, lastmod);
+CREATE TABLE IF NOT EXISTS syncs (
+    site TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    posts INTEGER NOT NULL,
+    PRIMARY KEY (site, domain)
+) WITHOUT ROWID;
+"""
+
+def parse_sitemap(text):
+    """[(loc, lastmod or None)] from a sitemap index or a urlset."""
+    root = ElementTree.fromstring(text)
+    if root.tag not in (f'{SITEMAP_NS}sitemapindex', f'{SITEMAP_NS}urlset'):
+        raise ValueError(f"not a sitemap: {root.tag}")
+    entries = []
+    for entry in root:
+        loc = (entry.findtext(f'{SITEMAP_NS}loc') or '').strip()
+        if loc:
+            entries.append((loc, (entry.findtext(f'{SITEMAP_NS}lastmod') or '').strip() or None))
+    return entries
+
+def slug_of(url):
+    return unquote(urlparse(url).path.rstrip('/').rsplit('/', 1)[-1])
+
+def title_from_slug(slug):
+    """Best-effort title when the REST API cannot name a post: "animal-2023-hindi" -> "Animal 2023 Hindi"."""
+    return ' '.join(word.capitalize() for word in slug.replace('_', '-').split('-') if word)
+
+def search_text(title):
+    # Padded so every query word can be matched as a word prefix with LIKE '% word%'
+    return f" {' '.join(tokenize(title))} "
+
+class Catalog:
+    """Local per-site catalog of every post, kept in step with the sites' sitemaps.
+
+    sync() reads a site's sitemap index and fetches only the post sitemaps whose
+    lastmod changed since the last sync (or that answer a conditional GET with
+    new content when the index carries no lastmod), so a sync costs one request
+    plus one per changed sitemap. Every sitemap is still refetched once a day,
+    since a deletion shifts posts between sitemaps without touching the lastmod
+    of the earlier ones. Titles of new posts come from the REST API when the site
+    serves it, else from the URL slug. search() then answers from SQLite without
+    touching the site. The database is shared by every worker, while the scheduler
+    leader runs the syncs.
+    """
+
+    def __init__(self, path=CATALOG_PATH, max_age=CATALOG_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        self.metrics = {'searches': 0, 'hits': 0, 'syncs': 0, 'sitemaps_fetched': 0, 'sitemaps_skipped': 0}
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def ready(self, site):
+        """True when the site's current domain has a complete sync younger than max_age."""
+        row = self._connect().execute('SELECT synced_at FROM syncs WHERE site = ? AND domain = ?',
+                                      (site, SITE_CONFIG[site])).fetchone()
+        return row is not None and time.time() - row[0] < self.max_age
+
+    def search(self, site, query, limit=CATALOG_SEARCH_LIMIT):
+        """Posts whose title contains every query word (as a word prefix), newest first."""
+        words = tokenize(query)
+        if not words:
+            return [], []
+        clauses = ' AND '.join('search_text LIKE ?' for _ in words)
+        rows = self._connect().execute(
+            f'SELECT title, url FROM posts WHERE site = ? AND domain = ? AND {clauses} '
+            f'ORDER BY lastmod DESC LIMIT ?',
+            (site, SITE_CONFIG[site], *(f'% {word}%' for word in words), limit)
+        ).fetchall()
+        self.metrics['searches'] += 1
+        self.metrics['hits'] += bool(rows)
+        titles = [f"{i}. {title} ({site})" for i, (title, _) in enumerate(rows, 1)]
+        return titles, [url for _, url in rows]
+
+    def _get(self, session, url, headers=None):
+        with admission.slot(PRIORITY_BACKGROUND):
+            return hedged_get(session, url, headers=headers, timeout=15)
+
+    def _titles(self, site, session, urls):
+        """{url: title} for new or changed posts, from the REST API in slug batches where it answers."""
+        titles = {}
+        if 'rest' in fastpath.endpoints(site):
+            by_slug = {slug_of(url): url for url in urls}
+            slugs = list(by_slug)
+            for start in range(0, len(slugs), TITLE_BATCH):
+                batch = ','.join(slugs[start:start + TITLE_BATCH])
+                try:
+                    response = self._get(session, f"{rest_url(site, per_page=TITLE_BATCH)}&slug={batch}")
+                    response.raise_for_status()
+                    for title, link in parse_posts(response.text):
+                        titles[by_slug.get(slug_of(link), link)] = title
+                except Exception as e:
+                    logger.warning(f"Catalog title lookup failed on {site}, using slugs: {e}")
+                    break
+        return {url: titles.get(url) or title_from_slug(slug_of(url)) for url in urls}
+
+    def _fetch_index(self, site, session):
+        for path in SITEMAP_INDEXES:
+            try:
+                response = self._get(session, site_url(site, path))
+                if response.status_code == 200:
+                    return [(loc, lastmod) for loc, lastmod in parse_sitemap(response.text)
+                            if any(marker in loc for marker in POST_SITEMAP_MARKERS)]
+            except Exception as e:
+                logger.info(f"No sitemap index at {path} on {site}: {e}")
+        return None
+
+    def _sync_sitemap(self, site, session, conn, loc, lastmod, stored):
+        """Fetch one post sitemap if it changed and apply its additions, edits and removals."""
+        headers = {}
+        if stored and lastmod is None:
+            # No lastmod in the index: let the server say whether the sitemap changed
+            if stored['etag']:
+                headers['If-None-Match'] = stored['etag']
+            if stored['last_modified']:
+                headers['If-Modified-Since'] = stored['last_modified']
+        response = self._get(session, loc, headers)
+        if response.status_code == 304:
+            self.metrics['sitemaps_skipped'] += 1
+            return 0, 0
+        response.raise_for_status()
+        self.metrics['sitemaps_fetched'] += 1
+        domain = SITE_CONFIG[site]
+        entries = {url: modified for url, modified in parse_sitemap(response.text)
+                   if urlparse(url).path.strip('/')}  # The home page is not a post
+        known = dict(conn.execute('SELECT url, lastmod FROM posts WHERE site = ? AND sitemap = ?', (site, loc)).fetchall())
+        changed = [url for url, modified in entries.items() if url not in known or known[url] != modified]
+        removed = [url for url in known if url not in entries]
+        titles = self._titles(site, session, changed)
+
+        conn.execute('BEGIN')
+        try:
+            conn.executemany('DELETE FROM posts WHERE site = ? AND url = ?', [(site, url) for url in removed])
+            conn.executemany(
+                'INSERT OR REPLACE INTO posts (site, url, domain, sitemap, title, search_text, lastmod) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(site, url, domain, loc, titles[url], search_text(titles[url]), entries[url]) for url in changed]
+            )
+            conn.execute(
+                'INSERT OR REPLACE INTO sitemaps (site, url, lastmod, etag, last_modified, synced_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (site, loc, lastmod, response.headers.get('ETag'), response.headers.get('Last-Modified'), time.time())
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return len(changed), len(removed)
+
+    def sync(self, site):
+        """Bring a site's catalog up to date with its sitemap index; returns what changed."""
+        session = importlib.import_module(site).new_session()
+        conn = self._connect()
+        started = time.monotonic()
+        index = self._fetch_index(site, session)
+        if index is None:
+            logger.info(f"No post sitemaps found for {site}; catalog search stays off")
+            return {'sitemaps': 0}
+
+        stored = {row[0]: {'lastmod': row[1], 'etag': row[2], 'last_modified': row[3], 'synced_at': row[4]}
+                  for row in conn.execute('SELECT url, lastmod, etag, last_modified, synced_at FROM sitemaps WHERE site = ?', (site,))}
+        added = removed = fetched = 0
+        for loc, lastmod in index:
+            previous = stored.get(loc)
+            if (previous and lastmod is not None and previous['lastmod'] == lastmod
+                    and time.time() - previous['synced_at'] < CATALOG_REFETCH_AFTER):
+                self.metrics['sitemaps_skipped'] += 1
+                continue
+            changed, gone = self._sync_sitemap(site, session, conn, loc, lastmod, previous)
+            added, removed, fetched = added + changed, removed + gone, fetched + 1
+
+        listed = {loc for loc, _ in index}
+        dropped = [loc for loc in stored if loc not in listed]
+        conn.execute('BEGIN')
+        try:
+            conn.executemany('DELETE FROM posts WHERE site = ? AND sitemap = ?', [(site, loc) for loc in dropped])
+            conn.executemany('DELETE FROM sitemaps WHERE site = ? AND url = ?', [(site, loc) for loc in dropped])
+            total = conn.execute('SELECT COUNT(*) FROM posts WHERE site = ? AND domain = ?', (site, SITE_CONFIG[site])).fetchone()[0]
+            conn.execute('INSERT OR REPLACE INTO syncs (site, domain, synced_at, posts) VALUES (?, ?, ?, ?)',
+                         (site, SITE_CONFIG[site], time.time(), total))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self.metrics['syncs'] += 1
+        result = {'sitemaps': len(index), 'fetched': fetched, 'changed': added, 'removed': removed, 'posts': total,
+                  'seconds': round(time.monotonic() - started, 2)}
+        logger.info(f"Catalog sync for {site}: {result}")
+        return result
+
+    def sync_all(self, sites):
+        """Sync every site in turn (the scheduled job); one site's failure does not stop the others."""
+        results = {}
+        with self._sync_lock:
+            for site in sites:
+                try:
+                    results[site] = self.sync(site)
+                except Exception as e:
+                    logger.error(f"Catalog sync for {site} failed: {e}")
+                    results[site] = {'error': str(e)}
+        return results
+
+    def stats(self):
+        rows = self._connect().execute('SELECT site, domain, synced_at, posts FROM syncs').fetchall()
+        sites = {site: {'domain': domain, 'posts': posts, 'age': round(time.time() - synced_at),
+                        'ready': domain == SITE_CONFIG.get(site) and time.time() - synced_at < self.max_age}
+                 for site, domain, synced_at, posts in rows}
+        return {'sites': sites, **self.metrics}
+
+catalog = Catalog(CATALOG_PATH) if CATALOG_PATH else None
@@ -1,167 +1,125 @@
 import cloudscraper
-from bs4 import BeautifulSoup
+from memdiag import parse_html
+from dom_walk import walk_anchors
+import parse_pool
 import time
 import os
 import logging
+from config import site_url
+from hedge import hedged_get
+from wp_fastpath import fastpath
+from crawler import crawl_pages, MAX_PAGES
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+new_session = cloudscraper.create_scraper  # Session type for CineVood requests; wp_fastpath opens its REST/feed calls with it too
+
+def parse_listing_page(html):
+    """Extract (title, link) pairs and whether a next page exists from a listing page."""
+    with parse_html(html) as soup:
+        items = []
+        for element in soup.select('article.latestPost.excerpt'):
+            title_tag = element.select_one('h2.title.front-view-title a')
+            if title_tag:
+                title = title_tag.text.strip()
+                link = title_tag['href']
+                if title and not any(exclude in title.lower() for exclude in ['©', 'all rights reserved']):
+                    items.append((title, link))
+
+        pagination = soup.find('div', class_='pagination')
+        next_page = pagination.find('a', class_='next') if pagination else None
+        return items, next_page is not None
+
+def _crawl_listing(page_url, debug_prefix, stop_at=None):
+    """Crawl CineVood listing pages and return numbered titles and links."""
+    scraper = new_session()
+
+    def fetch_page(url):
+        logger.debug(f"Fetching CineVood page: {url}")
+        response = hedged_get(scraper, url, timeout=10)
+        response.raise_for_status()
+        logger.info(f"Status code for {url}: {response.status_code}")
+        return response.text
+
+    def parse_page(html, page):
+        items, has_next = parse_pool.parse('cinevood', 'listing_page', html)
+        logger.info(f"Found {len(items)} movie elements on page {page}")
+        if not items:
+            logger.warning(f"No movie elements found on page {page}")
+            with open(f"{debug_prefix}_{page}.html", "w", encoding="utf-8") as f:
+                f.write(html)
+            logger.info(f"Saved page HTML to {debug_prefix}_{page}.html")
+        return items, has_next
+
+    records = crawl_pages(fetch_page, page_url, parse_page, max_pages=MAX_PAGES, stop_at=stop_at)
+    all_titles = [f"{i}. {title} (cinevood)" for i, (title, _) in enumerate(records, 1)]
+    movie_links = [link for _, link in records]
+    return all_titles, movie_links
+
 def get_movie_titles_and_links(movie_name):
     """Search for movies on CineVood (up to 10 pages)."""
+    fast = fastpath.listing('cinevood', query=movie_name)
+    if fast is not None:
+        return fast
     search_query = f"{movie_name.replace(' ', '+').lower()}"
-    base_url = f"https://1cinevood.asia/?s={search_query}"
-    scraper = cloudscraper.create_scraper()
-    page = 1
-    max_pages = 10
-    all_titles = []
-    movie_links = []
-
-    while page <= max_pages:
-        url = base_url if page == 1 else f"https://1cinevood.asia/page/{page}/?s={search_query}"
-        logger.debug(f"Fetching CineVood page {page}: {url}")
-        try:
-            response = scraper.get(url, timeout=10)
-            response.raise_for_status()
-            logger.info(f"Status code for page {page}: {response.status_code}")
-
-            soup = BeautifulSoup(response.text, 'html.parser')
-            movie_elements = soup.select('article.latestPost.excerpt')
-            logger.info(f"Found {len(movie_elements)} movie elements on page {page}")
-
-            if not movie_elements:
-                logger.warning(f"No movie elements found on page {page}")
-                with open(f"debug_page_{page}.html", "w", encoding="utf-8") as f:
-                    f.write(response.text)
-                logger.info(f"Saved page HTML to debug_page_{page}.html")
-                break
-
-            movie_count = len(all_titles)
-            for element in movie_elements:
-                title_tag = element.select_one('h2.title.front-view-title a')
-                if title_tag:
-                    title = title_tag.text.strip()
-                    link = title_tag['href']
-                    if title and not any(exclude in title.lower() for exclude in ['©', 'all rights reserved']):
-                        movie_count += 1
-                        all_titles.append(f"{movie_count}. {title} (cinevood)")
-                        movie_links.append(link)
-
-            pagination = soup.find('div', class_='pagination')
-            next_page = pagination.find('a', class_='next') if pagination else None
-            if not next_page or page == max_pages:
-                logger.info(f"Stopping at page {page}")
-                break
-
-            page += 1
-            time.sleep(3)
-
-        except Exception as e:
-            logger.error(f"Error fetching page {page}: {e}")
-            break
 
+    def page_url(page):
+        if page == 1:
+            return site_url('cinevood', f"/?s={search_query}")
+        return site_url('cinevood', f"/page/{page}/?s={search_query}")
+
+    all_titles, movie_links = _crawl_listing(page_url, "debug_page")
     logger.info(f"Fetched {len(all_titles)} titles from CineVood search")
     return all_titles, movie_links
 
-def get_latest_movies():
-    """Fetch latest movies from CineVood's main pages (up to 10 pages)."""
-    base_url = f"https://1cinevood.asia/"
-    scraper = cloudscraper.create_scraper()
-    page = 1
-    max_pages = 10
-    all_titles = []
-    movie_links = []
-
-    while page <= max_pages:
-        url = base_url if page == 1 else f"https://1cinevood.asia/page/{page}/"
-        logger.debug(f"Fetching CineVood latest movies page {page}: {url}")
-        try:
-            response = scraper.get(url, timeout=10)
-            response.raise_for_status()
-            logger.info(f"Status code for page {page}: {response.status_code}")
-
-            soup = BeautifulSoup(response.text, 'html.parser')
-            movie_elements = soup.select('article.latestPost.excerpt')
-            logger.info(f"Found {len(movie_elements)} movie elements on page {page}")
-
-            if not movie_elements:
-                logger.warning(f"No movie elements found on page {page}")
-                with open(f"debug_latest_page_{page}.html", "w", encoding="utf-8") as f:
-                    f.write(response.text)
-                logger.info(f"Saved page HTML to debug_latest_page_{page}.html")
-                break
-
-            movie_count = len(all_titles)
-            for element in movie_elements:
-                title_tag = element.select_one('h2.title.front-view-title a')
-                if title_tag:
-                    title = title_tag.text.strip()
-                    link = title_tag['href']
-                    if title and not any(exclude in title.lower() for exclude in ['©', 'all rights reserved']):
-                        movie_count += 1
-                        all_titles.append(f"{movie_count}. {title} (cinevood)")
-                        movie_links.append(link)
-
-            pagination = soup.find('div', class_='pagination')
-            next_page = pagination.find('a', class_='next') if pagination else None
-            if not next_page or page == max_pages:
-                logger.info(f"Stopping at page {page}")
-                break
-
-            page += 1
-            time.sleep(3)
-
-        except Exception as e:
-            logger.error(f"Error fetching latest movies page {page}: {e}")
-            break
+def get_latest_movies(stop_at=None):
+    """Fetch latest movies from CineVood's main pages (up to 10 pages, or until a link in stop_at is seen)."""
+    fast = fastpath.listing('cinevood', stop_at=stop_at)
+    if fast is not None:
+        return fast
+    def page_url(page):
+        return site_url('cinevood') if page == 1 else site_url('cinevood', f"/page/{page}/")
 
+    all_titles, movie_links = _crawl_listing(page_url, "debug_latest_page", stop_at=stop_at)
     logger.info(f"Fetched {len(all_titles)} latest movies from CineVood")
     return all_titles, movie_links
 
+def parse_download_links(html):
+    """Extract "description [text]: url" download entries from a movie page."""
+    with parse_html(html) as soup:
+        # Containers that hold download links, in priority order; links list by container, then page order
+        containers = ['div.download-btns', 'div.entry-content', 'p', 'div.cat-btn-div2', 'a.maxbutton']
+        by_container = [[] for _ in containers]
+
+        # One pass over the page, tracking the latest h6 heading instead of searching back for it per link
+        for link_tag, scope, heading in walk_anchors(soup, containers, heading='h6'):
+            link_text = link_tag.text.strip()
+            link_url = link_tag['href']
+            if link_text and link_url and not any(exclude in link_text.lower() for exclude in ['watch online', 'trailer', 'telegram', 'join', 'home']):
+                # Describe the link by its h6 heading, else by its own text
+                description = heading if heading is not None else link_text
+                if any(indicator in description.lower() for indicator in ['download', 'gdflix', 'filepress', '1080p', '720p', '480p', 'hd']):
+                    by_container[scope].append(f"{description} [{link_text}]: {link_url}")
+
+        # Remove duplicates
+        return list(dict.fromkeys(link for links in by_container for link in links))
+
 def get_download_links(movie_url):
     """Fetch download links from CineVood movie page."""
-    scraper = cloudscraper.create_scraper()
-    download_links = []
+    scraper = new_session()
 
     logger.debug(f"Fetching CineVood movie page: {movie_url}")
     try:
-        response = scraper.get(movie_url, timeout=10)
+        response = hedged_get(scraper, movie_url, timeout=10)
         response.raise_for_status()
         logger.info(f"Status code for movie page: {response.status_code}")
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        # Multiple selectors to capture all download links
-        selectors = [
-            'div.download-btns a[href]',
-            'div.entry-content a[href]',
-            'p a[href]',
-            'div.cat-btn-div2 a[href]',
-            'a.maxbutton a[href]'
-        ]
-
-        for selector in selectors:
-            link_tags = soup.select(selector)
-            for link_tag in link_tags:
-                link_text = link_tag.text.strip()
-                link_url = link_tag['href']
-                if link_text and link_url and not any(exclude in link_text.lower() for exclude in ['watch online', 'trailer', 'telegram', 'join', 'home']):
-                    # Extract description from h6 or parent
-                    description = ""
-                    parent_h6 = link_tag.find_previous('h6')
-                    if parent_h6:
-                        description = parent_h6.text.strip()
-                    else:
-                        description = link_text
-                    if any(indicator in description.lower() for indicator in ['download', 'gdflix', 'filepress', '1080p', '720p', '480p', 'hd']):
-                        download_links.append(f"{description} [{link_text}]: {link_url}")
-
-        # Remove duplicates
-        unique_links = list(dict.fromkeys(download_links))
+        unique_links = parse_pool.parse('cinevood', 'download_links', response.text)
 
         if not unique_links:
             logger.warning("No download links found on movie page")
-            print.warning("No download page found on this page.")
             with open("debug_movie_page.html", "w", encoding="utf-8") as f:
                 try:
                     f.write(response.text)
@@ -174,4 +132,4 @@ def get_download_links(movie_url):
 
     except Exception as e:
         logger.error(f"Error fetching movie page: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -3,6 +3,8 @@ import json
 import logging
 from datetime import datetime
 import re
+import time
+from leader import file_lock
 
 # Initialize logging
 log_dir = "logs"
@@ -23,6 +25,13 @@ logger = logging.getLogger(__name__)
 ALLOWED_IDS = {5809601894, 1285451259}
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN')
 
+# Admin-only diagnostics: chats allowed to run /memory, and the bearer token for /debug/memory (unset disables it)
+ADMIN_IDS = {int(chat_id) for chat_id in os.environ.get('ADMIN_IDS', '').split(',') if chat_id.strip()} or set(ALLOWED_IDS)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Bearer token for the batch search API (unset disables /api/search)
+API_TOKEN = os.environ.get('API_TOKEN')
+
 # Site domains (default values)
 SITE_CONFIG = {
     'hdmovie2': 'hdmovie2.trading',
@@ -30,8 +39,16 @@ SITE_CONFIG = {
     'cinevood': '1cinevood.asia'
 }
 
-# File to store updated domains
+# Extra mirror domains per site, tried alongside the primary (see hedge.py); "mirrors" in site_config.json
+SITE_MIRRORS = {}  # {site: [domain]}
+
+# Scheme used to reach the sites (plain http only for local stand-ins)
+SITE_SCHEME = os.environ.get('SITE_SCHEME', 'https')
+
+# File to store updated domains; shared by every worker, which reloads it when it changes
 CONFIG_FILE = 'site_config.json'
+CONFIG_RELOAD_INTERVAL = float(os.environ.get('CONFIG_RELOAD_INTERVAL', 5))  # Seconds between checks for changes by other workers
+_config_mtime = None  # mtime of CONFIG_FILE when this process last read or wrote it
 
 def validate_domain(domain, site_key):
     """Accept any domain string for the given site without strict validation."""
@@ -45,15 +62,19 @@ def validate_domain(domain, site_key):
 
 def load_site_config():
     """Load site domains from file or use defaults."""
-    global SITE_CONFIG
+    global SITE_CONFIG, _config_mtime
     try:
         if os.path.exists(CONFIG_FILE):
+            _config_mtime = os.path.getmtime(CONFIG_FILE)
             with open(CONFIG_FILE, 'r') as f:
                 loaded_config = json.load(f)
                 # Validate loaded domains
                 for key in SITE_CONFIG.keys():
                     if key in loaded_config and validate_domain(loaded_config[key], key):
                         SITE_CONFIG[key] = loaded_config[key]
+                for key, domains in (loaded_config.get('mirrors') or {}).items():
+                    if key in SITE_CONFIG and isinstance(domains, list):
+                        SITE_MIRRORS[key] = [domain for domain in domains if isinstance(domain, str) and validate_domain(domain, key)]
                 logger.info("Loaded site config from file")
         else:
             logger.info("No site_config.json found, using default SITE_CONFIG")
@@ -63,13 +84,49 @@ def load_site_config():
 
 def save_site_config():
     """Save site domains to file."""
+    global _config_mtime
     try:
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(SITE_CONFIG, f, indent=2)
+        tmp_path = f"{CONFIG_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({**SITE_CONFIG, 'mirrors': SITE_MIRRORS} if SITE_MIRRORS else SITE_CONFIG, f, indent=2)
+        os.replace(tmp_path, CONFIG_FILE)
+        _config_mtime = os.path.getmtime(CONFIG_FILE)
         logger.info("Saved site config to file")
     except Exception as e:
         logger.error(f"Error saving site config: {e}")
 
+def reload_site_config():
+    """Pick up domains another worker saved since this one last read the file; True when reloaded."""
+    try:
+        mtime = os.path.getmtime(CONFIG_FILE)
+    except OSError:
+        return False
+    if mtime == _config_mtime:
+        return False
+    previous = dict(SITE_CONFIG)
+    load_site_config()
+    for key, domain in SITE_CONFIG.items():
+        if previous.get(key) != domain:
+            logger.info(f"Picked up {key} domain {domain} from {CONFIG_FILE}")
+    return True
+
+def watch_site_config(interval=CONFIG_RELOAD_INTERVAL):
+    """Keep this process's SITE_CONFIG in step with CONFIG_FILE (run in a daemon thread per worker)."""
+    while True:
+        time.sleep(interval)
+        try:
+            reload_site_config()
+        except Exception as e:
+            logger.error(f"Error reloading site config: {e}")
+
+def site_url(site_key, path='/'):
+    """Build a URL on the currently configured domain for a site."""
+    return f"{SITE_SCHEME}://{SITE_CONFIG[site_key]}{path}"
+
+def site_domains(site_key):
+    """The primary domain of a site followed by its mirrors."""
+    return list(dict.fromkeys([SITE_CONFIG[site_key], *SITE_MIRRORS.get(site_key, [])]))
+
 def update_site_domain(site_key, new_domain):
     """Update a site's domain and save to file."""
     if site_key not in SITE_CONFIG:
@@ -83,9 +140,11 @@ def update_site_domain(site_key, new_domain):
         logger.warning(f"Invalid domain for {site_key}: {cleaned_domain}")
         return False
 
-    # Update and save
-    SITE_CONFIG[site_key] = cleaned_domain
-    save_site_config()
+    # Update and save, starting from the file so other workers' changes are kept
+    with file_lock(f"{CONFIG_FILE}.lock"):
+        reload_site_config()
+        SITE_CONFIG[site_key] = cleaned_domain
+        save_site_config()
     logger.info(f"Updated {site_key} domain to {cleaned_domain}")
     return True
 
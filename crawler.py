@@ -0,0 +1,57 @@
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGES = 10
+
+def reached_known(page_items, stop_at):
+    """True when a page of (title, link) items contains one of the known links."""
+    return bool(stop_at) and any(link in stop_at for _, link in page_items)
+
+def crawl_pages(fetch_page, page_url, parse_page, max_pages=MAX_PAGES, label="page", stop_at=None):
+    """Crawl a paginated listing, fetching page N+1 while page N is being parsed.
+
+    fetch_page(url) returns the page HTML, page_url(n) builds the URL of page n and
+    parse_page(html, n) returns (items, has_next). Pacing is left to fetch_page (see
+    throttle.throttled_get). The speculative fetch of the next page is discarded when
+    the current page has no results or no next link, or when it contains a link from
+    stop_at (already-seen posts for incremental crawls).
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='crawl')
+    stopped = threading.Event()
+    items = []
+
+    def fetch(page):
+        # A crawl that already finished skips a speculative request still waiting for its turn
+        if stopped.is_set():
+            return None
+        return fetch_page(page_url(page))
+
+    try:
+        future = executor.submit(fetch, 1)
+        for page in range(1, max_pages + 1):
+            try:
+                html = future.result()
+            except Exception as e:
+                logger.error(f"Error fetching {label} {page}: {e}")
+                break
+
+            # Start the next request before parsing so network and parse time overlap
+            next_future = executor.submit(fetch, page + 1) if page < max_pages else None
+
+            page_items, has_next = parse_page(html, page)
+            items.extend(page_items)
+
+            if not page_items or not has_next or next_future is None or reached_known(page_items, stop_at):
+                if next_future is not None and not next_future.cancel():
+                    logger.debug(f"Discarding speculative fetch of {label} {page + 1}")
+                logger.info(f"Stopping at {label} {page}")
+                break
+            future = next_future
+    finally:
+        stopped.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return items
@@ -0,0 +1,33 @@
+def _matcher(selector):
+    """(name, id, class) from a simple 'tag#id' or 'tag.class' selector."""
+    name, _, klass = selector.partition('.')
+    name, _, ident = name.partition('#')
+    return name or None, ident or None, klass or None
+
+def _matches(tag, matcher):
+    name, ident, klass = matcher
+    return ((name is None or tag.name == name)
+            and (ident is None or tag.get('id') == ident)
+            and (klass is None or klass in (tag.get('class') or ())))
+
+def walk_anchors(soup, containers, heading=None):
+    """Yield (anchor, scope, heading_text) for each a[href] inside one of the containers, in document order.
+
+    One forward pre-order pass replaces running "container a[href]" selectors one
+    after another: scope is the index of the first listed container the anchor
+    sits in (so callers can keep the old selector precedence), and heading_text is
+    the text of the latest <heading> tag opened before the anchor (what
+    find_previous(heading) returned), or None. Each anchor is visited once.
+    """
+    matchers = [_matcher(selector) for selector in containers]
+    outside = len(matchers)
+    current = None
+    stack = [(soup, outside)]
+    while stack:
+        node, scope = stack.pop()
+        if node.name == heading:
+            current = node.text.strip()
+        elif node.name == 'a' and scope < outside and node.has_attr('href'):
+            yield node, scope, current
+        own = next((i for i, matcher in enumerate(matchers) if i < scope and _matches(node, matcher)), scope)
+        stack.extend((child, own) for child in reversed(node.contents) if child.name is not None)
@@ -0,0 +1,132 @@
+import os
+import re
+import json
+import logging
+import requests
+from datetime import datetime
+from urllib.parse import urlparse, urljoin
+from config import SITE_CONFIG, SITE_SCHEME, update_site_domain
+
+logger = logging.getLogger(__name__)
+
+DOMAIN_CHECK_INTERVAL = int(os.environ.get('DOMAIN_CHECK_INTERVAL', 1800))  # Seconds between probe rounds
+DOMAIN_FAILURE_THRESHOLD = 3  # Consecutive failed probes before a domain is reported dead
+DOMAIN_AUDIT_FILE = 'domain_audit.jsonl'
+MAX_REDIRECT_HOPS = 5
+PERMANENT_REDIRECTS = (301, 308)
+PARKED_MARKERS = [
+    'domain is for sale', 'buy this domain', 'this domain may be for sale', 'domain parking',
+    'parkingcrew', 'sedoparking', 'bodis.com', 'hugedomains', 'dan.com', 'afternic'
+]
+META_REFRESH_RE = re.compile(r'<meta[^>]+http-equiv=["\']?refresh["\']?[^>]+url=([^"\'>\s]+)', re.IGNORECASE)
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
+}
+
+# Latest probe outcome per site
+domain_health = {}  # {site: {'domain': str, 'status': str, 'detail': str, 'failures': int, 'checked_at': str}}
+
+def audit(event, **fields):
+    """Append a domain event to the audit log."""
+    entry = {'time': datetime.now().isoformat(), 'event': event, **fields}
+    try:
+        with open(DOMAIN_AUDIT_FILE, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+    except Exception as e:
+        logger.error(f"Error writing domain audit log: {e}")
+    logger.info(f"Domain audit: {entry}")
+
+def _host(url):
+    return urlparse(url).netloc.lower()
+
+def _is_parked(html):
+    text = html[:20000].lower()
+    return any(marker in text for marker in PARKED_MARKERS)
+
+def probe_domain(domain):
+    """Probe a domain and classify it as ok, moved, parked or dead.
+
+    Only permanent redirects (301/308) and meta refreshes to another host count as
+    moves; temporary redirects are followed but never trigger a domain change.
+    """
+    session = requests.Session()
+    url = f"{SITE_SCHEME}://{domain}/"
+    permanent = True
+    try:
+        for _ in range(MAX_REDIRECT_HOPS):
+            response = session.get(url, headers=HEADERS, timeout=10, allow_redirects=False)
+            if not response.is_redirect:
+                break
+            permanent = permanent and response.status_code in PERMANENT_REDIRECTS
+            url = urljoin(url, response.headers.get('Location', ''))
+        else:
+            return {'status': 'dead', 'detail': 'too many redirects'}
+    except requests.RequestException as e:
+        return {'status': 'dead', 'detail': str(e)}
+
+    final_host = _host(url)
+    if final_host and final_host != domain.lower() and permanent:
+        if response.status_code < 400 and _is_parked(response.text):
+            return {'status': 'parked', 'detail': f"redirects to parked host {final_host}"}
+        return {'status': 'moved', 'new_domain': final_host, 'detail': f"permanent redirect to {final_host}"}
+
+    # Cloudflare challenges still mean the site itself is up
+    if response.status_code in (403, 503) and 'cloudflare' in response.headers.get('Server', '').lower():
+        return {'status': 'ok', 'detail': f"cloudflare {response.status_code}"}
+    if response.status_code >= 400:
+        return {'status': 'dead', 'detail': f"HTTP {response.status_code}"}
+    if _is_parked(response.text):
+        return {'status': 'parked', 'detail': 'parked page content'}
+
+    match = META_REFRESH_RE.search(response.text[:20000])
+    if match:
+        target_host = _host(urljoin(url, match.group(1)))
+        if target_host and target_host != domain.lower():
+            return {'status': 'moved', 'new_domain': target_host, 'detail': f"meta refresh to {target_host}"}
+
+    return {'status': 'ok', 'detail': f"HTTP {response.status_code}"}
+
+def check_site(site_key):
+    """Probe one site's domain and fail over when it has permanently moved."""
+    domain = SITE_CONFIG[site_key]
+    result = probe_domain(domain)
+    previous = domain_health.get(site_key, {})
+    unhealthy = result['status'] in ('dead', 'parked')
+    failures = previous.get('failures', 0) + 1 if unhealthy and previous.get('domain') == domain else int(unhealthy)
+
+    if result['status'] == 'moved':
+        new_domain = result['new_domain']
+        moved = probe_domain(new_domain)
+        if moved['status'] == 'ok' and update_site_domain(site_key, new_domain):
+            audit('failover', site=site_key, old_domain=domain, new_domain=new_domain, reason=result['detail'])
+            domain = new_domain
+            result = moved
+        else:
+            audit('failover_skipped', site=site_key, old_domain=domain, new_domain=new_domain,
+                  reason=f"target not healthy: {moved['detail']}")
+    elif unhealthy and failures == DOMAIN_FAILURE_THRESHOLD:
+        # No successor is known for a dead or parked domain, so it is only reported
+        audit(f"domain_{result['status']}", site=site_key, domain=domain, reason=result['detail'])
+    elif not unhealthy and previous.get('failures', 0) >= DOMAIN_FAILURE_THRESHOLD:
+        audit('domain_recovered', site=site_key, domain=domain)
+
+    domain_health[site_key] = {
+        'domain': domain,
+        'status': result['status'],
+        'detail': result['detail'],
+        'failures': failures,
+        'checked_at': datetime.now().isoformat()
+    }
+    if result['status'] != 'ok':
+        logger.warning(f"Domain check for {site_key} ({domain}): {result['status']} - {result['detail']}")
+    return domain_health[site_key]
+
+def check_all_sites():
+    """Probe every configured site domain once and return the health table."""
+    for site_key in list(SITE_CONFIG.keys()):
+        try:
+            check_site(site_key)
+        except Exception as e:
+            logger.error(f"Domain check failed for {site_key}: {e}")
+    return domain_health
@@ -0,0 +1,172 @@
+import os
+import time
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+import requests
+from config import SITE_CONFIG, site_domains
+from throttle import throttled_get
+
+logger = logging.getLogger(__name__)
+
+HEDGE_ENABLED = os.environ.get('HEDGE_ENABLED', '1') != '0'
+HEDGE_DEFAULT_DELAY = float(os.environ.get('HEDGE_DEFAULT_DELAY', 1.5))  # Seconds before hedging while a mirror has few samples
+HEDGE_MAX_RATIO = float(os.environ.get('HEDGE_MAX_RATIO', 0.2))  # Most requests that may send a second copy
+HEDGE_WORKERS = int(os.environ.get('HEDGE_WORKERS', 16))
+LATENCY_WINDOW = 50  # Recent samples kept per mirror
+MIN_SAMPLES = 5  # Samples needed before a mirror's own p90 is trusted
+FAILURE_LIMIT = 3  # Consecutive failures that move a mirror to the back of the line
+
+class MirrorTracker:
+    """Per-mirror latency windows used to order mirrors and time hedged requests."""
+
+    def __init__(self):
+        self._samples = {}  # {domain: deque of seconds}
+        self._failures = {}  # {domain: consecutive failures}
+        self._lock = threading.Lock()
+        self.metrics = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'failovers': 0}
+
+    def record(self, domain, seconds=None, ok=True):
+        with self._lock:
+            if ok:
+                self._samples.setdefault(domain, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+                self._failures[domain] = 0
+            else:
+                self._failures[domain] = self._failures.get(domain, 0) + 1
+
+    def percentile(self, domain, pct):
+        with self._lock:
+            samples = sorted(self._samples.get(domain, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+    def candidates(self, url):
+        """The same URL on every mirror of its site, most promising first; just [url] for unmirrored hosts."""
+        parsed = urlparse(url)
+        host = parsed.netloc.lower()
+        site = next((site for site in SITE_CONFIG if host in site_domains(site)), None)
+        if not HEDGE_ENABLED or site is None:
+            return [url]
+        domains = site_domains(site)
+        if len(domains) < 2:
+            return [url]
+
+        def rank(item):
+            order, domain = item
+            # Healthy before failing, fastest median first; mirrors without samples yet go first to get some
+            return self._failures.get(domain, 0) >= FAILURE_LIMIT, self.percentile(domain, 50) or 0.0, order
+        ordered = [domain for _, domain in sorted(enumerate(domains), key=rank)]
+        return [parsed._replace(netloc=domain).geturl() for domain in ordered]
+
+    def hedge_delay(self, url):
+        """How long to wait on a mirror before hedging: its p90, or a default until it has history."""
+        return self.percentile(urlparse(url).netloc.lower(), 90) or HEDGE_DEFAULT_DELAY
+
+    def count(self, name):
+        with self._lock:
+            self.metrics[name] += 1
+
+    def take_hedge(self):
+        """Spend one hedge from the budget (HEDGE_MAX_RATIO of requests); False when it is used up."""
+        with self._lock:
+            if self.metrics['hedged'] >= HEDGE_MAX_RATIO * max(1, self.metrics['requests']):
+                return False
+            self.metrics['hedged'] += 1
+            return True
+
+    def stats(self):
+        with self._lock:
+            domains = list(self._samples.keys() | self._failures.keys())
+            metrics = dict(self.metrics)
+        return {**metrics, 'mirrors': {domain: {'p50': self.percentile(domain, 50), 'p90': self.percentile(domain, 90),
+                                                     'failures': self._failures.get(domain, 0)} for domain in domains}}
+
+mirrors = MirrorTracker()
+_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hedge')
+
+def _clone(session):
+    """A session of the caller's kind carrying its headers and cookies (e.g. a solved CineVood challenge)."""
+    clone = type(session)()
+    clone.headers.update(session.headers)
+    clone.cookies.update(session.cookies)
+    return clone
+
+def _attempt(session, url, cancelled, kwargs, owned=False):
+    """Fetch url with its body deferred; a request that lost the race is closed once its headers arrive."""
+    domain = urlparse(url).netloc.lower()
+    started = time.monotonic()
+    try:
+        response = throttled_get(session, url, stream=True, **kwargs)
+        if cancelled.is_set():
+            response.close()
+            mirrors.record(domain, time.monotonic() - started)
+            return None
+        response.content  # Read the body now that this request is the one being used
+        mirrors.record(domain, time.monotonic() - started, ok=response.status_code < 500)
+        return response
+    except requests.RequestException:
+        mirrors.record(domain, ok=False)
+        raise
+    finally:
+        if owned:
+            session.close()
+
+def hedged_get(session, url, **kwargs):
+    """GET a site page from its fastest mirror, hedging to the next one after that mirror's p90.
+
+    Unmirrored URLs go straight to throttled_get. Otherwise the first successful
+    response wins; errors fail over to the next mirror at once, and a request
+    outliving the winner is dropped without reading its body. Sessions are not
+    thread-safe and a losing request may still be running after this returns, so
+    every attempt runs on its own clone of the caller's session; the winner's
+    cookies are copied back.
+    """
+    candidates = mirrors.candidates(url)
+    if len(candidates) == 1:
+        return throttled_get(session, url, **kwargs)
+    kwargs.pop('stream', None)
+    mirrors.count('requests')
+
+    cancelled = threading.Event()
+    futures = {_executor.submit(_attempt, _clone(session), candidates[0], cancelled, kwargs, True): 0}
+    pending = set(futures)
+    delay = mirrors.hedge_delay(candidates[0])
+    last_error = fallback = None
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=delay if len(futures) < len(candidates) else None,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.RequestException as e:
+                    last_error = e
+                    continue
+                if response is not None and response.status_code < 400:
+                    if futures[future] > 0 and pending:
+                        mirrors.count('hedge_wins')
+                    session.cookies.update(response.cookies)
+                    return response
+                if response is not None:
+                    fallback = response
+
+            if len(futures) < len(candidates) and (done or mirrors.take_hedge()):
+                index = len(futures)
+                if done:
+                    mirrors.count('failovers')
+                logger.info(f"{'Failing over' if done else 'Hedging'} {url} to {candidates[index]}")
+                future = _executor.submit(_attempt, _clone(session), candidates[index], cancelled, kwargs, True)
+                futures[future] = index
+                pending.add(future)
+                delay = mirrors.hedge_delay(candidates[index])
+            elif not done:
+                delay = None  # Hedge budget spent: wait for what is in flight
+    finally:
+        cancelled.set()
+
+    if fallback is not None:
+        return fallback
+    raise last_error or requests.RequestException(f"No mirror answered for {url}")
@@ -0,0 +1,128 @@
+import os
+import re
+import asyncio
+import threading
+import time
+import logging
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+LATEST_FEED_MAX_ITEMS = int(os.environ.get('LATEST_FEED_MAX_ITEMS', 200))  # Posts remembered per site
+LATEST_FULL_CRAWL_INTERVAL = int(os.environ.get('LATEST_FULL_CRAWL_INTERVAL', 6 * 3600))  # Seconds between full re-crawls
+LATEST_FEED_TTL = 7 * 24 * 3600
+WATERMARK_SIZE = 5  # Newest known posts checked, so a deleted watermark post does not force a full crawl
+
+_NUMBER_PREFIX = re.compile(r'^\d+\.\s+')
+
+def strip_numbering(title, site):
+    """Turn a "N. title (site)" display title back into the bare title."""
+    title = _NUMBER_PREFIX.sub('', title)
+    suffix = f" ({site})"
+    return title[:-len(suffix)] if title.endswith(suffix) else title
+
+class LatestFeed:
+    """Per-site latest-post lists kept up to date by incremental (watermark) crawls.
+
+    Each site remembers its stored post list. A refresh crawls only until a page
+    contains one of the newest known posts and merges the new posts in front, so
+    it usually costs one listing page. A full crawl still runs when nothing is
+    stored yet or the stored list is older than LATEST_FULL_CRAWL_INTERVAL.
+    """
+
+    def __init__(self, fetch_fn, store=None, max_items=LATEST_FEED_MAX_ITEMS,
+                 full_crawl_interval=LATEST_FULL_CRAWL_INTERVAL, on_new_items=None, on_merged=None):
+        self.fetch_fn = fetch_fn  # fetch_fn(site, stop_at) -> (numbered titles, links)
+        self.on_new_items = on_new_items  # called as on_new_items(site, [(title, link)]) for posts not seen before
+        self.on_merged = on_merged  # called as on_merged(site, [(title, link)]) with the crawled posts of every merge
+        self.max_items = max_items
+        self.full_crawl_interval = full_crawl_interval
+        self.feeds = TTLCache('latest_feed', LATEST_FEED_TTL, max_entries=16, store=store)  # {site: feed}
+        self._locks = {}  # {site: Lock}
+        self._lock = threading.Lock()
+        self.metrics = {'incremental': 0, 'full': 0, 'new_items': 0}
+
+    def stop_at(self, site):
+        """Return the watermark links for an incremental crawl, or None when a full crawl is due."""
+        feed = self.feeds.get(site)
+        if not feed or not feed['items'] or time.time() - feed['full_crawl_at'] > self.full_crawl_interval:
+            return None
+        return {link for _, link in feed['items'][:WATERMARK_SIZE]}
+
+    def merge(self, site, titles, links, full=False):
+        """Merge freshly crawled posts into the stored list and return numbered titles and links."""
+        crawled = [(strip_numbering(title, site), link) for title, link in zip(titles, links)]
+        feed = self.feeds.get(site)
+        previous = [tuple(item) for item in feed['items']] if feed else []
+        known = {link for _, link in previous}
+        new_items = [item for item in crawled if item[1] not in known]
+        crawled_links = {link for _, link in crawled}
+        # Crawled posts come first in site order; older stored posts follow unless this was a full crawl
+        items = crawled if full else crawled + [item for item in previous if item[1] not in crawled_links]
+        items = items[:self.max_items]
+
+        now = time.time()
+        self.feeds.set(site, {
+            'items': [list(item) for item in items],
+            'refreshed_at': now,
+            'full_crawl_at': now if full or not feed else feed['full_crawl_at']
+        })
+        self.metrics['full' if full else 'incremental'] += 1
+        self.metrics['new_items'] += len(new_items)
+        logger.info(f"Latest feed for {site}: {len(new_items)} new of {len(crawled)} crawled, "
+                    f"{len(items)} stored ({'full' if full else 'incremental'} crawl)")
+        # The very first crawl of a site has nothing to compare against, so it announces nothing
+        if previous and new_items and self.on_new_items:
+            try:
+                self.on_new_items(site, new_items)
+            except Exception as e:
+                logger.error(f"Error handling new latest items for {site}: {e}")
+        if self.on_merged:
+            try:
+                self.on_merged(site, crawled)
+            except Exception as e:
+                logger.error(f"Error handling merged latest items for {site}: {e}")
+        titles = [f"{i}. {title} ({site})" for i, (title, _) in enumerate(items, 1)]
+        return titles, [link for _, link in items]
+
+    def _site_lock(self, site):
+        with self._lock:
+            return self._locks.setdefault(site, threading.Lock())
+
+    def _finish(self, site, stop_at, titles, links):
+        if not titles:
+            feed = self.feeds.get(site)
+            if feed and feed['items']:
+                # Nothing crawled (error or empty page); serve what we already know
+                logger.warning(f"Latest crawl for {site} returned nothing; using {len(feed['items'])} stored posts")
+                items = feed['items']
+                return [f"{i}. {title} ({site})" for i, (title, _) in enumerate(items, 1)], [link for _, link in items]
+            return titles, links
+        return self.merge(site, titles, links, full=stop_at is None)
+
+    def refresh(self, site, fetch=None):
+        """Crawl a site's latest listing incrementally and return the merged titles and links.
+
+        fetch(site, stop_at) overrides the crawler given at construction. Refreshes of
+        one site are serialized, so each merges against the watermark the last one left.
+        """
+        with self._site_lock(site):
+            stop_at = self.stop_at(site)
+            titles, links = (fetch or self.fetch_fn)(site, stop_at)
+            return self._finish(site, stop_at, titles, links)
+
+    async def refresh_async(self, site, fetch):
+        """refresh() for coroutines: fetch(site, stop_at) is awaited and the store is touched off the loop."""
+        site_lock = self._site_lock(site)
+        # Poll rather than block a thread on the lock, so a cancelled task never ends up holding it
+        while not site_lock.acquire(blocking=False):
+            await asyncio.sleep(0.05)
+        try:
+            stop_at = await asyncio.to_thread(self.stop_at, site)
+            titles, links = await fetch(site, stop_at)
+            return await asyncio.to_thread(self._finish, site, stop_at, titles, links)
+        finally:
+            site_lock.release()
+
+    def stats(self):
+        return dict(self.metrics)
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows: one process, so it simply leads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LEADER_LOCK_FILE = os.environ.get('LEADER_LOCK_FILE', 'scheduler.lock')
+SCHEDULER_STATUS_FILE = os.environ.get('SCHEDULER_STATUS_FILE', 'scheduler_status.json')
+HEARTBEAT_INTERVAL = float(os.environ.get('HEARTBEAT_INTERVAL', 5))  # Seconds between heartbeats and election attempts
+STALE_AFTER = 6 * HEARTBEAT_INTERVAL  # A heartbeat older than this means the leader is hung
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive flock on path for the with-block, serializing read-modify-write of shared files."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a+') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class _Job:
+    def __init__(self, name, fn, interval, initial_delay):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self.next_run = None
+        self.running = False
+        self.status = {'runs': 0, 'errors': 0, 'last_run': None, 'last_duration': None, 'last_error': None, 'result': None}
+
+class Scheduler:
+    """Run periodic jobs in exactly one process per host.
+
+    Every worker process starts a scheduler; they compete for an exclusive flock on
+    LEADER_LOCK_FILE and only the holder runs jobs. The kernel drops the lock when
+    the leader exits or crashes, so a follower takes over within one heartbeat.
+    The leader writes a heartbeat plus per-job status to SCHEDULER_STATUS_FILE, which
+    any worker can read through status(). A leader that hangs while holding the lock
+    stops heartbeating: once its heartbeat is older than STALE_AFTER a follower
+    takes over without the lock, and a leader that finds a fresh heartbeat from
+    another process steps down.
+    """
+
+    def __init__(self, lock_path=LEADER_LOCK_FILE, status_path=SCHEDULER_STATUS_FILE, heartbeat=HEARTBEAT_INTERVAL):
+        self.lock_path = lock_path
+        self.status_path = status_path
+        self.heartbeat = heartbeat
+        self.is_leader = False
+        self._holds_lock = False
+        self._jobs = {}  # {name: _Job}
+        self._lock_file = None
+        self._lock = threading.Lock()
+        self._executor = None
+        self._thread = None
+        self.metrics = {'elections_won': 0, 'takeovers': 0, 'stepped_down': 0}
+
+    def add(self, name, fn, interval, initial_delay=0):
+        """Run fn() every interval seconds on the leader; its return value is kept as the job's result."""
+        self._jobs[name] = _Job(name, fn, interval, initial_delay)
+
+    def start(self):
+        if self._thread is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(1, len(self._jobs)), thread_name_prefix='job')
+            self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+            self._thread.start()
+
+    def _try_lead(self):
+        if fcntl is None:
+            return True
+        if self._lock_file is None:
+            self._lock_file = open(self.lock_path, 'a+')
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _release_lock(self):
+        if fcntl is not None and self._lock_file is not None and self._holds_lock:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+        self._holds_lock = False
+
+    def _read_status(self):
+        try:
+            with open(self.status_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _lead(self):
+        self.is_leader = True
+        now = time.monotonic()
+        for job in self._jobs.values():
+            job.next_run = now + job.initial_delay
+
+    def _loop(self):
+        while True:
+            try:
+                if not self._holds_lock and self._try_lead():
+                    self._holds_lock = True
+                    if not self.is_leader:
+                        self._lead()
+                        self.metrics['elections_won'] += 1
+                        logger.info(f"Process {os.getpid()} is now the scheduler leader")
+                    self._write_status()  # Claim the status file before a previous leader's heartbeat looks live
+                elif not self.is_leader:
+                    status = self._read_status()
+                    heartbeat_at = status.get('heartbeat_at')
+                    if heartbeat_at and time.time() - heartbeat_at > STALE_AFTER:
+                        self._lead()
+                        self.metrics['takeovers'] += 1
+                        logger.error(f"Scheduler leader {status.get('leader_pid')} holds the lock but has not "
+                                     f"heartbeated for {time.time() - heartbeat_at:.0f}s; process {os.getpid()} "
+                                     f"is taking over its jobs")
+                if self.is_leader:
+                    status = self._read_status()
+                    if (status.get('leader_pid') not in (None, os.getpid())
+                            and time.time() - (status.get('heartbeat_at') or 0) <= STALE_AFTER):
+                        # Another process took over while this one was hung
+                        self.is_leader = False
+                        self._release_lock()
+                        self.metrics['stepped_down'] += 1
+                        logger.error(f"Process {os.getpid()} found process {status['leader_pid']} leading; stepping down")
+                    else:
+                        self._run_due()
+                        self._write_status()
+            except Exception as e:
+                logger.error(f"Scheduler error: {e}")
+            time.sleep(self.heartbeat)
+
+    def _run_due(self):
+        now = time.monotonic()
+        for job in self._jobs.values():
+            with self._lock:
+                if job.running or now < job.next_run:
+                    continue
+                job.running = True
+            self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        started = time.monotonic()
+        job.status['last_run'] = datetime.now().isoformat()
+        try:
+            job.status['result'] = job.fn()
+            job.status['last_error'] = None
+        except Exception as e:
+            job.status['errors'] += 1
+            job.status['last_error'] = str(e)
+            logger.error(f"Scheduled job {job.name} failed: {e}")
+        finally:
+            job.status['runs'] += 1
+            job.status['last_duration'] = round(time.monotonic() - started, 2)
+            with self._lock:
+                job.running = False
+                job.next_run = time.monotonic() + job.interval
+
+    def _write_status(self):
+        now = time.monotonic()
+        status = {
+            'leader_pid': os.getpid(),
+            'heartbeat_at': time.time(),
+            'jobs': {name: {**job.status, 'running': job.running, 'interval': job.interval,
+                            'next_run_in': round(max(0.0, job.next_run - now), 1)}
+                     for name, job in self._jobs.items()}
+        }
+        temp_path = f"{self.status_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(status, f, default=str)
+        os.replace(temp_path, self.status_path)
+
+    def status(self):
+        """The leader's last published status, as seen from this process."""
+        try:
+            with open(self.status_path) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            status = {'leader_pid': None, 'heartbeat_at': None, 'jobs': {}}
+        heartbeat_at = status.get('heartbeat_at')
+        status['heartbeat_age'] = round(time.time() - heartbeat_at, 1) if heartbeat_at else None
+        status['stale'] = heartbeat_at is None or time.time() - heartbeat_at > STALE_AFTER
+        status['this_process'] = {'pid': os.getpid(), 'is_leader': self.is_leader, **self.metrics}
+        return status
@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+import logging
+import requests
+from concurrent.futures import ThreadPoolExecutor, wait
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+LIVENESS_ENABLED = os.environ.get('LIVENESS_ENABLED', '1') != '0'
+LIVENESS_HIDE_DEAD = os.environ.get('LIVENESS_HIDE_DEAD', '0') == '1'  # Hide dead links instead of listing them last
+LIVENESS_WORKERS = int(os.environ.get('LIVENESS_WORKERS', 16))
+LIVENESS_TIMEOUT = float(os.environ.get('LIVENESS_TIMEOUT', 2))  # Seconds per probe
+LIVENESS_DEADLINE = float(os.environ.get('LIVENESS_DEADLINE', 3))  # Seconds a whole batch may take
+LIVE_TTL = 30 * 60
+DEAD_TTL = 10 * 60
+UNKNOWN_TTL = 2 * 60
+DEAD_STATUSES = {404, 410, 451}
+HEAD_UNSUPPORTED = {400, 403, 405, 501}
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36'
+}
+
+class LivenessChecker:
+    """Probe download links concurrently and order them live-and-fast first.
+
+    Verdicts ('live', 'dead' or 'unknown' plus latency) are cached per URL, with a
+    shorter TTL for dead and unknown links so a flaky host gets re-checked soon.
+    """
+
+    def __init__(self, workers=LIVENESS_WORKERS, timeout=LIVENESS_TIMEOUT, deadline=LIVENESS_DEADLINE,
+                 hide_dead=LIVENESS_HIDE_DEAD, enabled=LIVENESS_ENABLED, store=None):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.hide_dead = hide_dead
+        self.enabled = enabled
+        self.cache = TTLCache('link_liveness', LIVE_TTL, max_entries=8192, store=store)  # {url: verdict}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='liveness')
+        self._local = threading.local()  # Sessions aren't thread-safe: one per probe thread
+        self._lock = threading.Lock()
+        self.metrics = {'live': 0, 'dead': 0, 'unknown': 0, 'cache_hits': 0, 'timeouts': 0}
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.metrics[name] += amount
+
+    def probe(self, url):
+        """HEAD the URL (ranged GET when HEAD is refused) and return a verdict dict."""
+        started = time.monotonic()
+        session = self._session()
+        try:
+            response = session.head(url, headers=HEADERS, timeout=self.timeout, allow_redirects=True)
+            if response.status_code in HEAD_UNSUPPORTED:
+                with session.get(url, headers={**HEADERS, 'Range': 'bytes=0-0'}, timeout=self.timeout,
+                                       allow_redirects=True, stream=True) as response:
+                    pass
+            status = response.status_code
+            state = 'live' if status < 400 else 'dead' if status in DEAD_STATUSES else 'unknown'
+        except requests.RequestException as e:
+            logger.debug(f"Liveness probe failed for {url}: {e}")
+            status, state = None, 'unknown'
+        return {'state': state, 'status': status, 'latency': round(time.monotonic() - started, 3)}
+
+    def check(self, url):
+        verdict = self.cache.get(url)
+        if verdict is not None:
+            self._count('cache_hits')
+            return verdict
+        verdict = self.probe(url)
+        self._count(verdict['state'])
+        ttl = {'live': LIVE_TTL, 'dead': DEAD_TTL}.get(verdict['state'], UNKNOWN_TTL)
+        self.cache.set(url, verdict, ttl=ttl)
+        return verdict
+
+    def warm(self, entries):
+        """Probe uncached links in the background so a later rank() finds their verdicts cached."""
+        if not self.enabled:
+            return
+        for entry in entries:
+            url = entry.rpartition(': ')[2].strip()
+            if self.cache.get(url) is None:
+                self._executor.submit(self.check, url)
+
+    def rank(self, entries, cached_only=False):
+        """Return "title: url" entries ordered live (fastest first), unknown, then dead (marked or hidden).
+
+        With cached_only, rank on cached verdicts without waiting; uncached links count as
+        unknown and are probed in the background for next time.
+        """
+        if not self.enabled or not entries:
+            return entries
+        started = time.monotonic()
+        verdicts = {}
+        if cached_only:
+            for i, entry in enumerate(entries):
+                verdicts[i] = self.cache.get(entry.rpartition(': ')[2].strip())
+            self.warm(entry for i, entry in enumerate(entries) if verdicts[i] is None)
+        else:
+            futures = {}
+            for i, entry in enumerate(entries):
+                url = entry.rpartition(': ')[2].strip()
+                futures[i] = self._executor.submit(self.check, url)
+            done, pending = wait(futures.values(), timeout=self.deadline)
+            self._count('timeouts', len(pending))
+            for i, future in futures.items():
+                verdicts[i] = future.result() if future in done and future.exception() is None else None
+
+        ranked = []
+        for i, entry in enumerate(entries):
+            verdict = verdicts[i]
+            if verdict is None or verdict['state'] == 'unknown':
+                ranked.append((1, 0, i, entry))
+            elif verdict['state'] == 'live':
+                ranked.append((0, verdict['latency'], i, entry))
+            elif not self.hide_dead:
+                title, _, url = entry.rpartition(': ')
+                ranked.append((2, 0, i, f"❌ {title or 'Link'} (dead): {url}"))
+        ranked.sort()
+        live = sum(1 for group, *_ in ranked if group == 0)
+        logger.info(f"Liveness: {live}/{len(entries)} links live, checked in {time.monotonic() - started:.2f}s")
+        return [entry for *_, entry in ranked]
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self.metrics)
+        return {**metrics, 'cached': len(self.cache)}
@@ -0,0 +1,248 @@
+"""Synthetic load test for the /telegram webhook.
+
+Starts the Flask app in-process with Bot API calls sent to a local stub and site
+fetches sent to local replay servers, then drives realistic conversation flows at
+increasing concurrency and reports throughput, latency percentiles and error rates.
+
+    python loadtest.py --concurrency 1,5,10,25 --duration 20 --site-latency 0.3
+"""
+import argparse
+import itertools
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import requests
+from collections import defaultdict
+from standin import TelegramStub, SiteStandin, LinkHostStandin
+
+FLOW_SITES = ['hdmovie2', 'hdhub4u', 'cinevood']
+QUERIES = ['animal', 'jawan', 'pathaan', 'leo', 'salaar', 'dunki', 'tiger 3', 'fighter']
+ERROR_MARKERS = ['Unexpected Error', 'Session expired', 'Invalid', '😔']
+
+def catalog_titles(count):
+    """Stand-in catalog posts, a spread of releases for each load-test query."""
+    return [f"{QUERIES[i % len(QUERIES)].title()} {2000 + i // len(QUERIES) % 25} Part {i // len(QUERIES)} Hindi 1080p"
+            for i in range(count)]
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+class LoadTest:
+    def __init__(self, webhook_url, stub):
+        self.webhook_url = webhook_url
+        self.stub = stub
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)  # {command: [seconds]}
+        self.errors = defaultdict(int)  # {command: count}
+        self.steps = 0
+
+    def _message(self, chat_id, text):
+        return {
+            'update_id': next(self.update_ids),
+            'message': {
+                'message_id': next(self.message_ids),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Load'},
+                'text': text
+            }
+        }
+
+    def _callback(self, chat_id, data):
+        return {
+            'update_id': next(self.update_ids),
+            'callback_query': {
+                'id': str(next(self.update_ids)),
+                'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Load'},
+                'message': {'message_id': next(self.message_ids), 'date': int(time.time()), 'chat': {'id': chat_id, 'type': 'private'}},
+                'chat_instance': str(chat_id),
+                'data': data
+            }
+        }
+
+    def _step(self, session, command, chat_id, update, expect=None):
+        start = time.perf_counter()
+        ok = True
+        try:
+            response = session.post(self.webhook_url, json=update, timeout=120)
+            ok = response.status_code == 200
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        text = self.stub.last_text.get(chat_id, '')
+        if ok and any(marker in text for marker in ERROR_MARKERS):
+            ok = False
+        if ok and expect and expect not in text:
+            ok = False
+        with self.lock:
+            self.latencies[command].append(elapsed)
+            self.steps += 1
+            if not ok:
+                self.errors[command] += 1
+        return ok
+
+    def search_flow(self, session, chat_id):
+        site = random.choice(FLOW_SITES)
+        if not self._step(session, '/start', chat_id, self._message(chat_id, '/start')):
+            return
+        if not self._step(session, 'name', chat_id, self._message(chat_id, random.choice(QUERIES))):
+            return
+        if not self._step(session, 'search_site_', chat_id, self._callback(chat_id, f"search_site_{site}"), expect='Found'):
+            return
+        self._select(session, chat_id)
+
+    def latest_flow(self, session, chat_id):
+        # 'all' is the merged cross-site view
+        site = random.choice(FLOW_SITES + ['all'])
+        if not self._step(session, '/latest', chat_id, self._message(chat_id, '/latest')):
+            return
+        if not self._step(session, 'latest_site_', chat_id, self._callback(chat_id, f"latest_site_{site}"), expect='Latest Movies'):
+            return
+        for data in self.stub.buttons(chat_id, 'next_')[:1]:
+            self._step(session, 'next_', chat_id, self._callback(chat_id, data))
+        self._select(session, chat_id)
+
+    def _select(self, session, chat_id):
+        buttons = self.stub.buttons(chat_id, 'select_')
+        if not buttons:
+            with self.lock:
+                self.errors['select_'] += 1
+            return
+        # Users mostly tap one of the first few results
+        data = buttons[min(len(buttons) - 1, int(random.expovariate(1.0)))]
+        self._step(session, 'select_', chat_id, self._callback(chat_id, data), expect='Download Links Ready')
+
+    def user(self, chat_id, deadline, latest_ratio):
+        session = requests.Session()
+        while time.time() < deadline:
+            if random.random() < latest_ratio:
+                self.latest_flow(session, chat_id)
+            else:
+                self.search_flow(session, chat_id)
+
+    def run_level(self, concurrency, duration, latest_ratio, chat_ids):
+        self.latencies.clear()
+        self.errors.clear()
+        self.steps = 0
+        deadline = time.time() + duration
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self.user, args=(chat_ids[i], deadline, latest_ratio), daemon=True)
+                   for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        return elapsed
+
+    def report(self, concurrency, elapsed):
+        total_errors = sum(self.errors.values())
+        print(f"\n=== concurrency {concurrency}: {self.steps} steps in {elapsed:.1f}s, "
+              f"{self.steps / elapsed:.2f} steps/s, error rate {total_errors / max(1, self.steps):.1%}")
+        print(f"{'command':<14}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for command in sorted(set(self.latencies) | set(self.errors)):
+            values = self.latencies.get(command, [])
+            print(f"{command:<14}{len(values):>7}{percentile(values, 50) * 1000:>10.0f}"
+                  f"{percentile(values, 95) * 1000:>10.0f}{percentile(values, 99) * 1000:>10.0f}{self.errors.get(command, 0):>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /telegram webhook against local stand-ins")
+    parser.add_argument('--concurrency', default='1,5,10,25', help="Comma-separated concurrent user counts")
+    parser.add_argument('--duration', type=float, default=20, help="Seconds per concurrency level")
+    parser.add_argument('--site-latency', type=float, default=0.3, help="Mean stand-in site response time in seconds")
+    parser.add_argument('--site-jitter', type=float, default=0.1, help="Uniform jitter on site latency in seconds")
+    parser.add_argument('--pages', type=int, default=1, help="Listing pages served per search/latest crawl")
+    parser.add_argument('--wp', default='', help="WordPress endpoints the stand-ins serve: any of rest,feed (default: HTML only)")
+    parser.add_argument('--catalog', type=int, default=0, help="Posts in each stand-in's sitemaps; searches use the synced catalog")
+    parser.add_argument('--latest-ratio', type=float, default=0.3, help="Fraction of flows that use /latest")
+    parser.add_argument('--runtime', choices=['flask', 'asgi'], default='flask', help="Which webhook runtime to drive")
+    parser.add_argument('--port', type=int, default=0, help="Port for the app under test (0 picks a free one for Flask)")
+    parser.add_argument('--verbose', action='store_true', help="Keep the bot's own logging")
+    args = parser.parse_args()
+
+    stub = TelegramStub().start()
+    link_host = LinkHostStandin(latency=args.site_latency / 2).start()
+    standins = {site: SiteStandin(site, latency=args.site_latency, jitter=args.site_jitter, pages=args.pages,
+                                  link_base=link_host.base_url, wp_endpoints=[e for e in args.wp.split(',') if e],
+                                  catalog=catalog_titles(args.catalog)).start()
+                for site in FLOW_SITES}
+
+    os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456:LOADTEST')
+    os.environ['TELEGRAM_API_URL'] = stub.api_url
+    os.environ['SITE_SCHEME'] = 'http'
+    os.environ.setdefault('DOMAIN_CHECK_INTERVAL', '86400')
+    # Stand-ins listen on fresh ports each run, so results cached on disk by an earlier run are useless
+    os.environ.setdefault('PERSISTENT_CACHE_PATH', '')
+    os.environ.setdefault('CATALOG_PATH', os.path.join(tempfile.mkdtemp(prefix='loadtest-'), 'catalog.db') if args.catalog else '')
+    # Stand-ins are local, so by default measure the bot rather than per-host politeness pacing
+    os.environ.setdefault('HOST_RATE', '100')
+    os.environ.setdefault('HOST_BURST', '20')
+    os.environ.setdefault('RESOLVER_HOST_RATE', '100')
+    os.environ.setdefault('RESOLVER_HOST_BURST', '20')
+    os.environ['RESOLVER_HOSTS'] = link_host.domain
+
+    import config
+    for site, standin in standins.items():
+        config.SITE_CONFIG[site] = standin.domain
+    import main as bot_main
+    from werkzeug.serving import make_server
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.ERROR)
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    if args.catalog and bot_main.catalog:
+        started = time.monotonic()
+        synced = bot_main.catalog.sync_all(FLOW_SITES)
+        print(f"Catalog synced in {time.monotonic() - started:.1f}s: "
+              f"{ {site: result.get('posts', result.get('error')) for site, result in synced.items()} }")
+
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    chat_ids = [900000000 + i for i in range(max(levels))]
+    config.ALLOWED_IDS.update(chat_ids)
+
+    if args.runtime == 'asgi':
+        import uvicorn
+        import asgi_app
+        port = args.port or 8765
+        server = uvicorn.Server(uvicorn.Config(asgi_app.app, host='127.0.0.1', port=port, log_level='error'))
+        server_thread = threading.Thread(target=server.run, daemon=True)
+        server_thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        def stop_server():
+            server.should_exit = True
+            server_thread.join(timeout=10)
+    else:
+        server = make_server('127.0.0.1', args.port, bot_main.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_port
+        stop_server = server.shutdown
+    webhook_url = f"http://127.0.0.1:{port}/telegram"
+    print(f"{args.runtime} webhook at {webhook_url}, site latency {args.site_latency}s ±{args.site_jitter}s")
+
+    test = LoadTest(webhook_url, stub)
+    try:
+        for concurrency in levels:
+            elapsed = test.run_level(concurrency, args.duration, args.latest_ratio, chat_ids)
+            test.report(concurrency, elapsed)
+        print(f"\nBot API calls: {dict(stub.calls)}")
+        print(f"Site requests: {{{', '.join(f'{site}: {s.requests}' for site, s in standins.items())}}}")
+        print(f"Link host requests: {dict(link_host.requests)}")
+    finally:
+        stop_server()
+        stub.stop()
+        for standin in standins.values():
+            standin.stop()
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,60 @@
+import startup
 import telebot
-from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton, InlineQueryResultArticle, InputTextMessageContent
 import threading
 import time
 import os
 import requests
 import atexit
-from flask import Flask, request, jsonify
+import hmac
+import importlib
+import sys
+import json
+import hashlib
+import html
+from flask import Flask, Response, request, jsonify
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
-from config import ALLOWED_IDS, TELEGRAM_BOT_TOKEN, SITE_CONFIG, update_site_domain, logger
-from hdmovie2 import get_movie_titles_and_links as hdmovie2_titles, get_download_links as hdmovie2_links, get_latest_movies as hdmovie2_latest
-from hdhub4u import get_movie_titles_and_links as hdhub4u_titles, get_download_links as hdhub4u_links, get_latest_movies as hdhub4u_latest
-from cinevood import get_movie_titles_and_links as cinevood_titles, get_download_links as cinevood_links, get_latest_movies as cinevood_latest
+from config import ALLOWED_IDS, ADMIN_IDS, ADMIN_TOKEN, API_TOKEN, TELEGRAM_BOT_TOKEN, SITE_CONFIG, update_site_domain, watch_site_config, logger
+from prefetch import Prefetcher
+from admission import admission, Overloaded, PRIORITY_DOWNLOAD, PRIORITY_LATEST, PRIORITY_SEARCH, PRIORITY_BACKGROUND
+from domain_monitor import check_all_sites, domain_health, DOMAIN_CHECK_INTERVAL
+from leader import Scheduler
+from sessions import SessionStore
+from cache import TTLCache, save_snapshot, load_snapshot
+from persistent_cache import PersistentStore, PERSISTENT_CACHE_PATH
+from latest_feed import LatestFeed
+from watchlist import Watchlist
+from title_index import TitleIndex
+from titles import cluster_results, bare_title
+from snapshots import SnapshotStore
+from throttle import host_throttle, resolver_throttle
+from hedge import mirrors
+from wp_fastpath import fastpath
+from catalog import catalog, CATALOG_SYNC_INTERVAL
+from resolver import LinkResolver
+from liveness import LivenessChecker
+import memdiag
+import parse_pool
+from startup import FAST_START, CACHE_SNAPSHOT_FILE
+
+startup.mark('imports')
+
+# Fork parse workers (PARSE_MODE=process) first: the bot, the persistent store and the executors below start threads
+if parse_pool.start(preload=list(SITE_CONFIG)):
+    startup.mark('parse_pool')
 
 app = Flask(__name__)
 bot = telebot.TeleBot(TELEGRAM_BOT_TOKEN)
 
+# Optional Bot API endpoint override (local Bot API server or a test stub)
+if os.environ.get('TELEGRAM_API_URL'):
+    telebot.apihelper.API_URL = os.environ['TELEGRAM_API_URL']
+
 # Store user state with expiration
-user_state = {}  # {chat_id: {'step': str, 'movie_name': str, 'current_site': str, 'site_results': {site: {'titles': [], 'links': []}}, 'last_active': datetime}}
 STATE_TIMEOUT = timedelta(minutes=30)
+user_state = SessionStore(STATE_TIMEOUT, on_reap=lambda refs: snapshots.prune(refs))  # {chat_id: {'step': str, 'movie_name': str, 'current_site': str, 'snapshot_id': str, 'offset': int, 'last_active': datetime}}
 MAX_MESSAGE_LENGTH = 3500  # Reduced to avoid Telegram limits
 MAX_RETRIES = 3
 MAX_RESULTS_PER_SITE = 15
@@ -27,6 +62,17 @@ BUTTON_TEXT_LIMIT = 50
 URL_VALIDATION_KEYWORDS = ['download', 'gdflix', 'filepress', '1080p', '720p', '480p', 'hd']
 URL_EXCLUDE_KEYWORDS = ['watch online', 'trailer', 'telegram', 'join', 'home', 'how to download']
 
+SEARCH_CACHE_TTL = 600
+WATCH_REFRESH_INTERVAL = int(os.environ.get('WATCH_REFRESH_INTERVAL', 900))  # Seconds between watchlist feed refreshes
+KEEP_ALIVE_INTERVAL = 120
+LATEST_CACHE_TTL = 300
+API_MAX_CONCURRENCY = int(os.environ.get('API_MAX_CONCURRENCY', 4))  # (query, site) searches the API runs at once, across all requests
+API_MAX_BATCH = int(os.environ.get('API_MAX_BATCH', 50))  # Largest queries x sites batch one request may ask for
+INLINE_RESULTS = 20  # Answers per inline query
+INLINE_CACHE_TIME = int(os.environ.get('INLINE_CACHE_TIME', 60))  # Seconds Telegram may reuse an inline answer
+INDEX_WARM_TTL = 300  # Seconds before a missed inline query may trigger another background search
+INDEX_WARM_DELAY = 1.5  # Seconds a missed inline query must stay the latest one typed before it is warmed
+
 # Site configuration with emojis
 SITES = {
     'hdmovie2': {'name': 'HDMovie2', 'emoji': '🎬'},
@@ -34,15 +80,110 @@ SITES = {
     'cinevood': {'name': 'CineVood', 'emoji': '🍿'}
 }
 
+# On-disk cache shared by workers and restarts; PERSISTENT_CACHE_PATH='' keeps everything in memory
+result_store = PersistentStore(PERSISTENT_CACHE_PATH) if PERSISTENT_CACHE_PATH else None
+# Latest view that lists each release once with every site carrying it
+MERGED_VIEW = 'all'
+MERGED_VIEW_INFO = {'name': 'All Sites (merged)', 'emoji': '🧩'}
+
+search_cache = TTLCache('search', SEARCH_CACHE_TTL, store=result_store)  # {(site, query): (titles, links)}
+latest_cache = TTLCache('latest', LATEST_CACHE_TTL, max_entries=16, store=result_store)  # {site: {'titles': [], 'links': []}}
+watchlist = Watchlist()
+notify_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='watch-notify')
+
+def notify_watchers(site, items):
+    """Push newly listed posts to every user watching a matching title."""
+    site_info = SITES.get(site, {'name': site, 'emoji': '🎬'})
+    for title, link in items:
+        for chat_id, watched in watchlist.match(title).items():
+            text = (
+                f"🔔 <b>Watchlist match on {site_info['emoji']} {site_info['name']}</b>\n\n"
+                f"🎬 <a href=\"{html.escape(link)}\">{html.escape(title)}</a>\n"
+                f"👀 <i>Watching: {html.escape(', '.join(watched))}</i>\n\n"
+                f"🔍 Search it with /start or stop alerts with /unwatch"
+            )
+            notify_executor.submit(send_long_message, chat_id, text)
+            logger.info(f"Notified {chat_id} about '{title}' on {site}")
+
+index_warm_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='index-warm')
+index_warmed = TTLCache('index_warm', INDEX_WARM_TTL, max_entries=1024)  # {query: True} searched recently for the index
+index_warm_pending = {}  # {query key: (query, missed at)} waiting out INDEX_WARM_DELAY
+index_warm_lock = threading.Lock()
+
+def warm_title_index(query):
+    """Queue a background search for a query the title index missed, once typing pauses.
+
+    Telegram sends an inline query per keystroke, so a miss replaces any pending query
+    it extends or shortens, and the search runs only if that query is still the latest
+    one after INDEX_WARM_DELAY.
+    """
+    key = normalize_query(query)
+    if len(key) < 3 or key in index_warmed:
+        return
+    with index_warm_lock:
+        for pending in [pending for pending in index_warm_pending if key.startswith(pending) or pending.startswith(key)]:
+            del index_warm_pending[pending]
+        index_warm_pending[key] = (query, time.monotonic())
+    timer = threading.Timer(INDEX_WARM_DELAY, _warm_title_index, args=(key,))
+    timer.daemon = True
+    timer.start()
+
+def _warm_title_index(key):
+    with index_warm_lock:
+        query, missed_at = index_warm_pending.get(key, (None, 0))
+        if query is None or time.monotonic() - missed_at < INDEX_WARM_DELAY:
+            return  # Superseded by a later keystroke
+        del index_warm_pending[key]
+        if key in index_warmed:
+            return
+        index_warmed.set(key, True)
+    logger.info(f"Warming title index for '{query}'")
+    for site in SITES:
+        index_warm_executor.submit(search_movies_single_site, query, site, PRIORITY_BACKGROUND)
+
+title_index = TitleIndex(on_miss=warm_title_index)
+latest_feed = LatestFeed(lambda site, stop_at: scraper(site).get_latest_movies(stop_at=stop_at), store=result_store,
+                         on_new_items=notify_watchers, on_merged=title_index.add)
+
+def scraper(site):
+    """Return a site's scraper module, importing it (and bs4/cloudscraper) on first use."""
+    if site not in SITES:
+        raise ValueError(f"Invalid site: {site}")
+    loaded = site in sys.modules
+    started = time.perf_counter()
+    module = importlib.import_module(site)
+    if not loaded:
+        logger.info(f"Loaded {site} scraper in {time.perf_counter() - started:.3f}s")
+    return module
+
+def site_display(site):
+    """Return the name/emoji shown for a site key, including the merged view."""
+    if site == MERGED_VIEW:
+        return MERGED_VIEW_INFO
+    return SITES.get(site, {'name': site.capitalize(), 'emoji': '🎬'})
+
+def normalize_query(movie_name):
+    return ' '.join(movie_name.lower().split())
+
+def refresh_watched_feeds():
+    """Refresh the latest feeds so watchlist matches are pushed without a user asking."""
+    if not len(watchlist):
+        return 0
+    refreshed = 0
+    for site in SITES:
+        try:
+            with admission.slot(PRIORITY_BACKGROUND):
+                titles, links = latest_feed.refresh(site)
+            if titles:
+                latest_cache.set(site, {'titles': titles[:MAX_RESULTS_PER_SITE], 'links': links[:MAX_RESULTS_PER_SITE]})
+                refreshed += 1
+        except Exception as e:
+            logger.error(f"Error refreshing latest from {site} for watchlists: {e}")
+    return refreshed
+
 def cleanup_expired_states():
-    """Remove expired user states."""
-    while True:
-        current_time = datetime.now()
-        expired = [chat_id for chat_id, state in user_state.items() if current_time - state['last_active'] > STATE_TIMEOUT]
-        for chat_id in expired:
-            del user_state[chat_id]
-            logger.info(f"Cleaned up expired state for chat_id {chat_id}")
-        time.sleep(600)
+    """Remove user states as soon as they expire."""
+    user_state.run_reaper()
 
 def is_valid_url(url, title=""):
     """Validate URL to ensure it's a download link."""
@@ -105,11 +246,16 @@ def create_site_selection_keyboard(command):
             f"{site_info['emoji']} {i}. {site_info['name']} ({SITE_CONFIG[site_key]})",
             callback_data=f"{command}_site_{site_key}"
         ))
+    if command == 'latest':
+        markup.add(InlineKeyboardButton(
+            f"{MERGED_VIEW_INFO['emoji']} {MERGED_VIEW_INFO['name']}",
+            callback_data=f"latest_site_{MERGED_VIEW}"
+        ))
     markup.add(InlineKeyboardButton("❌ Cancel", callback_data="cancel"))
     return markup
 
-def create_movie_selection_keyboard(scroll_id, site, titles, offset=0):
-    """Create scrollable inline keyboard for movie selection."""
+def create_movie_selection_keyboard(snapshot_id, site, titles, offset=0):
+    """Create scrollable inline keyboard for movie selection (cached per page by SnapshotStore.keyboard)."""
     markup = InlineKeyboardMarkup(row_width=1)
     site_info = SITES.get(site, {'name': site.capitalize(), 'emoji': '🎬'})
     
@@ -119,26 +265,28 @@ def create_movie_selection_keyboard(scroll_id, site, titles, offset=0):
         display_title = title[:BUTTON_TEXT_LIMIT] + "..." if len(title) > BUTTON_TEXT_LIMIT else title
         markup.add(InlineKeyboardButton(
             f"🎥 {display_title}",
-            callback_data=f"select_{scroll_id}_{site}_{i}"
+            callback_data=f"select_{snapshot_id}_{site}_{i}"
         ))
     
     nav_buttons = []
     if offset > 0:
-        nav_buttons.append(InlineKeyboardButton("⬅️ Previous", callback_data=f"prev_{scroll_id}_{site}_{max(0, offset-MAX_RESULTS_PER_SITE)}"))
+        nav_buttons.append(InlineKeyboardButton("⬅️ Previous", callback_data=f"prev_{snapshot_id}_{site}_{max(0, offset-MAX_RESULTS_PER_SITE)}"))
     if end_index < len(titles):
-        nav_buttons.append(InlineKeyboardButton("➡️ Next", callback_data=f"next_{scroll_id}_{site}_{end_index}"))
+        nav_buttons.append(InlineKeyboardButton("➡️ Next", callback_data=f"next_{snapshot_id}_{site}_{end_index}"))
     
     if nav_buttons:
         markup.row(*nav_buttons)
     
     markup.row(
-        InlineKeyboardButton("🔙 Back to Sites", callback_data=f"back_to_sites_{scroll_id}"),
+        InlineKeyboardButton("🔙 Back to Sites", callback_data=f"back_to_sites_{snapshot_id}"),
         InlineKeyboardButton("🔍 New Search", callback_data="new_search")
     )
     markup.add(InlineKeyboardButton("❌ Cancel", callback_data="cancel"))
     
     return markup
 
+snapshots = SnapshotStore(create_movie_selection_keyboard)  # result sets shared across chats, with their keyboard pages
+
 def create_back_navigation_keyboard(scroll_id):
     """Create navigation keyboard for going back."""
     markup = InlineKeyboardMarkup(row_width=2)
@@ -149,26 +297,120 @@ def create_back_navigation_keyboard(scroll_id):
     markup.add(InlineKeyboardButton("❌ Cancel", callback_data="cancel"))
     return markup
 
-def search_movies_single_site(movie_name, site):
-    """Search movies on a single site with retry logic."""
-    site_functions = {
-        'hdmovie2': hdmovie2_titles,
-        'hdhub4u': hdhub4u_titles,
-        'cinevood': cinevood_titles
-    }
-    
+def queued_text(doing, position, wait):
+    return (
+        f"⏳ <b>Busy right now, you're in the queue</b>\n\n"
+        f"{doing}\n"
+        f"📍 <b>Position:</b> {position}\n\n"
+        f"⌛ <i>About {wait:.0f}s, results will appear here...</i>"
+    )
+
+def busy_text(error):
+    return (
+        f"🚦 <b>Too busy right now</b>\n\n"
+        f"⏳ The scrapers are about {error.wait:.0f}s behind.\n"
+        f"🔄 <i>Please try again in a minute.</i>"
+    )
+
+def queued_notice(chat_id, message_id, doing):
+    """on_queued hook that tells the user, once, that their request is waiting for a scraper."""
+    notified = []
+
+    def notify(position, wait):
+        if not notified:
+            notified.append(True)
+            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=queued_text(doing, position, wait), parse_mode='HTML')
+    return notify
+
+def render_download_links(selected_title, site_info, download_links, other_sources=None):
+    """Build the message listing a movie's download links (or the empty-result hint)."""
+    also_on = ""
+    if other_sources:
+        also_on = "🔁 <b>Also on:</b> " + ", ".join(
+            f"<a href='{link}'>{site_display(site)['name']}</a>" for site, link, _ in other_sources
+        ) + "\n\n"
+    if not download_links:
+        return (
+            f"😔 <b>No download links found</b>\n\n"
+            f"🎬 <b>Movie:</b> {selected_title}\n"
+            f"🌐 <b>Site:</b> {site_info['emoji']} {site_info['name']}\n\n"
+            f"{also_on}"
+            f"💡 <b>Try:</b>\n"
+            f"  • Another movie\n"
+            f"  • A different site\n"
+            f"  • Check debug logs for details"
+        )
+
+    links_text = ""
+    for i, link in enumerate(download_links[:10], 1):
+        parts = link.rsplit(': ', 1)
+        title = parts[0].strip() if len(parts) == 2 else f"Link {i}"
+        url = parts[1].strip() if len(parts) == 2 else link.strip()
+        links_text += f"<b>{i}) {title}:</b>\n<a href='{url}'>{url}</a>\n\n"
+
+    return (
+        f"✅ <b>Download Links Ready!</b>\n\n"
+        f"🎬 <b>Movie:</b> {selected_title}\n"
+        f"🌐 <b>Site:</b> {site_info['emoji']} {site_info['name']}\n"
+        f"📋 <b>Found:</b> {len(download_links)} links\n\n"
+        f"📥 <b>Download Links:</b>\n\n{links_text}"
+        f"{also_on}"
+        f"💡 <i>Click links to open</i>"
+    )
+
+def store_search(movie_name, site, titles, links):
+    """Trim a site's search results, cache them (in memory and on disk) and index their titles."""
+    titles, links = titles[:MAX_RESULTS_PER_SITE], links[:MAX_RESULTS_PER_SITE]
+    search_cache.set((site, normalize_query(movie_name)), (titles, links))
+    title_index.add(site, zip(titles, links))
+    return titles, links
+
+def cached_search(movie_name, site):
+    """Search results without scraping: the search cache, then a fresh sitemap catalog; None when neither has them."""
+    cached = search_cache.get((site, normalize_query(movie_name)))
+    if cached is not None:
+        logger.info(f"Using cached search results for '{movie_name}' on {site}")
+        titles, links = cached
+        title_index.add(site, zip(titles, links))
+        return titles, links
+
+    if catalog and catalog.ready(site):
+        try:
+            titles, links = catalog.search(site, movie_name)
+        except Exception as e:
+            logger.warning(f"Catalog search failed on {site}, searching live: {e}")
+            return None
+        if titles:
+            logger.info(f"Found {len(titles)} titles for '{movie_name}' in the {site} catalog")
+            return store_search(movie_name, site, titles, links)
+    return None
+
+def search_movies_single_site(movie_name, site, priority=PRIORITY_SEARCH, on_queued=None):
+    """Search movies on a single site with retry logic.
+
+    Cached results and sites with a fresh sitemap catalog are answered locally;
+    otherwise fetches take an admission slot at the given priority (background
+    searches only use a free one) and raise Overloaded when the scrapers are too busy.
+    """
+    if site not in SITES:
+        logger.error(f"Invalid site: {site}")
+        return [], []
+
+    cached = cached_search(movie_name, site)
+    if cached is not None:
+        return cached
+
     for attempt in range(MAX_RETRIES):
         try:
-            if site not in site_functions:
-                logger.error(f"Invalid site: {site}")
-                return [], []
-            
-            titles, links = site_functions[site](movie_name)
+            with admission.slot(priority, on_queued, wait=priority < PRIORITY_BACKGROUND):
+                titles, links = scraper(site).get_movie_titles_and_links(movie_name)
             if not titles:
                 logger.warning(f"No titles found for '{movie_name}' on {site} (attempt {attempt + 1})")
             else:
                 logger.info(f"Fetched {len(titles)} titles for '{movie_name}' from {site}")
-                return titles[:MAX_RESULTS_PER_SITE], links[:MAX_RESULTS_PER_SITE]
+                return store_search(movie_name, site, titles, links)
+        except Overloaded:
+            raise
         except Exception as e:
             logger.warning(f"Error searching {site} (attempt {attempt + 1}): {e}")
             if attempt == MAX_RETRIES - 1:
@@ -177,61 +419,136 @@ def search_movies_single_site(movie_name, site):
             time.sleep(2 * (attempt + 1))
     return [], []
 
-def get_latest_movies_all_sites():
-    """Fetch latest movies from all sites concurrently."""
-    site_results = {}
-    site_functions = [
-        ('hdmovie2', hdmovie2_latest),
-        ('hdhub4u', hdhub4u_latest),
-        ('cinevood', cinevood_latest)
-    ]
+def add_merged_view(site_results):
+    """Add the cross-site merged listing to a latest-movies result set."""
+    if site_results:
+        site_results[MERGED_VIEW] = cluster_results(site_results, sites=list(SITES))
+    return site_results
+
+def selected_entry(snapshot, site, index):
+    """Resolve a listing row of a result snapshot to (real site, movie url, title, other sources)."""
+    listing = snapshot[site]
+    if site != MERGED_VIEW:
+        return site, listing['links'][index], listing['titles'][index], []
+    sources = listing['sources'][index]
+    return listing['sites'][index], listing['links'][index], listing['titles'][index], sources[1:]
+
+def schedule_prefetch(site, listing):
+    """Prefetch the top results of a listing, routing merged-view rows to their real site."""
+    if site != MERGED_VIEW:
+        prefetcher.schedule(site, listing['links'])
+        return
+    for real_site, link in list(zip(listing['sites'], listing['links']))[:prefetcher.top_n]:
+        prefetcher.schedule(real_site, [link])
 
+def refresh_latest_site(site, on_queued=None):
+    """Refresh a site's latest feed in a latest-priority admission slot."""
+    with admission.slot(PRIORITY_LATEST, on_queued):
+        return latest_feed.refresh(site)
+
+def cached_latest(sites):
+    """({site: listing} for sites whose latest listing is cached, [sites still to fetch])."""
+    site_results = {}
+    missing = []
+    for site in sites:
+        cached = latest_cache.get(site)
+        if cached is not None:
+            site_results[site] = cached
+        else:
+            missing.append(site)
+    return site_results, missing
+
+def store_latest(site, titles, links):
+    """Trim and cache a site's latest listing; returns the listing."""
+    listing = {'titles': titles[:MAX_RESULTS_PER_SITE], 'links': links[:MAX_RESULTS_PER_SITE]}
+    latest_cache.set(site, listing)
+    return listing
+
+def get_latest_movies_all_sites(on_queued=None):
+    """Fetch latest movies from all sites concurrently; Overloaded when busy scrapers leave nothing to show."""
+    site_results, missing = cached_latest(SITES)
+    if not missing:
+        return add_merged_view(site_results)
+
+    overloaded = None
     with ThreadPoolExecutor(max_workers=3) as executor:
-        futures = {executor.submit(func): site for site, func in site_functions}
+        futures = {executor.submit(refresh_latest_site, site, on_queued): site for site in missing}
         for future in futures:
             site = futures[future]
             try:
                 titles, links = future.result(timeout=20)
                 if titles:
-                    site_results[site] = {
-                        'titles': titles[:MAX_RESULTS_PER_SITE],
-                        'links': links[:MAX_RESULTS_PER_SITE]
-                    }
+                    site_results[site] = store_latest(site, titles, links)
                     logger.info(f"Fetched {len(titles)} latest titles from {site}")
                 else:
                     logger.warning(f"No latest titles found for {site}")
+            except Overloaded as e:
+                logger.warning(f"Skipped latest from {site}: {e}")
+                overloaded = e
             except Exception as e:
                 logger.error(f"Error fetching latest from {site}: {e}")
 
-    return site_results
-
-def get_download_links_for_movie(link, site):
-    """Get download links with validation and retries."""
-    site_functions = {
-        'hdmovie2': hdmovie2_links,
-        'hdhub4u': hdhub4u_links,
-        'cinevood': cinevood_links
-    }
-    
+    if overloaded and not site_results:
+        raise overloaded
+    return add_merged_view(site_results)
+
+def fetch_download_links(movie_url, site, cached_only=False):
+    """Fetch, validate and resolve download links for a movie page (single attempt).
+
+    cached_only (the tap path) swaps in cached resolutions only; the rest are resolved
+    in the background, so a tap never waits on RESOLVE_DEADLINE.
+    """
+    links = validate_download_links(scraper(site).get_download_links(movie_url))
+    return link_resolver.resolve_all(links, cached_only=cached_only)
+
+def validate_download_links(links):
+    """Keep well-formed download links, normalized to "title: url"."""
+    valid_links = []
+    for link in links:
+        parts = link.rsplit(': ', 1)
+        if len(parts) == 2:
+            title, url = parts
+            title = title.strip()
+            url = url.strip()
+            if is_valid_url(url, title):
+                valid_links.append(f"{title}: {url}")
+        elif is_valid_url(link):
+            valid_links.append(f"Link: {link}")
+    return valid_links[:10]
+
+def prefetch_download_links(movie_url, site):
+    """fetch_download_links for speculative prefetches, which only run on a free admission slot."""
+    with admission.slot(PRIORITY_BACKGROUND, wait=False):
+        links = fetch_download_links(movie_url, site)
+    link_checker.warm(links)
+    return links
+
+link_resolver = LinkResolver(store=result_store)
+link_checker = LivenessChecker(store=result_store)
+prefetcher = Prefetcher(prefetch_download_links, store=result_store)
+
+def get_download_links_for_movie(link, site, on_queued=None):
+    """Get download links with validation and retries, live links first."""
+    prefetched = prefetcher.claim(link, site)
+    if prefetched:
+        logger.info(f"Using prefetched download links for {link} on {site}")
+        # Resolutions and verdicts were warmed in the background; don't make the tap wait on either
+        return link_checker.rank(link_resolver.resolve_all(prefetched, cached_only=True), cached_only=True)
+    return link_checker.rank(_get_download_links_for_movie(link, site, on_queued))
+
+def _get_download_links_for_movie(link, site, on_queued=None):
     for attempt in range(MAX_RETRIES):
         try:
-            links = site_functions[site](link)
-            valid_links = []
-            for link in links:
-                parts = link.rsplit(':', 1)
-                if len(parts) == 2:
-                    title, url = parts
-                    title = title.strip()
-                    url = url.strip()
-                    if is_valid_url(url, title):
-                        valid_links.append(f"{title}: {url}")
-                elif is_valid_url(link):
-                    valid_links.append(f"Link: {link}")
+            with admission.slot(PRIORITY_DOWNLOAD, on_queued):
+                valid_links = fetch_download_links(link, site, cached_only=True)
             if valid_links:
                 logger.info(f"Fetched {len(valid_links)} valid download links from {site}")
-                return valid_links[:10]
+                prefetcher.store(link, site, valid_links)
+                return valid_links
             else:
                 logger.warning(f"No valid download links found for {link} on {site} (attempt {attempt + 1})")
+        except Overloaded:
+            raise
         except Exception as e:
             logger.warning(f"Attempt {attempt + 1} failed for {site}: {e}")
             if attempt == MAX_RETRIES - 1:
@@ -243,12 +560,56 @@ def get_download_links_for_movie(link, site):
 @app.route('/telegram', methods=['POST'])
 def telegram_webhook():
     """Handle Telegram webhook requests."""
+    return process_update(request.get_json())
+
+def process_update(update):
+    """Process a single Telegram update, serialized per chat."""
+    chat = ((update or {}).get('message') or (update or {}).get('callback_query', {}).get('message') or {}).get('chat', {})
+    if 'id' not in chat:
+        return _process_update(update)
+    with user_state.lock(chat['id']):
+        return _process_update(update)
+
+def answer_inline_query(inline_query):
+    """Answer "@bot title" from the local title index; never scrapes inline."""
+    user_id = inline_query['from']['id']
+    query = inline_query.get('query', '').strip()
+    if user_id not in ALLOWED_IDS:
+        bot.answer_inline_query(inline_query['id'], [], cache_time=INLINE_CACHE_TIME, is_personal=True)
+        logger.info(f"Unauthorized inline query by {user_id}")
+        return '', 200
+
+    matches = title_index.search(query, limit=INLINE_RESULTS)
+    results = []
+    for site, title, url in matches:
+        site_info = site_display(site)
+        results.append(InlineQueryResultArticle(
+            id=hashlib.md5(url.encode()).hexdigest(),
+            title=title,
+            description=f"{site_info['emoji']} {site_info['name']}",
+            input_message_content=InputTextMessageContent(
+                f"🎬 <b>{html.escape(title)}</b>\n{site_info['emoji']} {site_info['name']}\n🔗 {html.escape(url)}",
+                parse_mode='HTML'
+            )
+        ))
+    if results:
+        bot.answer_inline_query(inline_query['id'], results, cache_time=INLINE_CACHE_TIME, is_personal=True)
+    else:
+        # Nothing indexed yet; a background search is warming the index, so don't let Telegram cache the miss
+        bot.answer_inline_query(inline_query['id'], [], cache_time=0, is_personal=True,
+                                switch_pm_text="No quick match yet - search in chat", switch_pm_parameter="start")
+    logger.info(f"Inline query '{query}' from {user_id}: {len(results)} results")
+    return '', 200
+
+def _process_update(update):
     try:
-        update = request.get_json()
         if not update:
             logger.debug("Invalid update received")
             return '', 200
 
+        if 'inline_query' in update:
+            return answer_inline_query(update['inline_query'])
+
         if 'message' in update:
             message = update['message']
             chat_id = message['chat']['id']
@@ -261,9 +622,9 @@ def telegram_webhook():
                 return '', 200
 
             if chat_id in user_state:
-                user_state[chat_id]['last_active'] = datetime.now()
+                user_state.touch(chat_id)
 
-            if text.lower() == '/start':
+            if text.lower().split(' ', 1)[0] == '/start':
                 user_state[chat_id] = {'step': 'awaiting_movie_name', 'last_active': datetime.now()}
                 welcome_text = (
                     "🎬 <b>Welcome to Advanced Movie Search Bot!</b>\n\n"
@@ -298,6 +659,9 @@ def telegram_webhook():
                     "📋 <b>Available Commands:</b>\n\n"
                     "🔹 <b>/start</b>: Start a new movie search\n"
                     "🔹 <b>/latest</b>: View latest movies\n"
+                    "🔹 <b>/watch</b> &lt;title&gt;: Get notified when a title is posted\n"
+                    "🔹 <b>/unwatch</b> &lt;title or number&gt;: Stop watching a title\n"
+                    "🔹 <b>/watchlist</b>: Show watched titles\n"
                     "🔹 <b>/cancel</b>: Cancel current operation\n"
                     "🔹 <b>/update_domain</b>: Update site domain\n"
                     "🔹 <b>/cmd</b>: Show this command list\n\n"
@@ -306,6 +670,38 @@ def telegram_webhook():
                 send_long_message(chat_id, commands_text, reply_to_message_id=message_id)
                 logger.info(f"User {chat_id} requested command list")
 
+            elif text.lower() == '/watchlist':
+                titles = watchlist.titles(chat_id)
+                if titles:
+                    listed = "\n".join(f"• {i}. {html.escape(title)}" for i, title in enumerate(titles, 1))
+                    send_long_message(chat_id, f"👀 <b>Your Watchlist</b>\n\n{listed}\n\n💡 <i>Remove one with /unwatch &lt;number&gt;</i>", reply_to_message_id=message_id)
+                else:
+                    send_long_message(chat_id, "ℹ️ <b>Your watchlist is empty</b>\n\n💡 <i>Example: /watch Animal 2023</i>", reply_to_message_id=message_id)
+                logger.info(f"User {chat_id} requested watchlist")
+
+            elif text.lower().split(' ', 1)[0] == '/watch':
+                title = text[len('/watch'):].strip()
+                result = watchlist.add(chat_id, title) if title else 'invalid'
+                replies = {
+                    'added': f"✅ <b>Watching '{html.escape(title)}'</b>\n\n🔔 You'll get a message as soon as it's posted on any site.",
+                    'exists': f"ℹ️ <b>Already watching '{html.escape(title)}'</b>",
+                    'full': f"❌ <b>Watchlist full</b>\n\n📝 Remove a title with /unwatch first (limit {watchlist.max_per_user}).",
+                    'invalid': "❌ <b>Please give a title to watch</b>\n\n💡 <i>Example: /watch Animal 2023</i>"
+                }
+                send_long_message(chat_id, replies[result], reply_to_message_id=message_id)
+
+            elif text.lower().split(' ', 1)[0] == '/unwatch':
+                title = text[len('/unwatch'):].strip()
+                removed = watchlist.remove(chat_id, title) if title else None
+                if removed:
+                    send_long_message(chat_id, f"✅ <b>Stopped watching '{html.escape(removed)}'</b>", reply_to_message_id=message_id)
+                else:
+                    send_long_message(chat_id, "❌ <b>Not in your watchlist</b>\n\n📋 See your titles with /watchlist", reply_to_message_id=message_id)
+
+            elif text.lower() == '/memory' and chat_id in ADMIN_IDS:
+                send_long_message(chat_id, memdiag.format_report(memory_report()), reply_to_message_id=message_id)
+                logger.info(f"Admin {chat_id} requested memory diagnostics")
+
             elif text.lower() == '/cancel':
                 if chat_id in user_state:
                     del user_state[chat_id]
@@ -334,10 +730,9 @@ def telegram_webhook():
                         send_long_message(chat_id, "❌ <b>Please enter a movie name</b>\n\n💡 <i>Example: In Laws 2020</i>", reply_to_message_id=message_id)
                         return '', 200
                     
-                    user_state[chat_id].update({
+                    user_state.update_session(chat_id, {
                         'step': 'site_selection',
                         'movie_name': text,
-                        'site_results': {},
                         'scroll_id': f"search_{chat_id}_{int(time.time())}",
                         'last_active': datetime.now()
                     })
@@ -428,7 +823,7 @@ def telegram_webhook():
                 bot.answer_callback_query(callback['id'], text="⏰ Session expired. Start over with /start or /latest.", show_alert=True)
                 return '', 200
 
-            user_state[chat_id]['last_active'] = datetime.now()
+            user_state.touch(chat_id)
             state = user_state[chat_id]
 
             if callback_data == 'cancel':
@@ -501,7 +896,14 @@ def telegram_webhook():
                     parse_mode='HTML'
                 )
 
-                titles, links = search_movies_single_site(movie_name, site)
+                try:
+                    titles, links = search_movies_single_site(movie_name, site, on_queued=queued_notice(
+                        chat_id, message_id, f"🔍 Searching '{movie_name}' on {site_info['emoji']} {site_info['name']}"))
+                except Overloaded as e:
+                    bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=busy_text(e), parse_mode='HTML',
+                                          reply_markup=create_back_navigation_keyboard(scroll_id))
+                    bot.answer_callback_query(callback['id'])
+                    return '', 200
                 
                 if not titles:
                     bot.edit_message_text(
@@ -521,10 +923,12 @@ def telegram_webhook():
                     bot.answer_callback_query(callback['id'])
                     return '', 200
 
-                user_state[chat_id].update({
+                snapshot_id = snapshots.put({site: {'titles': titles, 'links': links}})
+                user_state.update_session(chat_id, {
                     'step': 'movie_selection',
                     'current_site': site,
-                    'site_results': {site: {'titles': titles, 'links': links}},
+                    'snapshot_id': snapshot_id,
+                    'offset': 0,
                     'scroll_id': scroll_id
                 })
 
@@ -539,14 +943,15 @@ def telegram_webhook():
                     message_id=message_id,
                     text=results_text,
                     parse_mode='HTML',
-                    reply_markup=create_movie_selection_keyboard(scroll_id, site, titles)
+                    reply_markup=snapshots.keyboard(snapshot_id, site)
                 )
                 bot.answer_callback_query(callback['id'])
+                prefetcher.schedule(site, links)
                 logger.info(f"User {chat_id} selected site {site} and found {len(titles)} results")
 
             elif callback_data.startswith('latest_site_'):
                 site = callback_data.replace('latest_site_', '')
-                site_info = SITES.get(site, {'name': site.capitalize(), 'emoji': '🎬'})
+                site_info = site_display(site)
                 scroll_id = state.get('scroll_id', f"latest_{chat_id}_{int(time.time())}")
 
                 bot.edit_message_text(
@@ -556,10 +961,20 @@ def telegram_webhook():
                     parse_mode='HTML'
                 )
 
-                site_results = get_latest_movies_all_sites()
-                user_state[chat_id].update({
+                try:
+                    site_results = get_latest_movies_all_sites(on_queued=queued_notice(
+                        chat_id, message_id, f"🔥 Fetching latest movies from {site_info['emoji']} {site_info['name']}"))
+                except Overloaded as e:
+                    bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=busy_text(e), parse_mode='HTML',
+                                          reply_markup=create_back_navigation_keyboard(scroll_id))
+                    bot.answer_callback_query(callback['id'])
+                    return '', 200
+                snapshot_id = snapshots.put(site_results)
+                user_state.update_session(chat_id, {
                     'step': 'latest_selection',
-                    'site_results': site_results,
+                    'current_site': site,
+                    'snapshot_id': snapshot_id,
+                    'offset': 0,
                     'scroll_id': scroll_id
                 })
 
@@ -590,24 +1005,33 @@ def telegram_webhook():
                     message_id=message_id,
                     text=results_text,
                     parse_mode='HTML',
-                    reply_markup=create_movie_selection_keyboard(scroll_id, site, titles)
+                    reply_markup=snapshots.keyboard(snapshot_id, site)
                 )
                 bot.answer_callback_query(callback['id'])
+                schedule_prefetch(site, site_results[site])
                 logger.info(f"User {chat_id} selected site {site} for latest movies")
 
+            elif callback_data.startswith(('next_', 'prev_', 'select_')) and snapshots.get(callback_data.split('_')[1]) is None:
+                bot.answer_callback_query(callback['id'], text="⏰ These results were cleared to free memory. Please search again.", show_alert=True)
+                return '', 200
+
             elif callback_data.startswith(('next_', 'prev_')):
-                parts = callback_data.split('_')
-                action, scroll_id, site, offset = parts[0], parts[1], parts[2], int(parts[3])
-                
-                if site not in state.get('site_results', {}):
+                prefix, site, offset = callback_data.rsplit('_', 2)
+                action, snapshot_id = prefix.split('_', 1)
+                offset = int(offset)
+                snapshot = snapshots.get(snapshot_id)
+
+                if site not in snapshot:
                     bot.answer_callback_query(callback['id'], text="❌ Invalid site!", show_alert=True)
                     return '', 200
 
-                titles = state['site_results'][site]['titles']
-                site_info = SITES.get(site, {'name': site.capitalize(), 'emoji': '🎬'})
+                titles = snapshot[site]['titles']
+                site_info = site_display(site)
+                user_state.update_session(chat_id, {'snapshot_id': snapshot_id, 'current_site': site, 'offset': offset})
                 
+                heading = 'Latest Movies' if state['step'] == 'latest_selection' else f"Results for {state.get('movie_name', 'Unknown')}"
                 results_text = (
-                    f"✨ <b>{'Latest Movies' if state['step'] == 'latest_selection' else f'Results for {state.get('movie_name', 'Unknown')}'}</b>\n\n"
+                    f"✨ <b>{heading}</b>\n\n"
                     f"🎬 <b>Site:</b> {site_info['emoji']} {site_info['name']}\n"
                     f"📊 <b>Showing:</b> {offset + 1} - {min(offset + MAX_RESULTS_PER_SITE, len(titles))} of {len(titles)}\n\n"
                     f"📱 <b>Select a movie:</b>"
@@ -618,28 +1042,29 @@ def telegram_webhook():
                     message_id=message_id,
                     text=results_text,
                     parse_mode='HTML',
-                    reply_markup=create_movie_selection_keyboard(scroll_id, site, titles, offset)
+                    reply_markup=snapshots.keyboard(snapshot_id, site, offset)
                 )
                 bot.answer_callback_query(callback['id'])
 
             elif callback_data.startswith('select_'):
                 try:
-                    parts = callback_data.split('_')
-                    if len(parts) != 4:
+                    parts = callback_data.rsplit('_', 2)
+                    if len(parts) != 3 or '_' not in parts[0]:
                         raise ValueError("Invalid callback data format")
-                    _, scroll_id, site, index = parts
+                    prefix, site, index = parts
+                    snapshot_id = prefix.split('_', 1)[1]
                     index = int(index)
-                    
-                    if site not in state.get('site_results', {}) or index >= len(state['site_results'][site]['links']):
+                    snapshot = snapshots.get(snapshot_id)
+
+                    if site not in snapshot or index >= len(snapshot[site]['links']):
                         raise ValueError("Invalid selection")
                         
                 except ValueError as e:
                     bot.answer_callback_query(callback['id'], text=f"❌ Invalid selection: {str(e)}!", show_alert=True)
                     return '', 200
 
-                selected_url = state['site_results'][site]['links'][index]
-                selected_title = state['site_results'][site]['titles'][index]
-                site_info = SITES.get(site, {'name': site.capitalize(), 'emoji': '🎬'})
+                real_site, selected_url, selected_title, other_sources = selected_entry(snapshot, site, index)
+                site_info = site_display(real_site)
 
                 bot.edit_message_text(
                     chat_id=chat_id,
@@ -653,52 +1078,26 @@ def telegram_webhook():
                     parse_mode='HTML'
                 )
 
-                download_links = get_download_links_for_movie(selected_url, site)
+                try:
+                    download_links = get_download_links_for_movie(selected_url, real_site, on_queued=queued_notice(
+                        chat_id, message_id, f"📥 Getting download links for {selected_title}"))
+                except Overloaded as e:
+                    bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=busy_text(e), parse_mode='HTML',
+                                          reply_markup=create_back_navigation_keyboard(snapshot_id))
+                    bot.answer_callback_query(callback['id'])
+                    return '', 200
 
-                if download_links:
-                    links_text = ""
-                    for i, link in enumerate(download_links[:10], 1):
-                        parts = link.rsplit(':', 1)
-                        title = parts[0].strip() if len(parts) == 2 else f"Link {i}"
-                        url = parts[1].strip() if len(parts) == 2 else link.strip()
-                        links_text += f"<b>{i}) {title}:</b>\n<a href='{url}'>{url}</a>\n\n"
-                    
-                    final_text = (
-                        f"✅ <b>Download Links Ready!</b>\n\n"
-                        f"🎬 <b>Movie:</b> {selected_title}\n"
-                        f"🌐 <b>Site:</b> {site_info['emoji']} {site_info['name']}\n"
-                        f"📋 <b>Found:</b> {len(download_links)} links\n\n"
-                        f"📥 <b>Download Links:</b>\n\n{links_text}"
-                        f"💡 <i>Click links to open</i>"
-                    )
-                    
-                    bot.edit_message_text(
-                        chat_id=chat_id,
-                        message_id=message_id,
-                        text=final_text,
-                        parse_mode='HTML',
-                        reply_markup=create_back_navigation_keyboard(scroll_id),
-                        disable_web_page_preview=True
-                    )
-                else:
-                    bot.edit_message_text(
-                        chat_id=chat_id,
-                        message_id=message_id,
-                        text=(
-                            f"😔 <b>No download links found</b>\n\n"
-                            f"🎬 <b>Movie:</b> {selected_title}\n"
-                            f"🌐 <b>Site:</b> {site_info['emoji']} {site_info['name']}\n\n"
-                            f"💡 <b>Try:</b>\n"
-                            f"  • Another movie\n"
-                            f"  • A different site\n"
-                            f"  • Check debug logs for details"
-                        ),
-                        parse_mode='HTML',
-                        reply_markup=create_back_navigation_keyboard(scroll_id)
-                    )
+                bot.edit_message_text(
+                    chat_id=chat_id,
+                    message_id=message_id,
+                    text=render_download_links(selected_title, site_info, download_links, other_sources),
+                    parse_mode='HTML',
+                    reply_markup=create_back_navigation_keyboard(snapshot_id),
+                    disable_web_page_preview=True
+                )
 
                 bot.answer_callback_query(callback['id'])
-                logger.info(f"User {chat_id} got {len(download_links)} download links for '{selected_title}' on {site}")
+                logger.info(f"User {chat_id} got {len(download_links)} download links for '{selected_title}' on {real_site}")
 
         return '', 200
 
@@ -712,7 +1111,133 @@ def telegram_webhook():
 def health_check():
     """Health check endpoint."""
     logger.debug("Health check requested")
-    return jsonify({"status": "healthy", "time": datetime.now().isoformat(), "active_users": len(user_state)})
+    return jsonify(health_payload())
+
+def health_payload():
+    """Build the health report shared by the Flask and ASGI runtimes."""
+    scheduler_status = scheduler.status()
+    return {
+        "status": "healthy",
+        "time": datetime.now().isoformat(),
+        "active_users": len(user_state),
+        "sessions": user_state.stats(),
+        "snapshots": snapshots.stats(),
+        "prefetch": prefetcher.stats(),
+        "latest_feed": latest_feed.stats(),
+        "watchlist": len(watchlist),
+        "title_index": title_index.stats(),
+        "persistent_cache": result_store.stats() if result_store else None,
+        "throttle": host_throttle.stats(),
+        "resolver_throttle": resolver_throttle.stats(),
+        "mirrors": mirrors.stats(),
+        "wp_fastpath": fastpath.stats(),
+        "catalog": catalog.stats() if catalog else None,
+        "resolver": link_resolver.stats(),
+        "liveness": link_checker.stats(),
+        "parse_pool": parse_pool.stats(),
+        "admission": admission.stats(),
+        # Only the leader probes domains; other workers report its last published result
+        "domains": domain_health if scheduler.is_leader else scheduler_status['jobs'].get('domain_monitor', {}).get('result'),
+        "scheduler": scheduler_status,
+        "startup": startup.report()
+    }
+
+def memory_report():
+    """Memory diagnostics shared by /memory and /debug/memory."""
+    refs = user_state.snapshot_refs()
+    sizes = {chat_id: snapshots.size(key) for chat_id, key in refs.items()}
+    return memdiag.report(sizes, session_total=sum(snapshots.size(key) for key in set(refs.values())))
+
+def bearer_matches(authorization, token):
+    """Check an Authorization header against a bearer token (always False when the token is unset)."""
+    if not token or not authorization or not authorization.startswith('Bearer '):
+        return False
+    return hmac.compare_digest(authorization[len('Bearer '):].strip(), token)
+
+def admin_authorized(authorization):
+    """Check an Authorization header against ADMIN_TOKEN (diagnostics are off without one)."""
+    return bearer_matches(authorization, ADMIN_TOKEN)
+
+@app.route('/debug/memory', methods=['GET'])
+def debug_memory():
+    """Admin-only memory diagnostics."""
+    if not admin_authorized(request.headers.get('Authorization')):
+        return jsonify({"error": "not found"}), 404
+    return jsonify(memory_report())
+
+api_executor = ThreadPoolExecutor(max_workers=API_MAX_CONCURRENCY, thread_name_prefix='api-search')
+
+def parse_search_batch(payload):
+    """Validate an /api/search body and return ([(query, site)], error message or None)."""
+    if not isinstance(payload, dict):
+        return [], "expected a JSON object"
+    queries = payload.get('queries')
+    if isinstance(queries, str):
+        queries = [queries]
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+        return [], "'queries' must be a non-empty list of strings"
+    sites = payload.get('sites') or list(SITES)
+    if isinstance(sites, str):
+        sites = [sites]
+    unknown = [site for site in sites if site not in SITES]
+    if unknown:
+        return [], f"unknown sites: {', '.join(map(str, unknown))}"
+    pairs = list(dict.fromkeys((query.strip(), site) for query in queries for site in sites))
+    if len(pairs) > API_MAX_BATCH:
+        return [], f"batch of {len(pairs)} searches exceeds the limit of {API_MAX_BATCH}"
+    return pairs, None
+
+def search_result_line(query, site, titles, links, started, cached=False, error=None, done=None, found=0):
+    """One NDJSON line: a (query, site) result, or the closing summary when done is the batch size."""
+    elapsed_ms = round((time.monotonic() - started) * 1000)
+    if done is not None:
+        line = {'done': True, 'searches': done, 'results': found, 'elapsed_ms': elapsed_ms}
+    else:
+        line = {'query': query, 'site': site, 'cached': cached,
+                'results': [{'title': bare_title(title), 'url': link} for title, link in zip(titles, links)],
+                'elapsed_ms': elapsed_ms}
+        if error:
+            line['error'] = error
+    return json.dumps(line) + '\n'
+
+def stream_search_batch(pairs):
+    """Run (query, site) searches on the shared API pool and yield an NDJSON line as each one finishes."""
+    started = time.monotonic()
+    futures = {}
+    for query, site in pairs:
+        cached = (site, normalize_query(query)) in search_cache
+        futures[api_executor.submit(search_movies_single_site, query, site)] = (query, site, cached)
+    found = 0
+    try:
+        for future in as_completed(futures):
+            query, site, cached = futures[future]
+            try:
+                titles, links = future.result()
+                error = None
+            except Exception as e:
+                logger.error(f"API search for '{query}' on {site} failed: {e}")
+                titles, links, error = [], [], str(e)
+            found += len(titles)
+            yield search_result_line(query, site, titles, links, started, cached=cached, error=error)
+        yield search_result_line(None, None, [], [], started, done=len(pairs), found=found)
+        logger.info(f"API batch of {len(pairs)} searches finished in {time.monotonic() - started:.2f}s")
+    finally:
+        # Client went away or the batch finished: drop searches that have not started yet
+        for future in futures:
+            future.cancel()
+
+@app.route('/api/search', methods=['POST'])
+def api_search():
+    """Batch search: stream one NDJSON line per (query, site) as results arrive."""
+    if not API_TOKEN:
+        return jsonify({"error": "not found"}), 404
+    if not bearer_matches(request.headers.get('Authorization'), API_TOKEN):
+        return jsonify({"error": "unauthorized"}), 401
+    pairs, error = parse_search_batch(request.get_json(silent=True))
+    if error:
+        return jsonify({"error": error}), 400
+    logger.info(f"API batch search: {len(pairs)} searches")
+    return Response(stream_search_batch(pairs), mimetype='application/x-ndjson')
 
 def set_webhook():
     """Set Telegram webhook."""
@@ -734,31 +1259,89 @@ def set_webhook():
             time.sleep(2 * (attempt + 1))
 
 def keep_alive():
-    """Periodically ping health endpoint to prevent Railway spin-down."""
+    """Ping the health endpoint to prevent Railway spin-down."""
     railway_domain = os.environ.get('RAILWAY_PUBLIC_DOMAIN')
-    if not railway_domain:
-        logger.error("RAILWAY_PUBLIC_DOMAIN not set")
-        return
-    while True:
-        try:
-            response = requests.get(f"https://{railway_domain}/health", timeout=5)
-            logger.debug(f"Keep-alive ping: {response.status_code}")
-        except Exception as e:
-            logger.warning(f"Keep-alive ping failed: {e}")
-        time.sleep(120)
+    response = requests.get(f"https://{railway_domain}/health", timeout=5)
+    logger.debug(f"Keep-alive ping: {response.status_code}")
+    return response.status_code
 
 def cleanup():
     """Clean up on shutdown."""
     user_state.clear()
     logger.info("Cleaned up user states on shutdown")
+    parse_pool.shutdown()
+    try:
+        if result_store:
+            result_store.flush()
+            logger.info("Flushed pending writes to the persistent cache")
+        else:
+            saved = save_snapshot([search_cache, latest_cache, prefetcher.cache], CACHE_SNAPSHOT_FILE)
+            logger.info(f"Saved {saved} cache entries to {CACHE_SNAPSHOT_FILE}")
+    except Exception as e:
+        logger.error(f"Error saving cache snapshot: {e}")
+
+def seed_title_index():
+    """Index titles already held in the search cache and stored latest feeds."""
+    seeded = 0
+    try:
+        for (site, _), _, (titles, links) in search_cache.export():
+            seeded += title_index.add(site, zip(titles, links))
+        for site in SITES:
+            feed = latest_feed.feeds.get(site)
+            if feed:
+                seeded += title_index.add(site, feed['items'])
+        logger.info(f"Seeded title index with {seeded} titles")
+    except Exception as e:
+        logger.error(f"Error seeding title index: {e}")
+
+@app.after_request
+def track_first_response(response):
+    startup.record_first_response(request.path)
+    return response
+
+startup.mark('app_init')
+
+if FAST_START:
+    try:
+        if result_store:
+            restored = sum(cache.warm() for cache in (search_cache, latest_cache, prefetcher.cache))
+            logger.info(f"Warmed {restored} cache entries from {PERSISTENT_CACHE_PATH}")
+        else:
+            restored = load_snapshot([search_cache, latest_cache, prefetcher.cache], CACHE_SNAPSHOT_FILE)
+            logger.info(f"Restored {restored} cache entries from {CACHE_SNAPSHOT_FILE}")
+    except Exception as e:
+        logger.error(f"Error restoring cache snapshot: {e}")
+    startup.mark('cache_restore')
+else:
+    for site in SITES:
+        scraper(site)
+    startup.mark('scrapers')
 
 state_cleanup_thread = threading.Thread(target=cleanup_expired_states, daemon=True)
 state_cleanup_thread.start()
-
-keep_alive_thread = threading.Thread(target=keep_alive, daemon=True)
-keep_alive_thread.start()
+# Domain changes are saved by whichever worker makes them (the leader's failover, an admin command)
+threading.Thread(target=watch_site_config, name='site-config-watcher', daemon=True).start()
+
+# Periodic jobs run in one worker per host; the session reaper above stays per process
+scheduler = Scheduler()
+scheduler.add('domain_monitor', check_all_sites, DOMAIN_CHECK_INTERVAL)
+scheduler.add('watch_refresher', refresh_watched_feeds, WATCH_REFRESH_INTERVAL, initial_delay=WATCH_REFRESH_INTERVAL)
+if catalog:
+    # Let the fast-path probes finish first so title lookups know whether the REST API answers
+    scheduler.add('catalog_sync', lambda: catalog.sync_all(list(SITES)), CATALOG_SYNC_INTERVAL, initial_delay=60)
+if os.environ.get('RAILWAY_PUBLIC_DOMAIN'):
+    # With FAST_START, let the first real requests have the instance to themselves
+    scheduler.add('keep_alive', keep_alive, KEEP_ALIVE_INTERVAL, initial_delay=KEEP_ALIVE_INTERVAL if FAST_START else 0)
+else:
+    logger.error("RAILWAY_PUBLIC_DOMAIN not set")
+scheduler.start()
+
+threading.Thread(target=seed_title_index, daemon=True).start()
+# Find out which sites answer on their WordPress REST API or RSS feed before the first listing
+threading.Thread(target=fastpath.probe_all, args=(list(SITES),), daemon=True).start()
 
 atexit.register(cleanup)
+startup.mark('background_threads')
 
 if __name__ == "__main__":
     set_webhook()
@@ -0,0 +1,136 @@
+import os
+import gc
+import threading
+import time
+import tracemalloc
+import weakref
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+MEMDIAG_TRACEMALLOC = os.environ.get('MEMDIAG_TRACEMALLOC', '0') == '1'  # Trace from boot instead of from the first report
+TRACE_FRAMES = 10
+TOP_ALLOCATORS = 10
+
+_live_soups = weakref.WeakSet()  # parse trees not yet garbage collected
+_soup_counts = {'created': 0, 'decomposed': 0}
+_lock = threading.Lock()
+_last_snapshot = None
+_last_snapshot_at = None
+
+if MEMDIAG_TRACEMALLOC:
+    tracemalloc.start(TRACE_FRAMES)
+
+@contextmanager
+def parse_html(html, parser='html.parser'):
+    """Yield a tracked BeautifulSoup tree and decompose it as soon as extraction is done."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, parser)
+    with _lock:
+        _live_soups.add(soup)
+        _soup_counts['created'] += 1
+    try:
+        yield soup
+    finally:
+        soup.decompose()
+        with _lock:
+            _soup_counts['decomposed'] += 1
+
+def rss_bytes():
+    """Current resident set size from /proc, or peak RSS where /proc is unavailable."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _stat_row(stat):
+    frame = stat.traceback[0]
+    return {'where': f"{frame.filename}:{frame.lineno}", 'size': stat.size, 'count': stat.count}
+
+def _diff_row(stat):
+    frame = stat.traceback[0]
+    return {'where': f"{frame.filename}:{frame.lineno}", 'size_diff': stat.size_diff, 'count_diff': stat.count_diff}
+
+def report(session_sizes=None, limit=TOP_ALLOCATORS, session_total=None):
+    """Collect RSS, tracemalloc top allocators and the diff since the previous report, parse-tree and per-chat sizes.
+
+    session_sizes maps chats to the bytes of the result set they reference; chats
+    can share one, so session_total gives the deduplicated total when known.
+    """
+    global _last_snapshot, _last_snapshot_at
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(TRACE_FRAMES)
+        logger.info("Started tracemalloc for memory diagnostics")
+
+    # Collect first so "live" parse trees are ones still referenced, not ones awaiting the cycle collector
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+    with _lock:
+        previous, previous_at = _last_snapshot, _last_snapshot_at
+        _last_snapshot, _last_snapshot_at = snapshot, time.time()
+        soups = {'live': len(_live_soups), **_soup_counts}
+
+    diff = None
+    if previous is not None:
+        diff = {
+            'seconds': round(time.time() - previous_at, 1),
+            'top': [_diff_row(stat) for stat in snapshot.compare_to(previous, 'lineno')[:limit]]
+        }
+
+    session_sizes = session_sizes or {}
+    largest = sorted(session_sizes.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return {
+        'rss_bytes': rss_bytes(),
+        'tracemalloc': {
+            'started_now': started_tracing,
+            'current_bytes': current,
+            'peak_bytes': peak,
+            'top': [_stat_row(stat) for stat in snapshot.statistics('lineno')[:limit]],
+            'diff': diff
+        },
+        'soups': soups,
+        'gc': {'counts': gc.get_count(), 'objects': len(gc.get_objects())},
+        'sessions': {
+            'chats': len(session_sizes),
+            'total_bytes': sum(session_sizes.values()) if session_total is None else session_total,
+            'largest': [{'chat_id': chat_id, 'bytes': size} for chat_id, size in largest]
+        }
+    }
+
+def _mb(size):
+    return f"{size / (1024 * 1024):.1f}MB"
+
+def format_report(data, limit=5):
+    """Render a report as a short HTML message for Telegram."""
+    trace = data['tracemalloc']
+    lines = [
+        "🧠 <b>Memory Diagnostics</b>\n",
+        f"📦 <b>RSS:</b> {_mb(data['rss_bytes'])}",
+        f"🔬 <b>Traced:</b> {_mb(trace['current_bytes'])} (peak {_mb(trace['peak_bytes'])})",
+        f"🍲 <b>Parse trees:</b> {data['soups']['live']} live, {data['soups']['created']} created, {data['soups']['decomposed']} freed",
+        f"👥 <b>Sessions:</b> {data['sessions']['chats']} chats, {_mb(data['sessions']['total_bytes'])} of results\n",
+    ]
+    if trace['started_now']:
+        lines.append("ℹ️ <i>Tracing just started; allocations before now are not attributed.</i>\n")
+    lines.append("<b>Top allocators:</b>")
+    lines += [f"• <code>{row['where']}</code> {_mb(row['size'])} ({row['count']})" for row in trace['top'][:limit]]
+    if trace['diff']:
+        lines.append(f"\n<b>Change over {trace['diff']['seconds']}s:</b>")
+        lines += [f"• <code>{row['where']}</code> {row['size_diff'] / 1024:+.0f}KB ({row['count_diff']:+d})"
+                  for row in trace['diff']['top'][:limit]]
+    if data['sessions']['largest']:
+        lines.append("\n<b>Largest sessions:</b>")
+        lines += [f"• {row['chat_id']}: {row['bytes'] / 1024:.0f}KB" for row in data['sessions']['largest'][:limit]]
+    return "\n".join(lines)
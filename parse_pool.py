@@ -0,0 +1,118 @@
+import os
+import asyncio
+import importlib
+import threading
+import multiprocessing
+import logging
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+PARSE_MODE = os.environ.get('PARSE_MODE', 'thread')  # 'thread' parses in a thread (the caller's, or a worker off the event loop), 'process' in a worker pool
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', 0)) or os.cpu_count() or 2
+PARSE_TIMEOUT = 30  # Seconds a single parse may take in a worker
+
+_pool = None
+_lock = threading.Lock()
+metrics = {'inline': 0, 'process': 0, 'fallbacks': 0}
+
+def _parser(site, kind):
+    return getattr(importlib.import_module(site), f"parse_{kind}")
+
+def _run(site, kind, html):
+    """Worker entry point: parse in the pool process and return only the extracted records."""
+    return _parser(site, kind)(html)
+
+def _noop():
+    return os.getpid()
+
+def start(workers=PARSE_WORKERS, preload=()):
+    """Start the worker pool when PARSE_MODE=process; returns True when parsing will be offloaded.
+
+    Workers are forked with the preload modules (the parsers) already imported, so
+    call this at boot before anything starts a thread: a thread holding a lock at
+    fork time would leave that lock held forever in every child. Once other
+    threads exist the pool is not started and parsing stays in threads.
+    """
+    global _pool
+    if PARSE_MODE != 'process':
+        return False
+    with _lock:
+        if _pool is not None:
+            return True
+        for module in preload:
+            importlib.import_module(module)
+        others = [thread.name for thread in threading.enumerate() if thread is not threading.current_thread()]
+        if others:
+            logger.error(f"Not forking parse workers with threads already running ({', '.join(others)}); "
+                         f"parsing in threads instead")
+            return False
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            logger.warning("Process parsing needs fork; parsing in threads instead")
+            return False
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        # A fork-context pool launches every worker on its first task, so fork them all now
+        _pool.submit(_noop).result()
+    logger.info(f"Started parse pool with {workers} workers")
+    return True
+
+def _offload(site, kind, html):
+    """Submit a parse to the pool, or return None when parsing should stay in this process."""
+    global _pool
+    if _pool is None:
+        return None
+    try:
+        return _pool.submit(_run, site, kind, html)
+    except (BrokenProcessPool, RuntimeError) as e:
+        logger.error(f"Parse pool unavailable ({e}); parsing in threads from now on")
+        metrics['fallbacks'] += 1
+        _pool = None
+        return None
+
+def parse(site, kind, html):
+    """Run site.parse_<kind>(html), in the process pool when one is running."""
+    future = _offload(site, kind, html)
+    if future is not None:
+        try:
+            result = future.result(timeout=PARSE_TIMEOUT)
+            metrics['process'] += 1
+            return result
+        except BrokenProcessPool as e:
+            logger.error(f"Parse worker died while parsing {site} {kind}: {e}")
+            metrics['fallbacks'] += 1
+        except FutureTimeout:
+            logger.warning(f"Parse of {site} {kind} took over {PARSE_TIMEOUT}s in the pool; parsing inline")
+            metrics['fallbacks'] += 1
+    metrics['inline'] += 1
+    return _parser(site, kind)(html)
+
+async def parse_async(site, kind, html):
+    """parse() for the event loop: awaits the pool, or parses on a worker thread without one."""
+    future = _offload(site, kind, html)
+    if future is not None:
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), PARSE_TIMEOUT)
+            metrics['process'] += 1
+            return result
+        except BrokenProcessPool as e:
+            logger.error(f"Parse worker died while parsing {site} {kind}: {e}")
+            metrics['fallbacks'] += 1
+        except asyncio.TimeoutError:
+            logger.warning(f"Parse of {site} {kind} took over {PARSE_TIMEOUT}s in the pool; parsing in a thread")
+            metrics['fallbacks'] += 1
+    metrics['inline'] += 1
+    return await asyncio.to_thread(_parser(site, kind), html)
+
+def shutdown():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def stats():
+    return {'mode': 'process' if _pool is not None else 'thread',
+            'workers': PARSE_WORKERS if _pool is not None else 0, **metrics}
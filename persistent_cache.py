@@ -0,0 +1,212 @@
+import os
+import json
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+PERSISTENT_CACHE_PATH = os.environ.get('PERSISTENT_CACHE_PATH', 'result_cache.db')  # Empty disables the on-disk cache
+PERSISTENT_CACHE_MAX_BYTES = int(os.environ.get('PERSISTENT_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # Compressed value bytes kept on disk
+WRITE_BATCH_INTERVAL = float(os.environ.get('PERSISTENT_CACHE_FLUSH_INTERVAL', 0.5))  # Seconds writes are gathered before a commit
+WRITE_BATCH_SIZE = 200
+EVICTION_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    site TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, site, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires_at);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+"""
+
+def split_key(key):
+    """Split a cache key into (site, normalized key) columns."""
+    if isinstance(key, (list, tuple)):
+        site, rest = (key[0], list(key[1:])) if key else ('', [])
+        return str(site), json.dumps(rest, separators=(',', ':'))
+    return str(key), ''
+
+def join_key(site, key):
+    """Inverse of split_key."""
+    if not key:
+        return site
+    return (site, *json.loads(key))
+
+def encode(value):
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+
+def decode(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+class PersistentStore:
+    """SQLite (WAL) cache shared by every worker process and kept across restarts.
+
+    Reads go straight to the database on a per-thread connection; writes are queued
+    and committed in batches by a single writer thread. Expired rows are dropped and
+    the least recently read rows evicted once the stored blobs exceed max_bytes.
+    """
+
+    def __init__(self, path=PERSISTENT_CACHE_PATH, max_bytes=PERSISTENT_CACHE_MAX_BYTES,
+                 flush_interval=WRITE_BATCH_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._touched = {}  # {(namespace, site, key): accessed_at} recorded by readers, flushed by the writer
+        self._touched_lock = threading.Lock()
+        self.metrics = {'hits': 0, 'misses': 0, 'writes': 0, 'batches': 0, 'evicted': 0, 'errors': 0}
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        self._writer = threading.Thread(target=self._run_writer, name='persistent-cache-writer', daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=10000')
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key):
+        """Return (expires_at, value) for an unexpired entry, or None."""
+        site, norm_key = split_key(key)
+        try:
+            row = self._connect().execute(
+                'SELECT value, expires_at FROM entries WHERE namespace=? AND site=? AND key=? AND expires_at>?',
+                (namespace, site, norm_key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.metrics['errors'] += 1
+            logger.warning(f"Persistent cache read failed for {namespace}: {e}")
+            return None
+        if row is None:
+            self.metrics['misses'] += 1
+            return None
+        self.metrics['hits'] += 1
+        with self._touched_lock:
+            self._touched[(namespace, site, norm_key)] = time.time()
+        return row[1], decode(row[0])
+
+    def put(self, namespace, key, value, expires_at):
+        """Queue an entry for the next batched write."""
+        site, norm_key = split_key(key)
+        try:
+            blob = encode(value)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Not persisting {namespace} entry {key}: {e}")
+            return
+        self._queue.put(('put', (namespace, site, norm_key, blob, len(blob), expires_at, time.time())))
+
+    def delete(self, namespace, key):
+        site, norm_key = split_key(key)
+        self._queue.put(('delete', (namespace, site, norm_key)))
+
+    def load(self, namespace, limit):
+        """Return up to limit unexpired [key, expires_at, value] rows, most recently read last."""
+        rows = self._connect().execute(
+            'SELECT site, key, expires_at, value FROM entries WHERE namespace=? AND expires_at>? '
+            'ORDER BY accessed_at DESC LIMIT ?',
+            (namespace, time.time(), limit)
+        ).fetchall()
+        return [[join_key(site, key), expires_at, decode(value)] for site, key, expires_at, value in reversed(rows)]
+
+    def flush(self, timeout=5):
+        """Block until everything queued so far has been committed."""
+        done = threading.Event()
+        self._queue.put(('sync', done))
+        return done.wait(timeout)
+
+    def stats(self):
+        try:
+            count, total = self._connect().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        except sqlite3.Error:
+            count, total = None, None
+        return {'entries': count, 'bytes': total, 'max_bytes': self.max_bytes,
+                'pending_writes': self._queue.qsize(), **self.metrics}
+
+    def _run_writer(self):
+        conn = self._connect()
+        last_eviction = 0
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < WRITE_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(conn, batch)
+                if time.monotonic() - last_eviction > EVICTION_INTERVAL:
+                    self._evict(conn)
+                    last_eviction = time.monotonic()
+            except sqlite3.Error as e:
+                self.metrics['errors'] += 1
+                logger.error(f"Persistent cache write failed ({len(batch)} ops): {e}")
+            finally:
+                for op, payload in batch:
+                    if op == 'sync':
+                        payload.set()
+
+    def _write_batch(self, conn, batch):
+        with self._touched_lock:
+            touched, self._touched = self._touched, {}
+        puts = [payload for op, payload in batch if op == 'put']
+        deletes = [payload for op, payload in batch if op == 'delete']
+        if not (puts or deletes or touched):
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)', puts)
+            conn.executemany('DELETE FROM entries WHERE namespace=? AND site=? AND key=?', deletes)
+            conn.executemany('UPDATE entries SET accessed_at=? WHERE namespace=? AND site=? AND key=?',
+                             [(accessed_at, *entry) for entry, accessed_at in touched.items()])
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+        self.metrics['writes'] += len(puts) + len(deletes)
+        self.metrics['batches'] += 1
+
+    def _evict(self, conn):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            expired = conn.execute('DELETE FROM entries WHERE expires_at<=?', (time.time(),)).rowcount
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            victims = []
+            if total > self.max_bytes:
+                # Drop least recently read rows until we are back under 90% of the budget
+                excess = total - int(self.max_bytes * 0.9)
+                for namespace, site, key, size in conn.execute(
+                        'SELECT namespace, site, key, size FROM entries ORDER BY accessed_at'):
+                    if excess <= 0:
+                        break
+                    victims.append((namespace, site, key))
+                    excess -= size
+                conn.executemany('DELETE FROM entries WHERE namespace=? AND site=? AND key=?', victims)
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+        evicted = len(victims)
+        self.metrics['evicted'] += expired + evicted
+        if expired or evicted:
+            logger.info(f"Persistent cache dropped {expired} expired and {evicted} least recently used entries")
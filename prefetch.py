@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.environ.get('PREFETCH_ENABLED', '1') != '0'
+PREFETCH_TOP_N = int(os.environ.get('PREFETCH_TOP_N', 3))  # Results prefetched per listing
+PREFETCH_PER_SITE = int(os.environ.get('PREFETCH_PER_SITE', 2))  # Concurrent prefetches per site
+PREFETCH_BUDGET = int(os.environ.get('PREFETCH_BUDGET', 30))  # Prefetches allowed per minute
+PREFETCH_TTL = int(os.environ.get('PREFETCH_TTL', 900))  # Seconds a prefetched result stays usable
+PREFETCH_WAIT = 20  # Seconds a tap waits for an in-flight prefetch
+
+class Prefetcher:
+    """Speculatively fetch download links for the top search results."""
+
+    def __init__(self, fetch_fn, top_n=PREFETCH_TOP_N, per_site=PREFETCH_PER_SITE,
+                 budget=PREFETCH_BUDGET, ttl=PREFETCH_TTL, enabled=PREFETCH_ENABLED, store=None):
+        self.fetch_fn = fetch_fn  # fetch_fn(url, site) -> list of download links
+        self.top_n = top_n
+        self.per_site = per_site
+        self.budget = budget
+        self.enabled = enabled
+        self.cache = TTLCache('download_links', ttl, max_entries=1024, on_evict=self._on_evict, store=store)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, per_site * 3), thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._inflight = {}  # {(site, url): Future}
+        self._running = {}  # {site: count}
+        self._queued = {}  # {site: deque of urls}
+        self._unclaimed = set()  # prefetched keys nobody has tapped yet
+        self._budget_window = deque()  # start times of recent prefetches
+        self.metrics = {
+            'scheduled': 0,
+            'fetched': 0,
+            'failed': 0,
+            'hits': 0,
+            'inflight_hits': 0,
+            'misses': 0,
+            'wasted': 0,
+            'skipped_budget': 0
+        }
+
+    def schedule(self, site, links):
+        """Queue the first top_n links of a result listing for prefetching."""
+        if not self.enabled:
+            return
+        for url in links[:self.top_n]:
+            key = (site, url)
+            # Outside self._lock: an expired entry calls _on_evict, which takes it
+            if self.cache.get(key) is not None:
+                continue
+            with self._lock:
+                if key in self._inflight:
+                    continue
+                if url in self._queued.get(site, ()):
+                    continue
+                self._queued.setdefault(site, deque(maxlen=self.top_n * 2)).append(url)
+                self.metrics['scheduled'] += 1
+        self._dispatch(site)
+
+    def claim(self, url, site):
+        """Return prefetched links for a tapped result, or None on a miss."""
+        key = (site, url)
+        links = self.cache.get(key)
+        if links is not None:
+            with self._lock:
+                if key in self._unclaimed:
+                    self._unclaimed.discard(key)
+                    self.metrics['hits'] += 1
+            return links
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                self._remove_queued(site, url)
+                self.metrics['misses'] += 1
+                return None
+
+        try:
+            links = future.result(timeout=PREFETCH_WAIT)
+        except Exception as e:
+            logger.warning(f"In-flight prefetch for {url} on {site} failed: {e}")
+            links = None
+        with self._lock:
+            self._unclaimed.discard(key)
+            self.metrics['inflight_hits' if links else 'misses'] += 1
+        return links or None
+
+    def store(self, url, site, links):
+        """Cache links fetched on the regular (non-speculative) path."""
+        if links:
+            self.cache.set((site, url), links)
+
+    def stats(self):
+        self.cache.purge_expired()
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics['inflight'] = len(self._inflight)
+            metrics['queued'] = sum(len(q) for q in self._queued.values())
+        served = metrics['hits'] + metrics['inflight_hits']
+        total = served + metrics['misses']
+        metrics['hit_rate'] = round(served / total, 3) if total else None
+        metrics['cached'] = len(self.cache)
+        return metrics
+
+    def _dispatch(self, site):
+        """Start queued prefetches for a site while under its concurrency cap and the budget."""
+        while True:
+            with self._lock:
+                queue = self._queued.get(site)
+                if not queue or self._running.get(site, 0) >= self.per_site:
+                    return
+                now = time.time()
+                while self._budget_window and now - self._budget_window[0] > 60:
+                    self._budget_window.popleft()
+                if len(self._budget_window) >= self.budget:
+                    skipped = len(queue)
+                    queue.clear()
+                    self.metrics['skipped_budget'] += skipped
+                    logger.debug(f"Prefetch budget exhausted, skipped {skipped} links for {site}")
+                    return
+                url = queue.popleft()
+                key = (site, url)
+                self._budget_window.append(now)
+                self._running[site] = self._running.get(site, 0) + 1
+                self._inflight[key] = self._executor.submit(self._run, site, url)
+
+    def _run(self, site, url):
+        key = (site, url)
+        links = []
+        try:
+            logger.debug(f"Prefetching download links for {url} on {site}")
+            links = self.fetch_fn(url, site) or []
+        except Exception as e:
+            logger.warning(f"Prefetch failed for {url} on {site}: {e}")
+        finally:
+            if links:
+                with self._lock:
+                    self._unclaimed.add(key)
+                self.cache.set(key, links)
+            with self._lock:
+                self._running[site] -= 1
+                self._inflight.pop(key, None)
+                self.metrics['fetched' if links else 'failed'] += 1
+            self._dispatch(site)
+        return links
+
+    def _remove_queued(self, site, url):
+        queue = self._queued.get(site)
+        if queue and url in queue:
+            queue.remove(url)
+
+    def _on_evict(self, key, value):
+        with self._lock:
+            if key in self._unclaimed:
+                self._unclaimed.discard(key)
+                self.metrics['wasted'] += 1
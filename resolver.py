@@ -0,0 +1,169 @@
+import os
+import re
+import time
+import logging
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urljoin, urlparse
+from cache import TTLCache
+from throttle import throttled_get, resolver_throttle
+from memdiag import parse_html
+
+logger = logging.getLogger(__name__)
+
+RESOLVER_ENABLED = os.environ.get('RESOLVER_ENABLED', '1') != '0'
+RESOLVER_WORKERS = int(os.environ.get('RESOLVER_WORKERS', 8))  # Links resolved in parallel across all users
+RESOLVE_DEADLINE = float(os.environ.get('RESOLVE_DEADLINE', 8))  # Seconds a whole batch may take
+RESOLVE_CACHE_TTL = int(os.environ.get('RESOLVE_CACHE_TTL', 6 * 3600))
+MAX_HOPS = 5
+REQUEST_TIMEOUT = (3, 5)
+MAX_PAGE_BYTES = 512 * 1024
+
+# Hosts whose pages stand between the user and the file host; extend with RESOLVER_HOSTS=host1,host2
+INTERMEDIATE_HOSTS = ['gdflix', 'filepress', 'gdtot', 'hubcloud', 'hubdrive', 'gdlink', 'appdrive', 'drivebot',
+                      'shrinkme', 'gplinks', 'droplink', 'ouo.io', 'ouo.press', 'tnlink', 'adrinolinks', 'linkvertise',
+                      'shortingly', 'urlshortx', 'modijiurl', 'shrtfly', 'bit.ly', 'tinyurl']
+INTERMEDIATE_HOSTS += [host.strip().lower() for host in os.environ.get('RESOLVER_HOSTS', '').split(',') if host.strip()]
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
+}
+
+_META_REFRESH = re.compile(r'<meta[^>]+http-equiv=["\']?refresh["\']?[^>]*content=["\']?\d+\s*;\s*url=([^"\'>\s]+)', re.IGNORECASE)
+_JS_REDIRECT = re.compile(r'(?:window\.)?location(?:\.href)?\s*(?:=|\.replace\(|\.assign\()\s*["\']([^"\']+)["\']', re.IGNORECASE)
+_DOWNLOAD_TEXT = re.compile(r'download|instant|direct|cloud|server|fast|\bdl\b', re.IGNORECASE)
+_FILE_PATH = re.compile(r'\.(mkv|mp4|avi|m4v|webm|zip|rar|7z)$', re.IGNORECASE)
+
+def is_intermediate(url):
+    """True for links that still need following: known hop hosts, unless the path already names a file."""
+    parsed = urlparse(url)
+    if _FILE_PATH.search(parsed.path):
+        return False
+    return any(marker in parsed.netloc.lower() for marker in INTERMEDIATE_HOSTS)
+
+def extract_next_url(html, base_url):
+    """Find where an intermediate page sends the user: meta refresh, JS redirect or a download button."""
+    match = _META_REFRESH.search(html) or _JS_REDIRECT.search(html)
+    if match:
+        return urljoin(base_url, match.group(1))
+
+    with parse_html(html) as soup:
+        candidates = []
+        for anchor in soup.select('a[href]'):
+            href = urljoin(base_url, anchor['href'])
+            if not href.startswith(('http://', 'https://')) or href.split('#')[0] == base_url:
+                continue
+            if _DOWNLOAD_TEXT.search(anchor.get_text(' ', strip=True)):
+                candidates.append(href)
+    # Prefer a button that leaves the intermediate hosts altogether
+    for href in candidates:
+        if not is_intermediate(href):
+            return href
+    return candidates[0] if candidates else None
+
+class LinkResolver:
+    """Follow gdflix/filepress/shortener hops concurrently to reach the final file-host URL."""
+
+    def __init__(self, workers=RESOLVER_WORKERS, deadline=RESOLVE_DEADLINE, ttl=RESOLVE_CACHE_TTL,
+                 enabled=RESOLVER_ENABLED, store=None):
+        self.deadline = deadline
+        self.enabled = enabled
+        self.cache = TTLCache('resolved_links', ttl, max_entries=4096, store=store)  # {intermediate url: final url}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='resolve')
+        self._background = set()  # urls being resolved for a later cached_only lookup
+        self._lock = threading.Lock()
+        self.metrics = {'resolved': 0, 'cache_hits': 0, 'unresolved': 0, 'timeouts': 0}
+
+    def resolve(self, url):
+        """Return the final URL behind an intermediate link (the link itself when it cannot be followed)."""
+        cached = self.cache.get(url)
+        if cached is not None:
+            self.metrics['cache_hits'] += 1
+            return cached
+
+        session = requests.Session()
+        current = url
+        try:
+            for _ in range(MAX_HOPS):
+                response = throttled_get(session, current, throttle=resolver_throttle, headers=HEADERS,
+                                         timeout=REQUEST_TIMEOUT, allow_redirects=False, stream=True)
+                with response:
+                    if response.is_redirect and response.headers.get('Location'):
+                        current = urljoin(current, response.headers['Location'])
+                        if not is_intermediate(current):
+                            break
+                        continue
+                    if response.status_code != 200 or 'html' not in response.headers.get('Content-Type', ''):
+                        break
+                    html = response.raw.read(MAX_PAGE_BYTES, decode_content=True).decode(response.encoding or 'utf-8', 'replace')
+                next_url = extract_next_url(html, current)
+                if not next_url or next_url == current:
+                    break
+                current = next_url
+                if not is_intermediate(current):
+                    break
+        except requests.RequestException as e:
+            logger.warning(f"Could not resolve {url}: {e}")
+            self.metrics['unresolved'] += 1
+            return url
+        finally:
+            session.close()
+
+        self.metrics['resolved' if current != url else 'unresolved'] += 1
+        if current != url:
+            logger.info(f"Resolved {url} -> {current}")
+        self.cache.set(url, current)
+        return current
+
+    def resolve_all(self, entries, cached_only=False):
+        """Resolve "title: url" entries in parallel; links not resolved within the deadline stay as they were.
+
+        With cached_only, substitute cached resolutions without waiting and resolve the
+        rest in the background for next time.
+        """
+        if not self.enabled:
+            return entries
+        started = time.monotonic()
+        resolved = list(entries)
+        futures = {}
+        for i, entry in enumerate(entries):
+            title, _, url = entry.rpartition(': ')
+            if not title or not is_intermediate(url):
+                continue
+            if cached_only:
+                cached = self.cache.get(url)
+                if cached is not None:
+                    resolved[i] = f"{title}: {cached}"
+                    self.metrics['cache_hits'] += 1
+                else:
+                    self._resolve_later(url)
+            else:
+                futures[i] = self._executor.submit(self.resolve, url)
+        if not futures:
+            return resolved
+        done, pending = wait(futures.values(), timeout=self.deadline)
+        self.metrics['timeouts'] += len(pending)
+
+        for i, future in futures.items():
+            if future in done and future.exception() is None:
+                title, _, _ = entries[i].rpartition(': ')
+                resolved[i] = f"{title}: {future.result()}"
+        logger.info(f"Resolved {len(done)}/{len(futures)} intermediate links in {time.monotonic() - started:.2f}s")
+        return resolved
+
+    def _resolve_later(self, url):
+        with self._lock:
+            if url in self._background:
+                return
+            self._background.add(url)
+        future = self._executor.submit(self.resolve, url)
+        future.add_done_callback(lambda _: self._finish_later(url))
+
+    def _finish_later(self, url):
+        with self._lock:
+            self._background.discard(url)
+
+    def stats(self):
+        return {**self.metrics, 'cached': len(self.cache)}
@@ -0,0 +1,199 @@
+import sys
+import heapq
+import itertools
+import threading
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+def estimate_size(obj, _seen=None):
+    """Approximate deep size in bytes of plain containers and strings."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    return size
+
+class SessionStore:
+    """Per-chat conversation state with deadline-indexed expiry.
+
+    Expiry deadlines live in a min-heap (stale entries are skipped lazily), so the
+    reaper wakes exactly when the next session is due instead of scanning every chat.
+    Result sets live in the SnapshotStore; a session only holds its snapshot id.
+    """
+
+    def __init__(self, timeout, on_reap=None):
+        self.timeout = timeout.total_seconds() if hasattr(timeout, 'total_seconds') else timeout
+        self._sessions = OrderedDict()  # {chat_id: state}, least recently active first
+        self._deadlines = {}  # {chat_id: monotonic deadline}
+        self._heap = []  # [(deadline, seq, chat_id)]
+        self._seq = itertools.count()
+        self._lock = threading.RLock()
+        self._wakeup = threading.Condition(self._lock)
+        self._chat_locks = {}  # {chat_id: [RLock, holders]}
+        self.on_reap = on_reap  # called as on_reap(snapshot_refs()) after the reaper expires sessions
+        self.metrics = {'expired': 0}
+
+    def lock(self, chat_id):
+        """Return a ChatLock handle on the lock serializing updates for one chat."""
+        with self._lock:
+            entry = self._chat_locks.setdefault(chat_id, [threading.RLock(), 0])
+            entry[1] += 1  # Counted from hand-out, so pruning can't swap the lock before it is acquired
+            return ChatLock(self, chat_id, entry[0])
+
+    def _unhold(self, chat_id):
+        with self._lock:
+            self._chat_locks[chat_id][1] -= 1
+
+    def __contains__(self, chat_id):
+        with self._lock:
+            return chat_id in self._sessions and not self._expire_if_due(chat_id)
+
+    def __getitem__(self, chat_id):
+        with self._lock:
+            if chat_id not in self:
+                raise KeyError(chat_id)
+            return self._sessions[chat_id]
+
+    def get(self, chat_id, default=None):
+        try:
+            return self[chat_id]
+        except KeyError:
+            return default
+
+    def __setitem__(self, chat_id, state):
+        with self._lock:
+            self._sessions[chat_id] = state
+            self._touch(chat_id)
+
+    def __delitem__(self, chat_id):
+        with self._lock:
+            if chat_id not in self._sessions:
+                raise KeyError(chat_id)
+            self._remove(chat_id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def touch(self, chat_id):
+        """Mark a chat active and push its expiry deadline back."""
+        with self._lock:
+            if chat_id in self._sessions:
+                self._touch(chat_id)
+
+    def update_session(self, chat_id, fields):
+        """Update a chat's state and refresh its deadline."""
+        with self._lock:
+            self._sessions[chat_id].update(fields)
+            self._touch(chat_id)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self._deadlines.clear()
+            self._heap.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'heap_entries': len(self._heap),
+                **self.metrics
+            }
+
+    def snapshot_refs(self):
+        """Return {chat_id: snapshot id} for chats holding a result set."""
+        with self._lock:
+            return {chat_id: state['snapshot_id'] for chat_id, state in self._sessions.items() if state.get('snapshot_id')}
+
+    def run_reaper(self):
+        """Remove sessions as their deadlines pass (blocking loop for a daemon thread)."""
+        with self._wakeup:
+            while True:
+                now = time.monotonic()
+                reaped = 0
+                while self._heap and self._heap[0][0] <= now:
+                    deadline, _, chat_id = heapq.heappop(self._heap)
+                    if self._deadlines.get(chat_id) == deadline:
+                        self._remove(chat_id)
+                        self.metrics['expired'] += 1
+                        reaped += 1
+                        logger.info(f"Cleaned up expired state for chat_id {chat_id}")
+                if reaped and self.on_reap:
+                    try:
+                        self.on_reap(self.snapshot_refs())
+                    except Exception as e:
+                        logger.error(f"Session reap callback failed: {e}")
+                self._prune_chat_locks()
+                self._wakeup.wait(timeout=self._heap[0][0] - now if self._heap else None)
+
+    def _touch(self, chat_id):
+        deadline = time.monotonic() + self.timeout
+        self._deadlines[chat_id] = deadline
+        self._sessions[chat_id]['last_active'] = datetime.now()
+        self._sessions.move_to_end(chat_id)
+        wake = not self._heap or deadline < self._heap[0][0]
+        heapq.heappush(self._heap, (deadline, next(self._seq), chat_id))
+        # Every touch leaves a stale heap entry behind; rebuild when they dominate
+        if len(self._heap) > 4 * len(self._sessions) + 64:
+            self._heap = [(d, next(self._seq), c) for c, d in self._deadlines.items()]
+            heapq.heapify(self._heap)
+        if wake:
+            self._wakeup.notify()
+
+    def _expire_if_due(self, chat_id):
+        if self._deadlines.get(chat_id, float('inf')) <= time.monotonic():
+            self._remove(chat_id)
+            self.metrics['expired'] += 1
+            logger.info(f"Cleaned up expired state for chat_id {chat_id}")
+            return True
+        return False
+
+    def _remove(self, chat_id):
+        self._sessions.pop(chat_id, None)
+        self._deadlines.pop(chat_id, None)
+
+    def _prune_chat_locks(self):
+        if len(self._chat_locks) <= 2 * len(self._sessions) + 64:
+            return
+        for chat_id, (_, holders) in list(self._chat_locks.items()):
+            if chat_id not in self._sessions and not holders:
+                del self._chat_locks[chat_id]
+
+class ChatLock:
+    """A handed-out chat lock; release() (or leaving the with block) gives it back.
+
+    A handle that never acquired the lock must be returned with abandon().
+    """
+
+    def __init__(self, store, chat_id, rlock):
+        self._store = store
+        self._chat_id = chat_id
+        self._rlock = rlock
+
+    def acquire(self, blocking=True):
+        return self._rlock.acquire(blocking)
+
+    def release(self):
+        self._rlock.release()
+        self._store._unhold(self._chat_id)
+
+    def abandon(self):
+        self._store._unhold(self._chat_id)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,138 @@
+import os
+import json
+import hashlib
+import itertools
+import threading
+import time
+import logging
+from collections import Counter, OrderedDict
+from types import MappingProxyType
+from sessions import estimate_size
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MEMORY_BUDGET = int(os.environ.get('SNAPSHOT_MEMORY_BUDGET', 50 * 1024 * 1024))  # Bytes of stored result sets
+KEYBOARD_CACHE_SIZE = 2048  # Rendered keyboard pages kept across all snapshots
+EVICTION_WINDOW = 8  # Least recently used snapshots weighed against each other by size
+UNREFERENCED_GRACE = 120  # Seconds a snapshot no session references is kept (it may not be attached yet)
+
+def freeze(value):
+    """Deep-convert lists and dicts into tuples and read-only mappings."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def snapshot_id(site_results):
+    """Content address of a result set: equal results from any chat get the same id."""
+    encoded = json.dumps(site_results, sort_keys=True, separators=(',', ':'), default=list).encode()
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+class SnapshotStore:
+    """Immutable result sets shared by every chat that asked for the same data.
+
+    put() stores {site: {'titles', 'links', ...}} once under its content hash, so a
+    chat's state only needs the snapshot id and its offset. Keyboard pages are
+    rendered once per (snapshot, site, offset) with render_keyboard(snapshot id,
+    site, titles, offset) and reused for every chat and every next/prev tap. Past the
+    memory budget the largest of the least recently used snapshots (and their
+    keyboards) go first; prune() drops snapshots no live session references.
+    """
+
+    def __init__(self, render_keyboard, memory_budget=SNAPSHOT_MEMORY_BUDGET, keyboard_cache_size=KEYBOARD_CACHE_SIZE):
+        self.render_keyboard = render_keyboard
+        self.memory_budget = memory_budget
+        self.keyboard_cache_size = keyboard_cache_size
+        self._snapshots = OrderedDict()  # {id: frozen site_results}, least recently used first
+        self._sizes = {}  # {id: bytes}
+        self._used = {}  # {id: monotonic time of the last put/get}
+        self._keyboards = OrderedDict()  # {(id, site, offset): InlineKeyboardMarkup}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.metrics = {'created': 0, 'shared': 0, 'evicted': 0, 'pruned': 0, 'keyboard_hits': 0, 'keyboard_renders': 0}
+
+    def put(self, site_results):
+        """Store a result set (or find the identical one already stored) and return its id."""
+        key = snapshot_id(site_results)
+        with self._lock:
+            self._used[key] = time.monotonic()
+            if key in self._snapshots:
+                self._snapshots.move_to_end(key)
+                self.metrics['shared'] += 1
+                return key
+            self._snapshots[key] = freeze(site_results)
+            self._sizes[key] = estimate_size(site_results)
+            self.total_bytes += self._sizes[key]
+            self.metrics['created'] += 1
+            self._enforce_budget(keep=key)
+        return key
+
+    def get(self, key):
+        """The frozen result set for an id, or None once it has been evicted."""
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                self._snapshots.move_to_end(key)
+                self._used[key] = time.monotonic()
+            return snapshot
+
+    def size(self, key):
+        """Estimated bytes of a stored result set, or 0 once it has been evicted."""
+        with self._lock:
+            return self._sizes.get(key, 0)
+
+    def keyboard(self, key, site, offset=0):
+        """The movie-selection keyboard page for a snapshot, rendered on first use; None if evicted."""
+        cache_key = (key, site, offset)
+        with self._lock:
+            markup = self._keyboards.get(cache_key)
+            if markup is not None:
+                self._keyboards.move_to_end(cache_key)
+                self.metrics['keyboard_hits'] += 1
+                return markup
+            snapshot = self._snapshots.get(key)
+        if snapshot is None or site not in snapshot:
+            return None
+        markup = self.render_keyboard(key, site, snapshot[site]['titles'], offset)
+        with self._lock:
+            self._keyboards[cache_key] = markup
+            self.metrics['keyboard_renders'] += 1
+            while len(self._keyboards) > self.keyboard_cache_size:
+                self._keyboards.popitem(last=False)
+        return markup
+
+    def prune(self, refs):
+        """Drop snapshots that no chat in refs ({chat_id: snapshot id}) holds any more."""
+        counts = Counter(refs.values())
+        cutoff = time.monotonic() - UNREFERENCED_GRACE
+        with self._lock:
+            unreferenced = [key for key in self._snapshots if not counts[key] and self._used.get(key, 0) < cutoff]
+            for key in unreferenced:
+                self._evict(key)
+            self.metrics['pruned'] += len(unreferenced)
+        if unreferenced:
+            logger.info(f"Dropped {len(unreferenced)} result snapshots no session references")
+        return len(unreferenced)
+
+    def _enforce_budget(self, keep):
+        while self.total_bytes > self.memory_budget and len(self._snapshots) > 1:
+            window = [key for key in itertools.islice(self._snapshots, EVICTION_WINDOW) if key != keep]
+            if not window:
+                break
+            largest = max(window, key=self._sizes.__getitem__)
+            self._evict(largest)
+            self.metrics['evicted'] += 1
+            logger.info(f"Evicted result snapshot {largest} to stay within the snapshot memory budget")
+
+    def _evict(self, key):
+        del self._snapshots[key]
+        self._used.pop(key, None)
+        self.total_bytes -= self._sizes.pop(key)
+        for cache_key in [cache_key for cache_key in self._keyboards if cache_key[0] == key]:
+            del self._keyboards[cache_key]
+
+    def stats(self):
+        with self._lock:
+            return {'snapshots': len(self._snapshots), 'bytes': self.total_bytes, 'memory_budget': self.memory_budget,
+                    'keyboards': len(self._keyboards), **self.metrics}
@@ -0,0 +1,370 @@
+"""Local stand-ins for the Telegram Bot API and the movie sites.
+
+Used by loadtest.py to exercise the bot without touching the network. Each site
+stand-in serves synthetic pages with the same markup the scrapers expect (and,
+when enabled, the WordPress REST API and RSS feeds over the same posts, and
+Yoast-style sitemaps over a catalog of posts), and the link-host stand-in plays
+the gdflix-style hops between a movie page and the file.
+"""
+import html
+import json
+import random
+import threading
+import time
+import zlib
+from collections import defaultdict
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type, headers=None):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+def _form_fields(content_type, body):
+    """Decode urlencoded or multipart form bodies (the async Bot API client posts forms)."""
+    if content_type.startswith('application/x-www-form-urlencoded'):
+        return {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+    if content_type.startswith('multipart/form-data'):
+        message = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        return {part.get_param('name', header='content-disposition'): part.get_payload(decode=True).decode('utf-8')
+                for part in message.get_payload()}
+    return {}
+
+class TelegramStub:
+    """Minimal Bot API server that accepts every call and records what the bot sent."""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.lock = threading.Lock()
+        self.calls = defaultdict(int)  # {method: count}
+        self.last_text = {}  # {chat_id: str}
+        self.last_markup = {}  # {chat_id: dict}
+        self.alerts = []  # answerCallbackQuery texts shown as alerts
+        self._message_id = 0
+        stub = self
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                self._handle()
+
+            def do_POST(self):
+                self._handle()
+
+            def _handle(self):
+                parsed = urlparse(self.path)
+                method = parsed.path.rsplit('/', 1)[-1]
+                params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    params.update(_form_fields(self.headers.get('Content-Type', ''), self.rfile.read(length)))
+                result = stub.record(method, params)
+                self._send(200, json.dumps({'ok': True, 'result': result}), 'application/json')
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def api_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/bot{{0}}/{{1}}"
+
+    def record(self, method, params):
+        with self.lock:
+            self.calls[method] += 1
+            chat_id = params.get('chat_id')
+            if method in ('sendMessage', 'editMessageText') and chat_id is not None:
+                chat_id = int(chat_id)
+                self.last_text[chat_id] = params.get('text', '')
+                self.last_markup[chat_id] = json.loads(params['reply_markup']) if params.get('reply_markup') else None
+            if method == 'answerCallbackQuery' and params.get('show_alert') in ('true', 'True', '1'):
+                self.alerts.append(params.get('text', ''))
+            if method not in ('sendMessage', 'editMessageText'):
+                return True
+            self._message_id += 1
+            return {
+                'message_id': self._message_id,
+                'date': int(time.time()),
+                'chat': {'id': int(chat_id or 0), 'type': 'private'},
+                'text': params.get('text', '')
+            }
+
+    def buttons(self, chat_id, prefix):
+        """Return callback_data of the buttons last shown to a chat that start with prefix."""
+        with self.lock:
+            markup = self.last_markup.get(chat_id) or {}
+        return [button['callback_data'] for row in markup.get('inline_keyboard', []) for button in row
+                if button.get('callback_data', '').startswith(prefix)]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+FEED_PER_PAGE = 10  # WordPress' default posts_per_rss
+SITEMAP_SIZE = 50  # Posts per stand-in post sitemap (Yoast uses 1000)
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+def _listing_item(site, title, url):
+    if site == 'hdmovie2':
+        return f'<article class="item movies"><div class="data"><h3><a href="{url}">{title}</a></h3></div></article>'
+    if site == 'hdhub4u':
+        return f'<li class="thumb"><figure><img src="/p.jpg"></figure><figcaption><a href="{url}">{title}</a></figcaption></li>'
+    return f'<article class="latestPost excerpt"><h2 class="title front-view-title"><a href="{url}">{title}</a></h2></article>'
+
+def listing_posts(site, base, query, page, per_page):
+    """The (title, url) posts on one page of a search or latest listing."""
+    label = query.title() if query else 'Latest Movie'
+    return [(f"{label} {(page - 1) * per_page + i} (2023) Hindi WEB-DL 1080p", f"{base}/movie/{site}-{page}-{i}/")
+            for i in range(1, per_page + 1)]
+
+def listing_page(site, base, query, page, pages, per_page):
+    """Render a search or latest listing page in a site's markup."""
+    items = ''.join(_listing_item(site, title, url) for title, url in listing_posts(site, base, query, page, per_page))
+    if site == 'hdmovie2':
+        return f'<html><body><div class="items normal">{items}</div></body></html>'
+    pagination = '<div class="pagination"><a class="next" href="#">Next</a></div>' if page < pages else ''
+    container = f'<ul class="recent-movies">{items}</ul>' if site == 'hdhub4u' else f'<div id="content_box">{items}</div>'
+    return f'<html><body>{container}{pagination}</body></html>'
+
+def wp_posts_json(posts, fields=None):
+    """Render posts the way /wp-json/wp/v2/posts does, trimmed to _fields when given."""
+    rendered = []
+    for i, (title, url) in enumerate(posts, 1):
+        post = {
+            'id': zlib.crc32(url.encode()), 'date': '2023-12-01T10:00:00', 'slug': url.rstrip('/').rsplit('/', 1)[-1],
+            'status': 'publish', 'type': 'post', 'link': url,
+            'title': {'rendered': html.escape(title)},
+            'content': {'rendered': f'<p>{html.escape(title)} download links below.</p>', 'protected': False},
+            'excerpt': {'rendered': f'<p>{html.escape(title)}</p>', 'protected': False},
+            'author': 1, 'featured_media': i, 'categories': [3, 7], 'tags': []
+        }
+        rendered.append({key: post[key] for key in fields} if fields else post)
+    return json.dumps(rendered)
+
+def rss_feed(base, posts):
+    """Render posts as a WordPress RSS 2.0 feed."""
+    items = ''.join(
+        f'<item><title>{html.escape(title)}</title><link>{html.escape(url)}</link>'
+        f'<pubDate>Fri, 01 Dec 2023 10:00:00 +0000</pubDate><category><![CDATA[Movies]]></category>'
+        f'<description><![CDATA[{title} download links inside.]]></description></item>'
+        for title, url in posts
+    )
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Stand-in</title>'
+            f'<link>{base}</link><description>Latest posts</description>{items}</channel></rss>')
+
+def slugify(title):
+    return '-'.join(''.join(c if c.isalnum() else ' ' for c in title.lower()).split())
+
+def sitemap_xml(entries, index=False):
+    """Render [(loc, lastmod)] as a sitemap index or a urlset."""
+    tag, item = ('sitemapindex', 'sitemap') if index else ('urlset', 'url')
+    body = ''.join(f'<{item}><loc>{html.escape(loc)}</loc>{f"<lastmod>{lastmod}</lastmod>" if lastmod else ""}</{item}>'
+                   for loc, lastmod in entries)
+    return f'<?xml version="1.0" encoding="UTF-8"?><{tag} xmlns="{SITEMAP_NS}">{body}</{tag}>'
+
+def movie_page(site, slug, links=6, link_base="https://gdflix.example"):
+    """Render a movie page with download links in a site's markup."""
+    qualities = ['480p', '720p', '1080p', '2160p']
+    anchors = []
+    for i in range(links):
+        quality = qualities[i % len(qualities)]
+        url = f"{link_base}/file/{slug}-{i}"
+        if site == 'cinevood':
+            anchors.append(f'<h6>{slug} {quality} [1.2GB]</h6><p><a class="maxbutton" href="{url}">Download</a></p>')
+        else:
+            anchors.append(f'<p><a href="{url}">{quality} Download [1.2GB]</a></p>')
+    body = ''.join(anchors)
+    container = f'<div id="links">{body}</div>' if site == 'hdmovie2' else f'<div class="entry-content">{body}</div>'
+    return f'<html><body><h1>{slug}</h1><p><a href="https://t.me/x">Join Telegram</a></p>{container}</body></html>'
+
+class SiteStandin:
+    """Replay server for one movie site with adjustable latency."""
+
+    def __init__(self, site, host='127.0.0.1', port=0, latency=0.2, jitter=0.1, pages=1, per_page=20,
+                 link_base="https://gdflix.example", wp_endpoints=(), catalog=()):
+        self.site = site
+        self.wp_endpoints = set(wp_endpoints)  # Of 'rest' and 'feed'; the others answer 403 like a blocked install
+        self.catalog = {}  # {slug: [title, lastmod]}, oldest first, listed in the sitemaps
+        for title in catalog:
+            self.publish(title)
+        self.link_base = link_base
+        self.latency = latency
+        self.jitter = jitter
+        self.pages = pages
+        self.per_page = per_page
+        self.requests = 0
+        standin = self
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                standin.requests += 1
+                time.sleep(max(0, standin.latency + random.uniform(-standin.jitter, standin.jitter)))
+                parsed = urlparse(self.path)
+                params = parse_qs(parsed.query)
+                query = params.get('s', [''])[0]
+                parts = [part for part in parsed.path.split('/') if part]
+                if parts == ['sitemap_index.xml'] and standin.catalog:
+                    self._send(200, sitemap_xml(standin.sitemap_index(), index=True), 'application/xml')
+                elif len(parts) == 1 and parts[0].startswith('post-sitemap') and parts[0].endswith('.xml') and standin.catalog:
+                    self._send(200, sitemap_xml(standin.post_sitemap(parts[0])), 'application/xml')
+                elif parts[:4] == ['wp-json', 'wp', 'v2', 'posts']:
+                    self._rest(params)
+                elif parts == ['feed'] or (not parts and 'feed' in params):
+                    self._feed(query, int(params.get('paged', ['1'])[0]))
+                elif parts[:1] == ['movie'] and len(parts) > 1:
+                    self._send(200, movie_page(standin.site, parts[1], link_base=standin.link_base), 'text/html; charset=utf-8')
+                elif not parts or (parts[0] == 'page' and len(parts) > 1 and parts[1].isdigit()):
+                    page = int(parts[1]) if parts else 1
+                    if page > standin.pages:
+                        self._send(404, '<html><body>Not found</body></html>', 'text/html')
+                        return
+                    self._send(200, listing_page(standin.site, standin.base_url, query, page, standin.pages, standin.per_page),
+                               'text/html; charset=utf-8')
+                else:
+                    self._send(404, '<html><body>Not found</body></html>', 'text/html')
+
+            def _rest(self, params):
+                if 'rest' not in standin.wp_endpoints:
+                    self._send(403, json.dumps({'code': 'rest_forbidden', 'data': {'status': 403}}), 'application/json')
+                    return
+                per_page = int(params.get('per_page', ['10'])[0])
+                page = int(params.get('page', ['1'])[0])
+                if 'slug' in params:
+                    slugs = params['slug'][0].split(',')
+                    posts = [(standin.catalog[slug][0], standin.post_url(slug)) for slug in slugs if slug in standin.catalog]
+                else:
+                    posts = standin.all_posts(params.get('search', [''])[0])
+                total_pages = max(1, -(-len(posts) // per_page))
+                if page > total_pages:
+                    self._send(400, json.dumps({'code': 'rest_post_invalid_page_number', 'data': {'status': 400}}), 'application/json')
+                    return
+                fields = params.get('_fields', [''])[0].split(',') if params.get('_fields') else None
+                self._send(200, wp_posts_json(posts[(page - 1) * per_page:page * per_page], fields), 'application/json; charset=UTF-8',
+                           {'X-WP-Total': str(len(posts)), 'X-WP-TotalPages': str(total_pages)})
+
+            def _feed(self, query, page):
+                if 'feed' not in standin.wp_endpoints:
+                    self._send(403, '<html><body>Forbidden</body></html>', 'text/html')
+                    return
+                posts = standin.all_posts(query)[(page - 1) * FEED_PER_PAGE:page * FEED_PER_PAGE]
+                if not posts:
+                    self._send(404, '<html><body>Not found</body></html>', 'text/html')
+                    return
+                self._send(200, rss_feed(standin.base_url, posts), 'application/rss+xml; charset=UTF-8')
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    def publish(self, title, lastmod=None):
+        """Add a catalog post (or re-date an existing one) so the sitemaps change."""
+        self.catalog[slugify(title)] = [title, lastmod or time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime())]
+        return slugify(title)
+
+    def post_url(self, slug):
+        return f"{self.base_url}/movie/{slug}/"
+
+    def _sitemap_chunks(self):
+        slugs = list(self.catalog)
+        return [slugs[start:start + SITEMAP_SIZE] for start in range(0, len(slugs), SITEMAP_SIZE)]
+
+    def sitemap_index(self):
+        entries = [(f"{self.base_url}/post-sitemap{i if i > 1 else ''}.xml", max(self.catalog[slug][1] for slug in chunk))
+                   for i, chunk in enumerate(self._sitemap_chunks(), 1)]
+        return entries + [(f"{self.base_url}/page-sitemap.xml", None)]
+
+    def post_sitemap(self, name):
+        number = name[len('post-sitemap'):-len('.xml')] or '1'
+        chunks = self._sitemap_chunks()
+        chunk = chunks[int(number) - 1] if number.isdigit() and 0 < int(number) <= len(chunks) else []
+        return [(self.post_url(slug), self.catalog[slug][1]) for slug in chunk]
+
+    def all_posts(self, query=''):
+        """Every post the HTML listing spans, in listing order."""
+        return [post for page in range(1, self.pages + 1)
+                for post in listing_posts(self.site, self.base_url, query, page, self.per_page)]
+
+    @property
+    def domain(self):
+        host, port = self.server.server_address
+        return f"{host}:{port}"
+
+    @property
+    def base_url(self):
+        return f"http://{self.domain}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+class LinkHostStandin:
+    """gdflix-style link host: /file/<id> redirects to a landing page whose button leads to /dl/<id>.mkv.
+
+    A dead_ratio share of the files answer 404, so liveness checks have something to find.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.05, dead_ratio=0.2):
+        self.latency = latency
+        self.dead_ratio = dead_ratio
+        self.requests = defaultdict(int)  # {route: count}
+        standin = self
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                parts = [part for part in urlparse(self.path).path.split('/') if part]
+                with standin.lock:
+                    standin.requests[parts[0] if parts else ''] += 1
+                time.sleep(standin.latency)
+                if parts[:1] == ['file'] and len(parts) == 2:
+                    self._send(302, '', 'text/html', {'Location': f"/landing/{parts[1]}"})
+                elif parts[:1] == ['landing'] and len(parts) == 2:
+                    page = (f'<html><body><h5>{parts[1]}.mkv [1.2GB]</h5>'
+                            f'<a class="btn" href="/">Home</a>'
+                            f'<a class="btn btn-success" href="/dl/{parts[1]}.mkv">Instant DL [10GBPS]</a></body></html>')
+                    self._send(200, page, 'text/html; charset=utf-8')
+                elif parts[:1] == ['dl'] and len(parts) == 2 and not standin.is_dead(parts[1]):
+                    self._send(200, b'\x1aE\xdf\xa3' * 256, 'video/x-matroska', {'Accept-Ranges': 'bytes'})
+                else:
+                    self._send(404, '<html><body>File not found</body></html>', 'text/html')
+
+            do_HEAD = do_GET
+
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    def is_dead(self, name):
+        return zlib.crc32(name.encode()) % 100 < self.dead_ratio * 100
+
+    @property
+    def domain(self):
+        host, port = self.server.server_address
+        return f"{host}:{port}"
+
+    @property
+    def base_url(self):
+        return f"http://{self.domain}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
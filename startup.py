@@ -0,0 +1,38 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+BOOT_STARTED = time.perf_counter()
+FAST_START = os.environ.get('FAST_START', '0') == '1'
+CACHE_SNAPSHOT_FILE = os.environ.get('CACHE_SNAPSHOT_FILE', 'cache_snapshot.json')
+
+# Seconds spent in each startup stage, in the order they ran
+startup_timings = OrderedDict()  # {stage: seconds}
+first_response = {}  # {'path': str, 'seconds_since_boot': float}
+_last_mark = BOOT_STARTED
+
+def mark(stage):
+    """Record the time spent since the previous startup stage."""
+    global _last_mark
+    now = time.perf_counter()
+    startup_timings[stage] = round(now - _last_mark, 4)
+    _last_mark = now
+    return startup_timings[stage]
+
+def record_first_response(path):
+    """Remember how long after boot the first request was answered."""
+    if first_response:
+        return
+    first_response.update({'path': path, 'seconds_since_boot': round(time.perf_counter() - BOOT_STARTED, 4)})
+    logger.info(f"First response ({path}) {first_response['seconds_since_boot']}s after boot; startup stages: {dict(startup_timings)}")
+
+def report():
+    return {
+        'fast_start': FAST_START,
+        'stages': dict(startup_timings),
+        'boot_seconds': round(sum(startup_timings.values()), 4),
+        'first_response': first_response or None
+    }
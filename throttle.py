@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+import logging
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+HOST_RATE = float(os.environ.get('HOST_RATE', 1.0))  # Sustained requests per second per host
+HOST_BURST = int(os.environ.get('HOST_BURST', 3))  # Requests a host may receive back to back
+RESOLVER_HOST_RATE = float(os.environ.get('RESOLVER_HOST_RATE', 5.0))  # Same, for link-resolver hops to gdflix, filepress, shorteners
+RESOLVER_HOST_BURST = int(os.environ.get('RESOLVER_HOST_BURST', 10))
+MIN_HOST_RATE = 0.05  # Floor for the adaptive rate (one request every 20s)
+MAX_RETRY_AFTER = 60  # Longest Retry-After we wait out inline before giving up on a request
+BACKOFF_STATUSES = {429, 503}
+
+def retry_after_seconds(value):
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class _Bucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+class HostThrottle:
+    """Token bucket per host shared by every thread, crawl and session in the process.
+
+    reserve() hands out request slots: a token when one is available, otherwise a
+    slot in the future at the current rate. 429/503 responses halve the host's rate
+    and block it for Retry-After (or an exponential pause); successes restore the
+    rate gradually.
+    """
+
+    def __init__(self, rate=HOST_RATE, burst=HOST_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}  # {host: _Bucket}
+        self._lock = threading.Lock()
+        self.metrics = {'requests': 0, 'delayed': 0, 'backoffs': 0, 'wait_seconds': 0.0}
+
+    def _bucket(self, host):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = _Bucket(self.rate, self.burst)
+        return bucket
+
+    def reserve(self, host):
+        """Claim the next request slot for host and return how long to wait before sending."""
+        with self._lock:
+            bucket = self._bucket(host)
+            now = time.monotonic()
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+            bucket.updated = now
+            # Tokens may go negative: each waiter owns the slot it reserved
+            bucket.tokens -= 1
+            wait = max(0.0, -bucket.tokens / bucket.rate, bucket.blocked_until - now)
+            self.metrics['requests'] += 1
+            if wait > 0:
+                self.metrics['delayed'] += 1
+                self.metrics['wait_seconds'] += wait
+        return wait
+
+    def acquire(self, host):
+        """Block until a request to host may be sent."""
+        wait = self.reserve(host)
+        if wait > 0:
+            logger.debug(f"Throttling {host} for {wait:.2f}s")
+            time.sleep(wait)
+
+    def feedback(self, host, status, retry_after=None):
+        """Adapt a host's rate to the status of a response; returns the pause imposed, if any."""
+        with self._lock:
+            bucket = self._bucket(host)
+            if status in BACKOFF_STATUSES:
+                bucket.rate = max(MIN_HOST_RATE, bucket.rate / 2)
+                pause = retry_after if retry_after is not None else 1 / bucket.rate
+                bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + pause)
+                bucket.tokens = min(bucket.tokens, 0.0)
+                self.metrics['backoffs'] += 1
+                logger.warning(f"{host} answered {status}; pausing {pause:.1f}s, rate now {bucket.rate:.2f}/s")
+                return pause
+            if bucket.rate < self.rate:
+                bucket.rate = min(self.rate, bucket.rate + self.rate * 0.1)
+        return None
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            hosts = {host: {'rate': round(bucket.rate, 3),
+                            'tokens': round(min(self.burst, bucket.tokens + (now - bucket.updated) * bucket.rate), 2),
+                            'blocked_for': round(max(0.0, bucket.blocked_until - now), 1)}
+                     for host, bucket in self._buckets.items()}
+            return {'rate': self.rate, 'burst': self.burst, 'hosts': hosts,
+                    **self.metrics, 'wait_seconds': round(self.metrics['wait_seconds'], 1)}
+
+host_throttle = HostThrottle()
+resolver_throttle = HostThrottle(RESOLVER_HOST_RATE, RESOLVER_HOST_BURST)  # Resolver hops don't queue behind site pacing
+
+def host_of(url):
+    return urlparse(url).netloc.lower()
+
+def throttled_get(session, url, retries=1, throttle=None, **kwargs):
+    """session.get paced by a per-host throttle (host_throttle by default), retrying once after a short Retry-After."""
+    throttle = throttle or host_throttle
+    host = host_of(url)
+    for attempt in range(retries + 1):
+        throttle.acquire(host)
+        response = session.get(url, **kwargs)
+        pause = throttle.feedback(host, response.status_code,
+                                       retry_after_seconds(response.headers.get('Retry-After')))
+        if pause is None or attempt == retries or pause > MAX_RETRY_AFTER:
+            return response
+        logger.info(f"Retrying {url} after {response.status_code}")
+    return response
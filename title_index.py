@@ -0,0 +1,178 @@
+import os
+import re
+import time
+import heapq
+import threading
+import logging
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from titles import bare_title
+
+logger = logging.getLogger(__name__)
+
+TITLE_INDEX_MAX_ENTRIES = int(os.environ.get('TITLE_INDEX_MAX_ENTRIES', 20000))  # Titles remembered, oldest dropped first
+TITLE_INDEX_BUDGET_MS = float(os.environ.get('TITLE_INDEX_BUDGET_MS', 50))  # Longest a lookup may spend matching
+PREFIX_EXPANSION = 200  # Most vocabulary words one prefix may expand to
+TYPO_MIN_LENGTH = 4  # Shorter words match exactly or by prefix only
+
+EXACT, PREFIX, TYPO = 3, 2, 1  # Score of a query word matching a title word that way
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+def tokenize(text):
+    return [token for token in _NON_WORD.sub(' ', text.lower()).split() if token]
+
+def _variants(token):
+    """The word itself plus every single-character deletion (symmetric-delete typo lookup)."""
+    return {token} | {token[:i] + token[i + 1:] for i in range(len(token))}
+
+def within_one_edit(a, b):
+    """True when a and b differ by at most one insertion, deletion, substitution or adjacent swap."""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i + 1:i + 2] == b[i:i + 1] and a[i:i + 1] == b[i + 1:i + 2] and a[i + 2:] == b[i + 2:])
+    return a[i:] == b[i + 1:]
+
+class TitleIndex:
+    """In-memory word index over every (site, title, url) seen in searches and latest feeds.
+
+    Lookups match each query word exactly, as a prefix of a title word, or (for
+    longer words) within one typo, and stop early once the latency budget is
+    spent. Entries are kept most-recently-seen last and the oldest are dropped
+    past max_entries. on_miss(query) is called for lookups that find nothing so
+    the caller can warm the index in the background.
+    """
+
+    def __init__(self, max_entries=TITLE_INDEX_MAX_ENTRIES, budget_ms=TITLE_INDEX_BUDGET_MS, on_miss=None):
+        self.max_entries = max_entries
+        self.budget = budget_ms / 1000
+        self.on_miss = on_miss
+        self._entries = OrderedDict()  # {url: (site, title, tokens, seq)}
+        self._postings = {}  # {token: {url}}
+        self._vocabulary = []  # sorted tokens, for prefix lookups
+        self._variants = {}  # {variant: {token}}
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.metrics = {'lookups': 0, 'hits': 0, 'misses': 0, 'over_budget': 0, 'slowest_ms': 0.0}
+
+    def add(self, site, items):
+        """Index (title, url) pairs from a site; re-seen urls move to the most recent position."""
+        added = 0
+        with self._lock:
+            for title, url in items:
+                title = bare_title(title)
+                tokens = tuple(dict.fromkeys(tokenize(title)))
+                if not url or not tokens:
+                    continue
+                if url in self._entries:
+                    self._remove(url)
+                self._seq += 1
+                self._entries[url] = (site, title, tokens, self._seq)
+                for token in tokens:
+                    self._add_token(token, url)
+                added += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+        return added
+
+    def _add_token(self, token, url):
+        urls = self._postings.get(token)
+        if urls is None:
+            urls = self._postings[token] = set()
+            insort(self._vocabulary, token)
+            for variant in _variants(token):
+                self._variants.setdefault(variant, set()).add(token)
+        urls.add(url)
+
+    def _remove(self, url):
+        _, _, tokens, _ = self._entries.pop(url)
+        for token in tokens:
+            urls = self._postings[token]
+            urls.discard(url)
+            if urls:
+                continue
+            del self._postings[token]
+            del self._vocabulary[bisect_left(self._vocabulary, token)]
+            for variant in _variants(token):
+                words = self._variants[variant]
+                words.discard(token)
+                if not words:
+                    del self._variants[variant]
+
+    def _match_token(self, token):
+        """Return {url: score} for every title containing a word matching token."""
+        matches = {}
+        start = bisect_left(self._vocabulary, token)
+        for word in self._vocabulary[start:start + PREFIX_EXPANSION]:
+            if not word.startswith(token):
+                break
+            score = EXACT if word == token else PREFIX
+            for url in self._postings[word]:
+                if matches.get(url, 0) < score:
+                    matches[url] = score
+        if len(token) >= TYPO_MIN_LENGTH:
+            candidates = set()
+            for variant in _variants(token):
+                candidates |= self._variants.get(variant, set())
+            for word in candidates:
+                if word != token and within_one_edit(token, word):
+                    for url in self._postings[word]:
+                        matches.setdefault(url, TYPO)
+        return matches
+
+    def search(self, query, limit=20):
+        """Return up to limit (site, title, url) best matches, newest first among equals."""
+        started = time.monotonic()
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return self.recent(limit)
+
+        over_budget = False
+        scores, counts = {}, {}
+        with self._lock:
+            for token in tokens:
+                for url, score in self._match_token(token).items():
+                    scores[url] = scores.get(url, 0) + score
+                    counts[url] = counts.get(url, 0) + 1
+                if time.monotonic() - started > self.budget:
+                    over_budget = True
+                    break
+            # Every query word must match; long queries tolerate one word that matches nothing
+            needed = len(tokens) if len(tokens) < 3 else len(tokens) - 1
+            ranked = heapq.nsmallest(limit, ((-scores[url], -self._entries[url][3], url)
+                                             for url, count in counts.items() if count >= needed))
+            results = [(self._entries[url][0], self._entries[url][1], url) for _, _, url in ranked]
+
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.metrics['lookups'] += 1
+        self.metrics['hits' if results else 'misses'] += 1
+        self.metrics['over_budget'] += over_budget
+        self.metrics['slowest_ms'] = round(max(self.metrics['slowest_ms'], elapsed_ms), 2)
+        logger.debug(f"Title index: {len(results)} matches for '{query}' in {elapsed_ms:.1f}ms")
+        if not results and self.on_miss:
+            try:
+                self.on_miss(query)
+            except Exception as e:
+                logger.error(f"Error warming title index for '{query}': {e}")
+        return results
+
+    def recent(self, limit=20):
+        """The most recently indexed (site, title, url) entries."""
+        with self._lock:
+            entries = [item for _, item in zip(range(limit), reversed(self._entries.items()))]
+        return [(site, title, url) for url, (site, title, _, _) in entries]
+
+    def stats(self):
+        with self._lock:
+            return {**self.metrics, 'entries': len(self._entries), 'words': len(self._postings)}
+
+    def __len__(self):
+        return len(self._entries)
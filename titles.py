@@ -0,0 +1,112 @@
+import re
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+TITLE_KEY_CACHE_SIZE = 8192
+
+_NUMBER_PREFIX = re.compile(r'^\s*\d+\.\s+')
+_SITE_SUFFIX = re.compile(r'\s+\((hdmovie2|hdhub4u|cinevood)\)\s*$', re.IGNORECASE)
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+_YEAR = re.compile(r'^(19[2-9]\d|20\d\d)$')
+_SEASON_EPISODE = re.compile(r'\bs(\d{1,2})\s?e(\d{1,3})\b')
+_SEASON = re.compile(r'\b(?:season\s?|s)(\d{1,2})\b')
+_EPISODE = re.compile(r'\b(?:episode|ep|e)\s?(\d{1,3})\b')
+_SEASON_TOKEN = re.compile(r'^s\d{1,2}(e\d{1,3})?$')
+
+# Release decorations that never belong to the movie name
+NOISE_WORDS = {
+    'hindi', 'english', 'tamil', 'telugu', 'malayalam', 'kannada', 'bengali', 'punjabi', 'korean', 'japanese',
+    'dual', 'multi', 'audio', 'org', 'dubbed', 'esub', 'esubs', 'msubs', 'subs', 'line',
+    'web', 'dl', 'webrip', 'hdrip', 'bluray', 'brrip', 'bdrip', 'dvdrip', 'dvdscr', 'hdtc', 'hdts', 'hdcam',
+    'camrip', 'predvd', 'hq', 'amzn', 'nf', 'jio', 'zee5', 'ds4k', 'uncut', 'proper', 'repack', 'extended',
+    '480p', '576p', '720p', '1080p', '2160p', '4k', 'uhd', 'hd', 'fhd', 'hevc', 'x264', 'x265', 'h264', 'h265',
+    '10bit', 'hdr', 'aac', 'dd5', 'ddp5', 'atmos', 'mkv', 'full', 'movie', 'download', 'complete', 'series',
+}
+SERIES_MARKERS = {'season', 'episode', 'ep'}
+# Words sites put in front of the title ("Download Animal", "Watch Jawan Online"); always dropped there
+SITE_PREFIXES = {'download', 'watch'}
+
+def bare_title(title):
+    """Strip the "N. " numbering and "(site)" suffix the scrapers add to display titles."""
+    return _SITE_SUFFIX.sub('', _NUMBER_PREFIX.sub('', title)).strip()
+
+def _series_token(token):
+    return token in SERIES_MARKERS or _SEASON_TOKEN.match(token) is not None
+
+def _name_boundary(token):
+    return token is None or token in NOISE_WORDS or _series_token(token) or _YEAR.match(token) is not None
+
+@lru_cache(maxsize=TITLE_KEY_CACHE_SIZE)
+def canonical_key(title):
+    """Return (name, year, season, episode) identifying a release regardless of site decorations."""
+    text = ' '.join(_NON_WORD.sub(' ', bare_title(title).lower()).split())
+    season = episode = None
+    match = _SEASON_EPISODE.search(text)
+    if match:
+        season, episode = int(match.group(1)), int(match.group(2))
+    else:
+        match = _SEASON.search(text)
+        season = int(match.group(1)) if match else None
+        match = _EPISODE.search(text)
+        episode = int(match.group(1)) if match and season is not None else None
+
+    tokens = text.split()
+    start = 0
+    while start < len(tokens) and tokens[start] in SITE_PREFIXES:
+        start += 1
+    lead = start  # Leading decorations, e.g. "Dual Audio" or "S01"
+    while lead < len(tokens) and (tokens[lead] in NOISE_WORDS or _series_token(tokens[lead])):
+        lead += 1
+    if lead == start + 1 and tokens[start] in NOISE_WORDS and lead < len(tokens) and not _YEAR.match(tokens[lead]):
+        lead = start  # A lone leading noise word is part of the name: "Hindi Medium", "Full Metal Jacket"
+
+    name, year = [], None
+    for i in range(lead, len(tokens)):
+        token = tokens[i]
+        # The release year is never the name; a leading year-like token is only when a year follows ("1917 (2019)")
+        if _YEAR.match(token) and (name or not any(_YEAR.match(later) for later in tokens[i + 1:])):
+            year = int(token)
+            break
+        if name and _series_token(token):
+            break
+        # Noise words end the name only at its boundary: followed by another decoration, a year or nothing
+        if name and token in NOISE_WORDS and _name_boundary(tokens[i + 1] if i + 1 < len(tokens) else None):
+            break
+        name.append(token)
+    if year is None:
+        years = [int(token) for token in tokens[lead + len(name):] if _YEAR.match(token)]
+        year = years[0] if years else None
+    return ' '.join(name), year, season, episode
+
+def cluster_results(site_results, sites=None):
+    """Merge per-site listings into one view that lists each release once with all its sources.
+
+    Returns {'titles', 'links', 'sites', 'sources'} where links/sites hold the preferred
+    source of each entry and sources holds every [site, link, title] found for it.
+    Entries are ordered by their best position on any site.
+    """
+    clusters = {}  # {key: {'rank': (position, site order), 'sources': [[site, link, title]]}}
+    for order, site in enumerate(sites or site_results):
+        listing = site_results.get(site)
+        if not listing:
+            continue
+        for position, (title, link) in enumerate(zip(listing['titles'], listing['links'])):
+            key = canonical_key(title)
+            if not key[0]:
+                key = (bare_title(title).lower(), None, None, None)
+            cluster = clusters.setdefault(key, {'rank': (position, order), 'sources': []})
+            if all(source[0] != site for source in cluster['sources']):
+                cluster['sources'].append([site, link, bare_title(title)])
+            cluster['rank'] = min(cluster['rank'], (position, order))
+
+    merged = sorted(clusters.values(), key=lambda cluster: cluster['rank'])
+    logger.info(f"Clustered {sum(len(c['sources']) for c in merged)} listings into {len(merged)} releases")
+    return {
+        'titles': [f"{i}. {cluster['sources'][0][2]} ({', '.join(source[0] for source in cluster['sources'])})"
+                   for i, cluster in enumerate(merged, 1)],
+        'links': [cluster['sources'][0][1] for cluster in merged],
+        'sites': [cluster['sources'][0][0] for cluster in merged],
+        'sources': [cluster['sources'] for cluster in merged]
+    }
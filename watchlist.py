@@ -0,0 +1,190 @@
+import os
+import re
+import json
+import threading
+import logging
+from collections import deque
+from leader import file_lock
+
+logger = logging.getLogger(__name__)
+
+WATCHLIST_FILE = os.environ.get('WATCHLIST_FILE', 'watchlists.json')
+WATCH_MAX_PER_USER = int(os.environ.get('WATCH_MAX_PER_USER', 50))
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+def normalize_title(text):
+    """Lowercase, collapse punctuation to spaces and pad so patterns only match whole words."""
+    words = _NON_WORD.sub(' ', text.lower()).split()
+    return f" {' '.join(words)} " if words else ''
+
+class AhoCorasick:
+    """Multi-pattern matcher: one pass over the text finds every contained pattern."""
+
+    def __init__(self, patterns):
+        self._goto = [{}]  # {state: {char: next_state}}
+        self._fail = [0]
+        self._out = [[]]  # patterns ending at each state
+        for pattern in patterns:
+            self._add(pattern)
+        self._link()
+
+    def _add(self, pattern):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append(pattern)
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def search(self, text):
+        """Return the set of patterns found in text."""
+        found = set()
+        state = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+class Watchlist:
+    """Per-user title subscriptions, persisted to WATCHLIST_FILE and matched with one automaton.
+
+    The file is shared by every worker: changes are read-modify-write under a file
+    lock, and each worker reloads it whenever another one has changed it, so the
+    scheduler leader matches every worker's subscriptions.
+    """
+
+    def __init__(self, path=WATCHLIST_FILE, max_per_user=WATCH_MAX_PER_USER):
+        self.path = path
+        self.max_per_user = max_per_user
+        self._lock = threading.Lock()
+        self._mtime = None  # mtime of the file when this process last read or wrote it
+        self._watches = self._load()  # {chat_id: {normalized: display title}}
+        self._matcher = None
+        self._subscribers = {}  # {normalized: [chat_id]}
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            self._mtime = os.path.getmtime(self.path)
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            return {int(chat_id): {normalize_title(title): title for title in titles}
+                    for chat_id, titles in data.items()}
+        except Exception as e:
+            logger.error(f"Error loading {self.path}: {e}")
+            return {}
+
+    def _save(self):
+        data = {str(chat_id): list(titles.values()) for chat_id, titles in self._watches.items() if titles}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def _refresh(self):
+        """Reload (holding self._lock) when another worker changed the file since this one read it."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self._watches = self._load()
+            self._matcher = None
+
+    def _change(self, apply):
+        """Apply a change to the latest file contents under the file lock; apply returns (result, changed)."""
+        with self._lock, file_lock(f"{self.path}.lock"):
+            self._refresh()
+            result, changed = apply(self._watches)
+            if changed:
+                self._matcher = None
+                self._save()
+            return result
+
+    def add(self, chat_id, title):
+        """Subscribe a chat to a title; returns 'added', 'exists', 'invalid' or 'full'."""
+        key = normalize_title(title)
+        if len(key.strip()) < 2:
+            return 'invalid'
+
+        def apply(watches):
+            titles = watches.setdefault(chat_id, {})
+            if key in titles:
+                return 'exists', False
+            if len(titles) >= self.max_per_user:
+                return 'full', False
+            titles[key] = title.strip()
+            return 'added', True
+        result = self._change(apply)
+        if result == 'added':
+            logger.info(f"User {chat_id} is now watching '{title}'")
+        return result
+
+    def remove(self, chat_id, title):
+        """Unsubscribe by title or by its 1-based position in the user's list."""
+        def apply(watches):
+            titles = watches.get(chat_id, {})
+            key = normalize_title(title)
+            if key not in titles and title.strip().isdigit():
+                index = int(title) - 1
+                key = list(titles)[index] if 0 <= index < len(titles) else None
+            if key not in titles:
+                return None, False
+            return titles.pop(key), True
+        removed = self._change(apply)
+        if removed:
+            logger.info(f"User {chat_id} stopped watching '{removed}'")
+        return removed
+
+    def titles(self, chat_id):
+        with self._lock:
+            self._refresh()
+            return list(self._watches.get(chat_id, {}).values())
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return sum(len(titles) for titles in self._watches.values())
+
+    def match(self, title):
+        """Return {chat_id: [watched titles]} for subscriptions contained in a release title."""
+        with self._lock:
+            self._refresh()
+            if self._matcher is None:
+                self._subscribers = {}
+                for chat_id, titles in self._watches.items():
+                    for key in titles:
+                        self._subscribers.setdefault(key, []).append(chat_id)
+                self._matcher = AhoCorasick(self._subscribers)
+            matcher, subscribers, watches = self._matcher, self._subscribers, self._watches
+        matches = {}
+        for key in matcher.search(normalize_title(title)):
+            for chat_id in subscribers.get(key, ()):
+                display = watches.get(chat_id, {}).get(key)
+                if display:
+                    matches.setdefault(chat_id, []).append(display)
+        return matches
@@ -0,0 +1,263 @@
+import os
+import json
+import html
+import time
+import asyncio
+import importlib
+import threading
+import logging
+from urllib.parse import urlencode
+from xml.etree import ElementTree
+from config import SITE_CONFIG, site_url
+from crawler import reached_known
+from hedge import hedged_get
+
+logger = logging.getLogger(__name__)
+
+WP_FASTPATH = os.environ.get('WP_FASTPATH', '1') != '0'
+WP_PROBE_TTL = int(os.environ.get('WP_PROBE_TTL', 3600))  # Seconds before a site's endpoints are probed again
+WP_PER_PAGE = 100  # Largest page the WordPress REST API serves
+WP_INCREMENTAL_PER_PAGE = 20  # Smaller pages for watermark refreshes, which usually need only the newest posts
+WP_MAX_POSTS = 200  # Posts read per listing, like ten themed HTML pages
+FEED_MAX_PAGES = 5  # Feed pages read per latest listing; refreshes usually stop at the first
+PROBE_TIMEOUT = 5
+ENDPOINTS = ('rest', 'feed')  # Tried in this order before falling back to HTML
+EXCLUDED_TITLES = ['©', 'all rights reserved']
+
+def parse_posts(text):
+    """Extract (title, link) pairs from a /wp-json/wp/v2/posts response."""
+    posts = json.loads(text)
+    if not isinstance(posts, list):
+        raise ValueError("not a post list")
+    items = []
+    for post in posts:
+        title = html.unescape(post['title']['rendered']).strip()
+        if title and post.get('link') and not any(exclude in title.lower() for exclude in EXCLUDED_TITLES):
+            items.append((title, post['link']))
+    return items
+
+def parse_feed(text):
+    """Extract (title, link) pairs from an RSS 2.0 feed."""
+    root = ElementTree.fromstring(text)
+    if root.tag != 'rss':
+        raise ValueError("not an RSS feed")
+    items = []
+    for item in root.iter('item'):
+        title = html.unescape(item.findtext('title') or '').strip()
+        link = (item.findtext('link') or '').strip()
+        if title and link and not any(exclude in title.lower() for exclude in EXCLUDED_TITLES):
+            items.append((title, link))
+    return items
+
+def rest_url(site, page=1, query=None, per_page=WP_PER_PAGE):
+    params = {'per_page': per_page, 'page': page, '_fields': 'title,link'}
+    if query is not None:
+        params['search'] = query
+    return site_url(site, f"/wp-json/wp/v2/posts?{urlencode(params)}")
+
+def feed_url(site, page=1, query=None):
+    """The RSS feed of the latest posts, or of a search when query is given."""
+    params = {'s': query, 'feed': 'rss2'} if query is not None else {}
+    if page > 1:
+        params['paged'] = page
+    path = '/' if query is not None else '/feed/'
+    return site_url(site, f"{path}?{urlencode(params)}" if params else path)
+
+def _plan(endpoint, site, query, stop_at):
+    """(page_url, parse_page, max_pages) for reading a listing through an endpoint."""
+    if endpoint == 'feed':
+        def parse_feed_page(text):
+            items = parse_feed(text)
+            return items, bool(items)
+        return (lambda page: feed_url(site, page, query)), parse_feed_page, FEED_MAX_PAGES
+
+    per_page = WP_INCREMENTAL_PER_PAGE if stop_at else WP_PER_PAGE
+
+    def parse_posts_page(text):
+        items = parse_posts(text)
+        return items, len(items) >= per_page  # A full page means there may be another one
+    return (lambda page: rest_url(site, page, query, per_page)), parse_posts_page, -(-WP_MAX_POSTS // per_page)
+
+def blocked(error):
+    """True when an error means the endpoint is switched off or walled, rather than a passing network fault."""
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'status', None)
+    if status is not None:
+        return 400 <= status < 500 and status != 429
+    # A login wall or challenge page where JSON/XML was expected
+    return isinstance(error, (ValueError, KeyError, TypeError, ElementTree.ParseError))
+
+def numbered(site, items):
+    titles = [f"{i}. {title} ({site})" for i, (title, _) in enumerate(items, 1)]
+    return titles, [link for _, link in items]
+
+class FastPath:
+    """Per-domain record of which WordPress JSON/feed endpoints answer.
+
+    The sites are WordPress installs, so a listing is also served by the REST API
+    (/wp-json/wp/v2/posts) and the RSS feed: a few hundred bytes per post instead of
+    a themed page, and JSON/XML parsing instead of a DOM walk. probe() checks that
+    both endpoints list posts with a one-post request (DooPlay installs keep movies
+    in a custom post type and list none); listings then use the first working
+    endpoint and fall back to HTML scraping (the caller's own path) when none does
+    or a full listing comes back empty. An endpoint that starts refusing requests
+    is switched off until the next probe. Results are keyed by domain, so a domain
+    change is probed afresh.
+    """
+
+    def __init__(self, enabled=WP_FASTPATH, probe_ttl=WP_PROBE_TTL):
+        self.enabled = enabled
+        self.probe_ttl = probe_ttl
+        self._probes = {}  # {domain: {'rest': bool, 'feed': bool, 'probed_at': float}}
+        self._lock = threading.Lock()
+        self.metrics = {'rest': 0, 'feed': 0, 'html': 0, 'disabled': 0, 'bytes': 0, 'posts': 0}
+
+    @staticmethod
+    def _session(site):
+        # Each site module builds the session it scrapes with (cloudscraper for CineVood)
+        return importlib.import_module(site).new_session()
+
+    @staticmethod
+    def _headers(site):
+        headers = dict(getattr(importlib.import_module(site), 'HEADERS', {}))
+        headers['Accept'] = 'application/json, application/rss+xml;q=0.9, */*;q=0.5'
+        return headers
+
+    def probe(self, site):
+        """Check which endpoints answer on a site's current domain and remember the result."""
+        session = self._session(site)
+        found = {'probed_at': time.time()}
+        for endpoint in ENDPOINTS:
+            url = rest_url(site, per_page=1) if endpoint == 'rest' else feed_url(site)
+            try:
+                response = hedged_get(session, url, headers=self._headers(site), timeout=PROBE_TIMEOUT)
+                response.raise_for_status()
+                # An install that keeps its movies in a custom post type answers with no posts at all
+                found[endpoint] = bool((parse_posts if endpoint == 'rest' else parse_feed)(response.text))
+                if not found[endpoint]:
+                    logger.info(f"WordPress {endpoint} endpoint on {site} lists no posts")
+            except Exception as e:
+                logger.info(f"WordPress {endpoint} endpoint unavailable on {site}: {e}")
+                found[endpoint] = False
+        with self._lock:
+            self._probes[SITE_CONFIG[site]] = found
+        logger.info(f"Fast path for {site}: {', '.join(e for e in ENDPOINTS if found[e]) or 'HTML only'}")
+        return found
+
+    def probe_all(self, sites):
+        if not self.enabled:
+            return
+        for site in sites:
+            try:
+                self.probe(site)
+            except Exception as e:
+                logger.error(f"Error probing fast path for {site}: {e}")
+
+    def _cached_probe(self, site):
+        with self._lock:
+            probe = self._probes.get(SITE_CONFIG[site])
+        if probe is None or time.time() - probe['probed_at'] > self.probe_ttl:
+            return None
+        return probe
+
+    def endpoints(self, site, query=None, probe=None):
+        """Working endpoints for a listing on a site, probing its domain first when that is due."""
+        if not self.enabled:
+            return []
+        probe = probe or self._cached_probe(site) or self.probe(site)
+        # Feed pages hold ~10 posts, fewer than a themed search page, so searches only take the REST API
+        return [endpoint for endpoint in ENDPOINTS if probe.get(endpoint) and (endpoint == 'rest' or query is None)]
+
+    def _failed(self, site, endpoint, error):
+        if not blocked(error):
+            logger.warning(f"WordPress {endpoint} request failed on {site}: {error}")
+            return
+        with self._lock:
+            probe = self._probes.get(SITE_CONFIG[site])
+            if probe is not None:
+                probe[endpoint] = False
+            self.metrics['disabled'] += 1
+        logger.warning(f"WordPress {endpoint} endpoint failed on {site} ({error}); not using it until the next probe")
+
+    def _record(self, endpoint, received, items):
+        with self._lock:
+            self.metrics[endpoint] += 1
+            self.metrics['bytes'] += received
+            self.metrics['posts'] += len(items)
+
+    def listing(self, site, query=None, stop_at=None):
+        """Numbered (titles, links) for a search (query) or the latest posts, or None to scrape HTML instead."""
+        session = None
+        for endpoint in self.endpoints(site, query):
+            page_url, parse_page, max_pages = _plan(endpoint, site, query, stop_at)
+            session = session or self._session(site)
+            items, received = [], 0
+            try:
+                for page in range(1, max_pages + 1):
+                    response = hedged_get(session, page_url(page), headers=self._headers(site), timeout=10)
+                    if response.status_code in (400, 404) and page > 1:
+                        break  # Asked past the last page
+                    response.raise_for_status()
+                    received += len(response.content)
+                    page_items, has_next = parse_page(response.text)
+                    items.extend(page_items)
+                    if not page_items or not has_next or reached_known(page_items, stop_at):
+                        break
+            except Exception as e:
+                self._failed(site, endpoint, e)
+                continue
+            self._record(endpoint, received, items)
+            if not items and stop_at is None:
+                # Nothing where a full listing was asked for: try the next endpoint, then the HTML listing
+                logger.info(f"No posts from {site} via {endpoint}")
+                continue
+            logger.info(f"Read {len(items)} posts from {site} via {endpoint} ({received} bytes)")
+            return numbered(site, items)
+        with self._lock:
+            self.metrics['html'] += 1
+        return None
+
+    async def listing_async(self, site, fetch, query=None, stop_at=None):
+        """listing() on the event loop; fetch(url) is an async text fetcher that raises on HTTP errors."""
+        if not self.enabled:
+            return None
+        probe = self._cached_probe(site) or await asyncio.to_thread(self.probe, site)
+        for endpoint in self.endpoints(site, query, probe):
+            page_url, parse_page, max_pages = _plan(endpoint, site, query, stop_at)
+            items, received = [], 0
+            try:
+                for page in range(1, max_pages + 1):
+                    try:
+                        text = await fetch(page_url(page))
+                    except Exception as e:
+                        if page > 1 and getattr(e, 'status', None) in (400, 404):
+                            break
+                        raise
+                    received += len(text)
+                    page_items, has_next = parse_page(text)
+                    items.extend(page_items)
+                    if not page_items or not has_next or reached_known(page_items, stop_at):
+                        break
+            except Exception as e:
+                self._failed(site, endpoint, e)
+                continue
+            self._record(endpoint, received, items)
+            if not items and stop_at is None:
+                # Nothing where a full listing was asked for: try the next endpoint, then the HTML listing
+                logger.info(f"No posts from {site} via {endpoint}")
+                continue
+            logger.info(f"Read {len(items)} posts from {site} via {endpoint} ({received} bytes)")
+            return numbered(site, items)
+        with self._lock:
+            self.metrics['html'] += 1
+        return None
+
+    def stats(self):
+        with self._lock:
+            sites = {domain: {endpoint: probe.get(endpoint) for endpoint in ENDPOINTS}
+                     for domain, probe in self._probes.items()}
+            metrics = dict(self.metrics)
+        metrics['bytes_per_post'] = round(metrics['bytes'] / metrics['posts']) if metrics['posts'] else None
+        return {'enabled': self.enabled, 'domains': sites, **metrics}
+
+fastpath = FastPath()